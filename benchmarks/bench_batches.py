@@ -0,0 +1,62 @@
+"""Benchmark of midsv.transform_batches, which fills columns of parallel lists from the pipeline, against
+midsv.transform followed by the row-to-column pivot that was needed to build columns before.
+Each batch is processed and discarded by the consumer, as a writer of a columnar file does.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_batches.py
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from common import measure, short_read, write_sam
+
+import midsv
+from midsv import converter
+
+###########################################################
+# Previous implementation (list of dictionaries and pivot)
+###########################################################
+
+
+def batches_legacy(path_sam: Path, batch_size: int) -> Iterator[dict[str, list]]:
+    records = midsv.transform(path_sam, qscore=True)
+    for i in range(0, len(records), batch_size):
+        batch = records[i : i + batch_size]
+        yield {key: [record[key] for record in batch] for key in batch[0]}
+
+
+def batches_new(path_sam: Path, batch_size: int) -> Iterator[dict[str, list]]:
+    return midsv.transform_batches(path_sam, batch_size, qscore=True)
+
+
+def consume(batches: Callable[..., Iterator[dict[str, list]]], *args) -> int:
+    """A consumer that processes each batch and discards it, such as a writer of a columnar file"""
+    return sum(len(midsv) for batch in batches(*args) for midsv in batch["MIDSV"])
+
+
+def main() -> None:
+    rng = random.Random(1)
+    converter.set_cache_size(0)  # every read is distinct, so the cache only holds memory
+    batch_size = 10_000
+
+    print(f"{'reads':>7} {'legacy (MB)':>12} {'new (MB)':>9} {'legacy (s)':>11} {'new (s)':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for num_reads in [20_000, 100_000]:
+            path_sam = Path(tmpdir, f"short_reads_{num_reads}.sam")
+            reads = (short_read(rng, f"read{i:08d}", 1, read_length=50) for i in range(num_reads))
+            write_sam(path_sam, reads, reference_length=50)
+            if num_reads == 20_000:
+                assert list(batches_new(path_sam, batch_size)) == list(batches_legacy(path_sam, batch_size))
+            legacy_time, legacy_peak, expected = measure(consume, batches_legacy, path_sam, batch_size)
+            new_time, new_peak, result = measure(consume, batches_new, path_sam, batch_size)
+            assert result == expected
+            print(f"{num_reads:>7,} {legacy_peak:>12.1f} {new_peak:>9.1f} {legacy_time:>11.2f} {new_time:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
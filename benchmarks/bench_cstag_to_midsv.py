@@ -0,0 +1,143 @@
+"""Benchmark of converter.cstag_to_midsv against the previous regex-based implementation.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_cstag_to_midsv.py
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import timeit
+
+from midsv import converter
+
+###########################################################
+# Previous implementation (midsv v0.13.1)
+###########################################################
+
+
+def _split_cstag_legacy(cstag: str) -> list[str]:
+    cstag_splitted = []
+    for cs in re.split(r"(=|\*|\-|\+|\~)", cstag):
+        if not cs or cs == "cs:Z:":
+            continue
+        if re.match(r"(=|\*|\-|\+|\~)", cs):
+            cstag_splitted.append(cs)
+        else:
+            cstag_splitted[-1] += cs
+    return cstag_splitted
+
+
+def _process_insertion_legacy(cstag_splitted: list[str], i: int, midsv_tags: list[str]) -> None:
+    insertion: str = "+" + "|+".join(cstag_splitted[i][1:])
+    if i + 1 == len(cstag_splitted):
+        midsv_tags.append(insertion)
+        return
+
+    next_cstag: str = cstag_splitted[i + 1]
+    next_op: str = next_cstag[0]
+
+    if next_op == "*":
+        midsv_tags.append(insertion + "|" + next_cstag)
+        cstag_splitted[i + 1] = "*"
+    elif next_op == "~":
+        insertion += "|=N"
+        midsv_tags.append(insertion)
+        splice_match = re.match(r"([a-z]+)([0-9]+)([a-z]+)", next_cstag[1:])
+        if splice_match:
+            left, splice, right = splice_match.groups()
+            cstag_splitted[i + 1] = f"{next_op}{left}{int(splice) - 1}{right}"
+    else:
+        insertion += "|" + next_cstag[:2]
+        midsv_tags.append(insertion)
+        cstag_splitted[i + 1] = next_op + next_cstag[2:]
+
+
+def _process_splice_legacy(cs: str, midsv_tags: list[str]) -> None:
+    splice_match = re.match(r"([a-z]+)([0-9]+)([a-z]+)", cs[1:])
+    if splice_match:
+        _, splice, _ = splice_match.groups()
+        midsv_tags.extend(["=N"] * int(splice))
+
+
+def _process_match_legacy(cs: str, midsv_tags: list[str]) -> None:
+    cs_list: list[str] = list(cs[1:])
+    midsv_tags.append(cs[0] + f",{cs[0]}".join(cs_list))
+
+
+def cstag_to_midsv_legacy(cstag: str) -> str:
+    cstag_splitted: list[str] = _split_cstag_legacy(cstag)
+    midsv_converted: list[str] = []
+    for i, cs in enumerate(cstag_splitted):
+        if len(cs) == 1:
+            continue
+        op: str = cs[0]
+        if op == "+":
+            _process_insertion_legacy(cstag_splitted, i, midsv_converted)
+        elif op == "*":
+            midsv_converted.append(cs)
+        elif op == "~":
+            _process_splice_legacy(cs, midsv_converted)
+        else:
+            _process_match_legacy(cs, midsv_converted)
+    return ",".join(cs.upper() for cs in midsv_converted)
+
+
+###########################################################
+# Random cs tags
+###########################################################
+
+
+def random_cstag(rng: random.Random, reference_length: int, splice: bool = False) -> str:
+    """Simulate a long-read cs tag with substitutions, indels and optionally introns."""
+    cstag = ["cs:Z:"]
+    position = 0
+    while position < reference_length:
+        event = rng.random()
+        if event < 0.03:
+            ref, alt = rng.sample("acgt", 2)
+            cstag.append(f"*{ref}{alt}")
+            position += 1
+        elif event < 0.05:
+            length = rng.randint(1, 5)
+            cstag.append("-" + "".join(rng.choices("acgt", k=length)))
+            position += length
+        elif event < 0.07:
+            cstag.append("+" + "".join(rng.choices("acgt", k=rng.randint(1, 5))))
+        elif splice and event < 0.075:
+            length = rng.randint(50, 5000)
+            cstag.append(f"~gt{length}ag")
+            position += length
+        else:
+            length = rng.randint(1, 60)
+            cstag.append("=" + "".join(rng.choices("ACGT", k=length)))
+            position += length
+    return "".join(cstag)
+
+
+def check_identical(cstags: list[str]) -> None:
+    for cstag in cstags:
+        assert converter.cstag_to_midsv(cstag) == cstag_to_midsv_legacy(cstag), cstag
+
+
+def main() -> None:
+    rng = random.Random(1)
+
+    # Short tags with adjacent events exercise the insertion lookahead
+    short_cstags = [random_cstag(rng, rng.randint(1, 30), splice=True) for _ in range(20000)]
+    check_identical(short_cstags)
+
+    print(f"{'reference length':>16} {'legacy (ms)':>12} {'new (ms)':>10} {'speedup':>8}")
+    for reference_length in [1_000, 10_000, 50_000, 100_000]:
+        cstags = [random_cstag(rng, reference_length) for _ in range(5)]
+        check_identical(cstags)
+        number = max(1, 200_000 // reference_length)
+        legacy = min(timeit.repeat(lambda: [cstag_to_midsv_legacy(c) for c in cstags], number=number, repeat=3))
+        new = min(timeit.repeat(lambda: [converter.cstag_to_midsv(c) for c in cstags], number=number, repeat=3))
+        legacy, new = legacy / number / len(cstags) * 1000, new / number / len(cstags) * 1000
+        print(f"{reference_length:>16,} {legacy:>12.3f} {new:>10.3f} {legacy / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
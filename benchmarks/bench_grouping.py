@@ -0,0 +1,95 @@
+"""Benchmark of grouping alignments by QNAME with formatter.group_alignments, against the previous pipeline that
+sorted all alignments by QNAME (and POS) three times and grouped them with itertools.groupby.
+
+Only QNAME and POS are generated, so 10 million alignments need about 5 GB of memory.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_grouping.py [--num-alignments 10000000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from itertools import groupby
+
+from midsv import formatter
+
+###########################################################
+# Previous implementation (midsv v0.13.1)
+###########################################################
+
+
+def group_legacy(alignments: list[dict]) -> list[list[dict]]:
+    # formatter.remove_resequence
+    alignments.sort(key=lambda x: x["QNAME"])
+    filtered_alignments = []
+    for _, group in groupby(alignments, key=lambda x: x["QNAME"]):
+        filtered_alignments.extend(sorted(group, key=lambda x: x["POS"]))
+    # formatter.organize_alignments
+    alignments = sorted(filtered_alignments, key=lambda x: [x["QNAME"], x["POS"]])
+    # polisher.merge
+    alignments = sorted(alignments, key=lambda x: [x["QNAME"], x["POS"]])
+    return [list(records) for _, records in groupby(alignments, key=lambda x: x["QNAME"])]
+
+
+def group_new(alignments: list[dict]) -> list[list[dict]]:
+    groups = []
+    for group in formatter.group_alignments(alignments):
+        if len(group) > 1:
+            group.sort(key=lambda x: x["POS"])
+        groups.append(group)
+    return groups
+
+
+###########################################################
+# Alignments
+###########################################################
+
+
+def random_alignments(rng: random.Random, num_alignments: int, order: str) -> list[dict]:
+    """One in ten reads has a supplementary alignment. The reads are
+    'grouped' as in minimap2 output, 'sorted' by QNAME, or 'shuffled'.
+    """
+    alignments = []
+    read_id = 0
+    while len(alignments) < num_alignments:
+        qname = f"m64{rng.randrange(10**6):06d}/{read_id}/ccs"
+        alignments.append({"QNAME": qname, "POS": rng.randint(1, 10_000)})
+        if read_id % 10 == 0:
+            alignments.append({"QNAME": qname, "POS": rng.randint(1, 10_000)})
+        read_id += 1
+    del alignments[num_alignments:]
+    if order == "sorted":
+        alignments.sort(key=lambda x: x["QNAME"])
+    elif order == "shuffled":
+        rng.shuffle(alignments)
+    return alignments
+
+
+def measure(function, alignments: list[dict]) -> tuple[float, list[list[dict]]]:
+    start = time.perf_counter()
+    groups = function(alignments)
+    return time.perf_counter() - start, groups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-alignments", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{args.num_alignments:,} alignments")
+    print(f"{'input order':>11} {'legacy (s)':>11} {'new (s)':>8} {'speedup':>8}")
+    for order in ["grouped", "sorted", "shuffled"]:
+        alignments = random_alignments(rng, args.num_alignments, order)
+        legacy, expected = measure(group_legacy, alignments.copy())
+        new, groups = measure(group_new, alignments)
+        assert groups == expected
+        del alignments, expected, groups
+        print(f"{order:>11} {legacy:>11.2f} {new:>8.2f} {legacy / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark of midsv.transform with region and qnames on a SAM file indexed by midsv.index.build_index, which
+reads only the records needed, against the same transform scanning the whole file.
+The records are not padded (pad=False), so that reading rather than padding to the 1 Mb reference is measured.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_index.py
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+from common import measure_time, short_read, write_sam
+
+import midsv
+from midsv import converter, index
+
+
+def main() -> None:
+    rng = random.Random(1)
+    converter.set_cache_size(0)  # every read is distinct, so the cache only holds memory
+    reference_length = 1_000_000
+    num_reads = 100_000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path_sam = Path(tmpdir, "sorted.sam")
+        # Sorted by coordinate, so that the index narrows down a region
+        positions = sorted(rng.randint(1, reference_length - 150 + 1) for _ in range(num_reads))
+        reads = (short_read(rng, f"read{i}", pos, read_length=150) for i, pos in enumerate(positions))
+        write_sam(path_sam, reads, reference_length)
+        qnames = [f"read{i}" for i in rng.sample(range(num_reads), 10)]
+        queries = [
+            ("region 1 kb", {"region": "ref:500001-501000"}),
+            ("region 10 kb", {"region": "ref:500001-510000"}),
+            ("10 reads", {"qnames": qnames}),
+        ]
+
+        scan_times = []
+        for _, kwargs in queries:
+            scan_times.append(measure_time(midsv.transform, path_sam, qscore=True, pad=False, **kwargs))
+
+        build_time, _ = measure_time(index.build_index, path_sam)
+        sam_size = path_sam.stat().st_size / 1e6
+        index_size = index.index_path(path_sam).stat().st_size / 1e6
+        print(f"{num_reads:,} reads, SAM {sam_size:.1f} MB")
+        print(f"build_index: {build_time:.2f} s, index {index_size:.1f} MB")
+
+        print(f"{'query':>13} {'records':>8} {'scan (s)':>9} {'index (s)':>10} {'speedup':>8}")
+        for (name, kwargs), (scan_time, expected) in zip(queries, scan_times):
+            index_time, records = measure_time(midsv.transform, path_sam, qscore=True, pad=False, **kwargs)
+            assert records == expected
+            print(
+                f"{name:>13} {len(records):>8,} {scan_time:>9.2f} {index_time:>10.3f} {scan_time / index_time:>7.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark of polisher.merge, which collects the alignments of a read in a segment builder and joins them once,
+against the previous implementation that deep-copied the first alignment and concatenated strings per alignment.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_merge.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+import tracemalloc
+from copy import deepcopy
+from itertools import groupby
+
+from midsv import polisher
+
+###########################################################
+# Previous implementation (midsv v0.13.1)
+###########################################################
+
+
+def _calculate_microhomology_legacy(previous_alignment: dict, current_alignment: dict) -> int:
+    previous_midsv = previous_alignment["MIDSV"].split(",")
+    current_midsv = current_alignment["MIDSV"].split(",")
+    if "QSCORE" in current_alignment:
+        previous_qscore = previous_alignment["QSCORE"].split(",")
+        current_qscore = current_alignment["QSCORE"].split(",")
+
+    num_microhomology = 0
+    min_length = min(len(previous_midsv), len(current_midsv))
+    for i in range(1, len(current_midsv) + 1):
+        if i == min_length + 1:
+            break
+        prev_index = len(previous_midsv) - i
+        if previous_midsv[prev_index:] == current_midsv[:i]:
+            if "QSCORE" in current_alignment and previous_qscore[prev_index:] != current_qscore[:i]:
+                break
+            num_microhomology = i
+    return num_microhomology
+
+
+def _merge_legacy(alignments: list[dict]) -> list[dict]:
+    sam_merged = []
+    for _, records in groupby(sorted(alignments, key=lambda x: [x["QNAME"], x["POS"]]), key=lambda x: x["QNAME"]):
+        records = list(records)
+        if len(records) == 1:
+            sam_merged.append(records[0])
+            continue
+        sam_template = deepcopy(records[0])
+        first_strand = polisher.is_forward_strand(sam_template["FLAG"])
+        for i, current_alignment in enumerate(records[1:], start=1):
+            if first_strand is not polisher.is_forward_strand(current_alignment["FLAG"]):
+                current_alignment["MIDSV"] = current_alignment["MIDSV"].lower()
+            previous_alignment = records[i - 1]
+            num_microhomology = _calculate_microhomology_legacy(previous_alignment, current_alignment)
+            current_alignment["MIDSV"] = ",".join(current_alignment["MIDSV"].split(",")[num_microhomology:])
+            if "QSCORE" in current_alignment:
+                current_alignment["QSCORE"] = ",".join(current_alignment["QSCORE"].split(",")[num_microhomology:])
+            current_alignment["POS"] += num_microhomology
+            previous_end = previous_alignment["POS"] + len(previous_alignment["MIDSV"].split(",")) - 1
+            gap = current_alignment["POS"] - 1 - previous_end
+            sam_template["MIDSV"] += ",=N" * gap + "," + current_alignment["MIDSV"]
+            if "QSCORE" in sam_template:
+                sam_template["QSCORE"] += ",-1" * gap + "," + current_alignment["QSCORE"]
+        sam_merged.append(sam_template)
+    return sam_merged
+
+
+###########################################################
+# Reads split into many alignments
+###########################################################
+
+
+def segmented_read(rng: random.Random, num_segments: int, segment_length: int = 100) -> list[dict]:
+    """Simulate a read aligned as num_segments alignments separated by deletions."""
+    alignments = []
+    pos = 1
+    for i in range(num_segments):
+        midsv = ["=" + base for base in rng.choices("ACGT", k=segment_length)]
+        qscore = [str(q) for q in rng.choices(range(10, 41), k=segment_length)]
+        alignments.append(
+            {"QNAME": "read", "FLAG": 0 if i == 0 else 2048, "POS": pos, "MIDSV": midsv, "QSCORE": qscore}
+        )
+        pos += segment_length + rng.randint(1, 50)
+    return alignments
+
+
+def to_strings(alignments: list[dict]) -> list[dict]:
+    """The previous implementation modifies the alignments, so a new copy is made for every run."""
+    return [{**a, "MIDSV": ",".join(a["MIDSV"]), "QSCORE": ",".join(a["QSCORE"])} for a in alignments]
+
+
+def to_lists(alignments: list[dict]) -> list[dict]:
+    """Shallow copies as the counterpart of to_strings, so that both implementations pay for copying the input."""
+    return [a.copy() for a in alignments]
+
+
+def peak_memory(function, *args) -> int:
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    rng = random.Random(1)
+
+    print(f"{'segments/read':>13} {'legacy (ms)':>12} {'new (ms)':>10} {'speedup':>8} {'peak (legacy/new, MB)':>22}")
+    for num_segments in [1, 10, 100, 1_000, 5_000]:
+        alignments = segmented_read(rng, num_segments)
+        (merged,) = polisher.merge(alignments)
+        (expected,) = _merge_legacy(to_strings(alignments))
+        assert ",".join(merged["MIDSV"]) == expected["MIDSV"]
+        assert ",".join(merged["QSCORE"]) == expected["QSCORE"]
+
+        number = max(1, 1_000 // num_segments)
+        legacy = min(timeit.repeat(lambda: _merge_legacy(to_strings(alignments)), number=number, repeat=3))
+        new = min(timeit.repeat(lambda: polisher.merge(to_lists(alignments)), number=number, repeat=3))
+        legacy, new = legacy / number * 1000, new / number * 1000
+        peak_legacy = peak_memory(_merge_legacy, to_strings(alignments)) / 1e6
+        peak_new = peak_memory(polisher.merge, alignments) / 1e6
+        print(
+            f"{num_segments:>13,} {legacy:>12.3f} {new:>10.3f} {legacy / new:>7.2f}x "
+            f"{peak_legacy:>10.2f} / {peak_new:<9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark of polisher.calculate_microhomology against the previous quadratic implementation.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_microhomology.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from midsv import polisher
+
+###########################################################
+# Previous implementation (midsv v0.13.1, on token lists)
+###########################################################
+
+
+def calculate_microhomology_legacy(previous_alignment: dict, current_alignment: dict) -> int:
+    previous_midsv = previous_alignment["MIDSV"]
+    current_midsv = current_alignment["MIDSV"]
+    if "QSCORE" in current_alignment:
+        previous_qscore = previous_alignment["QSCORE"]
+        current_qscore = current_alignment["QSCORE"]
+
+    num_microhomology = 0
+    min_length = min(len(previous_midsv), len(current_midsv))
+    for i in range(1, len(current_midsv) + 1):
+        if i == min_length + 1:
+            break
+        prev_index = len(previous_midsv) - i
+        if previous_midsv[prev_index:] == current_midsv[:i]:
+            if "QSCORE" in current_alignment and previous_qscore[prev_index:] != current_qscore[:i]:
+                break
+            num_microhomology = i
+    return num_microhomology
+
+
+###########################################################
+# Overlapping alignments
+###########################################################
+
+
+def random_tokens(rng: random.Random, length: int) -> tuple[list[str], list[str]]:
+    """QSCORE is constant so that the search is not stopped early by a short match with different QSCORE."""
+    midsv = ["=" + base for base in rng.choices("ACGT", k=length)]
+    qscore = ["30"] * length
+    return midsv, qscore
+
+
+def overlapping_alignments(rng: random.Random, overlap: int, flank: int = 1000) -> tuple[dict, dict]:
+    """The last `overlap` tokens of the previous alignment are the first tokens of the current alignment."""
+    midsv, qscore = random_tokens(rng, flank + overlap + flank)
+    previous_alignment = {"MIDSV": midsv[: flank + overlap], "QSCORE": qscore[: flank + overlap]}
+    current_alignment = {"MIDSV": midsv[flank:], "QSCORE": qscore[flank:]}
+    return previous_alignment, current_alignment
+
+
+def main() -> None:
+    rng = random.Random(1)
+
+    print(f"{'overlap (tokens)':>16} {'legacy (ms)':>12} {'new (ms)':>10} {'speedup':>8}")
+    for overlap in [10, 100, 1_000, 5_000, 10_000]:
+        previous_alignment, current_alignment = overlapping_alignments(rng, overlap)
+        expected = calculate_microhomology_legacy(previous_alignment, current_alignment)
+        assert polisher.calculate_microhomology(previous_alignment, current_alignment) == expected
+        assert expected >= overlap
+
+        number = max(1, 2_000 // overlap)
+        args = (previous_alignment, current_alignment)
+        legacy = min(timeit.repeat(lambda: calculate_microhomology_legacy(*args), number=number, repeat=3))
+        new = min(timeit.repeat(lambda: polisher.calculate_microhomology(*args), number=number, repeat=3))
+        legacy, new = legacy / number * 1000, new / number * 1000
+        print(f"{overlap:>16,} {legacy:>12.3f} {new:>10.3f} {legacy / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
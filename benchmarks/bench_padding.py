@@ -0,0 +1,45 @@
+"""Benchmark of midsv.transform with pad=False, which outputs only the tokens covered by each read with START and
+END, against the default output padded with '=N' and '-1' to the reference length.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_padding.py
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+from common import measure, random_short_reads, write_sam
+
+import midsv
+from midsv import converter
+
+
+def main() -> None:
+    rng = random.Random(1)
+    converter.set_cache_size(0)  # every read is distinct, so the cache only holds memory
+    sqheaders = {}
+
+    header = f"{'padded (MB)':>12} {'pad=False (MB)':>15} {'padded (s)':>11} {'pad=False (s)':>14}"
+    print(f"{'reference':>9} {'rle':>5} {header}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for reference_length in [1_000, 10_000]:
+            sqheaders["ref"] = reference_length
+            path_sam = Path(tmpdir, f"short_reads_{reference_length}.sam")
+            reads = random_short_reads(rng, reference_length, read_length=150, num_reads=20_000)
+            write_sam(path_sam, reads, reference_length)
+            for rle in [False, True]:
+                padded_time, padded_peak, expected = measure(midsv.transform, path_sam, qscore=True, rle=rle)
+                new_time, new_peak, records = measure(midsv.transform, path_sam, qscore=True, rle=rle, pad=False)
+                assert [midsv.expand(record, sqheaders, rle) for record in records] == expected
+                del expected, records
+                print(
+                    f"{reference_length:>9,} {str(rle):>5} {padded_peak:>12.1f} {new_peak:>15.1f} "
+                    f"{padded_time:>11.2f} {new_time:>14.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark of peak memory of midsv.transform on long reads, which drops SEQ, QUAL, CIGAR and CSTAG as soon as
+they are no longer needed, against the previous pipeline that carried all fields until polisher.select.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_projection.py
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+from common import long_read, measure, write_sam
+
+import midsv
+from midsv import converter, formatter, io, polisher
+
+###########################################################
+# Previous implementation (all fields are carried)
+###########################################################
+
+
+def transform_legacy(path_sam: Path, qscore: bool) -> list[dict]:
+    sqheaders, alignments = formatter.parse_sam(io.read_sam(path_sam), qscore)
+    records = []
+    for group in formatter.group_alignments(alignments):
+        group = converter.convert(formatter.organize_alignments(group), qscore)
+        records.extend(polisher.polish(group, sqheaders))
+    return records
+
+
+def main() -> None:
+    rng = random.Random(1)
+    converter.set_cache_size(0)  # every read is distinct, so the cache only holds memory
+
+    print(f"{'read length':>11} {'qscore':>6} {'legacy (MB)':>12} {'new (MB)':>9} {'legacy (s)':>11} {'new (s)':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for reference_length in [10_000, 50_000]:
+            path_sam = Path(tmpdir, f"long_reads_{reference_length}.sam")
+            num_reads = 10_000_000 // reference_length
+            reads = (long_read(rng, f"read{i}", reference_length) for i in range(num_reads))
+            write_sam(path_sam, reads, reference_length)
+            for qscore in [False, True]:
+                legacy_time, legacy_peak, expected = measure(transform_legacy, path_sam, qscore)
+                new_time, new_peak, records = measure(midsv.transform, path_sam, qscore)
+                assert records == expected
+                del expected, records
+                print(
+                    f"{reference_length:>11,} {str(qscore):>6} {legacy_peak:>12.1f} {new_peak:>9.1f} "
+                    f"{legacy_time:>11.2f} {new_time:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark of converter.cstag_to_midsv_qscore, which emits MIDSV and QSCORE in a single walk of the cs tag
+with a Phred lookup table, against the previous implementation that converted QUAL in a second pass over MIDSV.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_qscore.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from midsv import converter
+
+###########################################################
+# Previous implementation (midsv v0.13.1)
+###########################################################
+
+
+def _ascii_to_phred_legacy(ascii: str) -> str:
+    return str(ord(ascii) - 33)
+
+
+def _qual_to_qscore_legacy(qual: str, midsv_tag: str) -> str:
+    qscore = []
+    idx = 0
+    for tag in midsv_tag.split(","):
+        if tag.startswith("-") or tag == "=N":
+            qscore.append("-1")
+            idx -= 1
+        elif tag.startswith("+"):
+            num_insertion = len(tag.split("|")) - 1
+            insertion = []
+            for j in range(idx, idx + num_insertion):
+                insertion.append(_ascii_to_phred_legacy(qual[j]) + "|")
+            if tag.split("|")[-1].startswith("-") or tag.split("|")[-1] == "=N":
+                insertion.append("-1")
+                idx -= 1
+            else:
+                insertion.append(_ascii_to_phred_legacy(qual[j + 1]))
+            qscore.append("".join(insertion))
+            idx += num_insertion
+        else:
+            qscore.append(_ascii_to_phred_legacy(qual[idx]))
+        idx += 1
+    return ",".join(qscore)
+
+
+def convert_legacy(cstag: str, qual: str) -> tuple[str, str]:
+    midsv = converter.cstag_to_midsv(cstag)
+    return midsv, _qual_to_qscore_legacy(qual, midsv)
+
+
+###########################################################
+# Random cs tags
+###########################################################
+
+
+def random_cstag(rng: random.Random, reference_length: int) -> tuple[str, str]:
+    """Simulate a cs tag with substitutions and indels covering reference_length bases, and its QUAL."""
+    cstag = ["cs:Z:"]
+    query_length = 0
+    position = 0
+    while position < reference_length:
+        event = rng.random()
+        if event < 0.03:
+            ref, alt = rng.sample("acgt", 2)
+            cstag.append(f"*{ref}{alt}")
+            position += 1
+            query_length += 1
+        elif event < 0.05:
+            length = min(rng.randint(1, 5), reference_length - position)
+            cstag.append("-" + "".join(rng.choices("acgt", k=length)))
+            position += length
+        elif event < 0.07 and position > 0:
+            length = rng.randint(1, 5)
+            cstag.append("+" + "".join(rng.choices("acgt", k=length)))
+            query_length += length
+        else:
+            length = min(rng.randint(1, 60), reference_length - position)
+            cstag.append("=" + "".join(rng.choices("ACGT", k=length)))
+            position += length
+            query_length += length
+    qual = "".join(rng.choices("+5?I", k=query_length))
+    return "".join(cstag), qual
+
+
+def main() -> None:
+    rng = random.Random(1)
+
+    print(f"{'cs tag (bp)':>11} {'MIDSV only (ms)':>16} {'legacy (ms)':>12} {'new (ms)':>9} {'speedup':>8}")
+    for reference_length in [1_000, 10_000, 50_000]:
+        cstag, qual = random_cstag(rng, reference_length)
+        assert converter.cstag_to_midsv_qscore(cstag, qual) == convert_legacy(cstag, qual)
+
+        number = max(1, 200_000 // reference_length)
+        results = []
+        for function, args in [
+            (converter.cstag_to_midsv, (cstag,)),
+            (convert_legacy, (cstag, qual)),
+            (converter.cstag_to_midsv_qscore, (cstag, qual)),
+        ]:
+            elapsed = min(timeit.repeat(lambda: function(*args), number=number, repeat=3))  # noqa: B023
+            results.append(elapsed / number * 1000)
+        midsv_only, legacy, new = results
+        print(f"{reference_length:>11,} {midsv_only:>16.3f} {legacy:>12.3f} {new:>9.3f} {legacy / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
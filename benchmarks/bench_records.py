@@ -0,0 +1,69 @@
+"""Benchmark of the memory of alignment records between parsing and polishing, comparing the dictionaries of the
+previous implementation with midsv.formatter.Alignment, whose fields are stored in __slots__.
+
+The field values are shared by all records, so that only the record itself is measured.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_records.py
+"""
+
+from __future__ import annotations
+
+import time
+import tracemalloc
+
+from midsv import formatter
+
+###########################################################
+# Previous implementation (midsv v0.13.1)
+###########################################################
+
+
+def to_dict_legacy(alignment: list[str], idx_cstag: int) -> dict[str, str | int]:
+    return dict(
+        QNAME=alignment[0],
+        FLAG=int(alignment[1]),
+        RNAME=alignment[2],
+        POS=int(alignment[3]),
+        CIGAR=alignment[5],
+        SEQ=alignment[9],
+        QUAL=alignment[10],
+        CSTAG=alignment[idx_cstag],
+    )
+
+
+###########################################################
+# Records
+###########################################################
+
+ALIGNMENT = ["read", "0", "ref", "1", "60", "4M", "*", "0", "0", "ACGT", "!!!!", "cs:Z:=ACGT"]
+
+
+def measure(function, num_records: int) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    records = [function(ALIGNMENT, 11) for _ in range(num_records)]
+    elapsed = time.perf_counter() - start
+    del records
+
+    tracemalloc.start()
+    records = [function(ALIGNMENT, 11) for _ in range(num_records)]
+    parsed = tracemalloc.get_traced_memory()[0]
+    # Fields dropped before the MIDSV conversion, and MIDSV added
+    for record in formatter.drop_fields(records, ["SEQ", "CIGAR"]):
+        record["MIDSV"] = ALIGNMENT
+    converted = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, parsed / num_records, converted / num_records
+
+
+def main() -> None:
+    num_records = 1_000_000
+    print(f"{num_records:,} records")
+    print(f"{'record':>9} {'parsed (bytes/record)':>22} {'converted (bytes/record)':>25} {'parse (s)':>10}")
+    for name, function in [("dict", to_dict_legacy), ("Alignment", formatter._alignment_to_record)]:
+        elapsed, parsed, converted = measure(function, num_records)
+        print(f"{name:>9} {parsed:>22.0f} {converted:>25.0f} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
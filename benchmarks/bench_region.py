@@ -0,0 +1,64 @@
+"""Benchmark of midsv.transform with region, which trims cs tags to a window before the conversion, against
+slicing the window from the output of the whole reference.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_region.py
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+from common import measure, random_short_reads, write_sam
+
+import midsv
+from midsv import converter
+
+###########################################################
+# Previous implementation (transform and slice)
+###########################################################
+
+
+def region_legacy(path_sam: Path, rname: str, start: int, end: int) -> list[dict[str, str]]:
+    records = []
+    for record in midsv.transform(path_sam, qscore=True):
+        if record["RNAME"] != rname:
+            continue
+        midsv_tokens = record["MIDSV"].split(",")[start - 1 : end]
+        if set(midsv_tokens) == {"=N"}:
+            continue
+        qscore_tokens = record["QSCORE"].split(",")[start - 1 : end]
+        records.append({**record, "MIDSV": ",".join(midsv_tokens), "QSCORE": ",".join(qscore_tokens)})
+    return records
+
+
+def region_new(path_sam: Path, rname: str, start: int, end: int) -> list[dict[str, str]]:
+    return midsv.transform(path_sam, qscore=True, region=f"{rname}:{start}-{end}")
+
+
+def main() -> None:
+    rng = random.Random(1)
+    converter.set_cache_size(0)  # every read is distinct, so the cache only holds memory
+    reference_length = 20_000
+
+    print(f"{'region':>7} {'reads':>6} {'legacy (MB)':>12} {'new (MB)':>9} {'legacy (s)':>11} {'new (s)':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path_sam = Path(tmpdir, "reads.sam")
+        reads = random_short_reads(rng, reference_length, read_length=2_000, num_reads=2_000)
+        write_sam(path_sam, reads, reference_length)
+        for region_length in [100, 1_000, 5_000]:
+            start = reference_length // 2
+            end = start + region_length - 1
+            legacy_time, legacy_peak, expected = measure(region_legacy, path_sam, "ref", start, end)
+            new_time, new_peak, records = measure(region_new, path_sam, "ref", start, end)
+            assert records == expected
+            print(
+                f"{region_length:>7,} {len(records):>6,} {legacy_peak:>12.1f} {new_peak:>9.1f} "
+                f"{legacy_time:>11.2f} {new_time:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Benchmark of converter.convert and polisher.polish, which carry MIDSV and QSCORE as token lists,
+against the previous implementation that split and joined comma-separated strings at every step.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_token_lists.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+import tracemalloc
+from copy import deepcopy
+from itertools import groupby
+
+from midsv import converter, polisher
+
+###########################################################
+# Previous implementation (midsv v0.13.1)
+###########################################################
+
+
+def _convert_legacy(samdict: list[dict], qscore: bool) -> list[dict]:
+    for alignment in samdict:
+        alignment["MIDSV"] = converter.cstag_to_midsv(alignment["CSTAG"])
+        if qscore:
+            alignment["QSCORE"] = converter.qual_to_qscore(alignment["QUAL"], alignment["MIDSV"])
+    return samdict
+
+
+def _calculate_microhomology_legacy(previous_alignment: dict, current_alignment: dict) -> int:
+    previous_midsv = previous_alignment["MIDSV"].split(",")
+    current_midsv = current_alignment["MIDSV"].split(",")
+    if "QSCORE" in current_alignment:
+        previous_qscore = previous_alignment["QSCORE"].split(",")
+        current_qscore = current_alignment["QSCORE"].split(",")
+
+    num_microhomology = 0
+    min_length = min(len(previous_midsv), len(current_midsv))
+    for i in range(1, len(current_midsv) + 1):
+        if i == min_length + 1:
+            break
+        prev_index = len(previous_midsv) - i
+        if previous_midsv[prev_index:] == current_midsv[:i]:
+            if "QSCORE" in current_alignment and previous_qscore[prev_index:] != current_qscore[:i]:
+                break
+            num_microhomology = i
+    return num_microhomology
+
+
+def _merge_legacy(alignments: list[dict]) -> list[dict]:
+    sam_merged = []
+    for _, records in groupby(sorted(alignments, key=lambda x: [x["QNAME"], x["POS"]]), key=lambda x: x["QNAME"]):
+        records = list(records)
+        if len(records) == 1:
+            sam_merged.append(records[0])
+            continue
+        sam_template = deepcopy(records[0])
+        first_strand = polisher.is_forward_strand(sam_template["FLAG"])
+        for i, current_alignment in enumerate(records[1:], start=1):
+            if first_strand is not polisher.is_forward_strand(current_alignment["FLAG"]):
+                current_alignment["MIDSV"] = current_alignment["MIDSV"].lower()
+            previous_alignment = records[i - 1]
+            num_microhomology = _calculate_microhomology_legacy(previous_alignment, current_alignment)
+            current_alignment["MIDSV"] = ",".join(current_alignment["MIDSV"].split(",")[num_microhomology:])
+            if "QSCORE" in current_alignment:
+                current_alignment["QSCORE"] = ",".join(current_alignment["QSCORE"].split(",")[num_microhomology:])
+            current_alignment["POS"] += num_microhomology
+            previous_end = previous_alignment["POS"] + len(previous_alignment["MIDSV"].split(",")) - 1
+            gap = current_alignment["POS"] - 1 - previous_end
+            sam_template["MIDSV"] += ",=N" * gap + "," + current_alignment["MIDSV"]
+            if "QSCORE" in sam_template:
+                sam_template["QSCORE"] += ",-1" * gap + "," + current_alignment["QSCORE"]
+        sam_merged.append(sam_template)
+    return sam_merged
+
+
+def _polish_legacy(alignments: list[dict], sqheaders: dict[str, int]) -> list[dict]:
+    polished = []
+    for alignment in _merge_legacy(alignments):
+        ref_length = sqheaders[alignment["RNAME"]]
+        left_pad = max(0, alignment["POS"] - 1)
+        right_pad = max(0, ref_length - (len(alignment["MIDSV"].split(",")) + left_pad))
+        alignment["MIDSV"] = "=N," * left_pad + alignment["MIDSV"] + ",=N" * right_pad
+        if "QSCORE" in alignment:
+            alignment["QSCORE"] = "-1," * left_pad + alignment["QSCORE"] + ",-1" * right_pad
+        if len(alignment["MIDSV"].split(",")) != ref_length:
+            continue
+        polished.append(alignment)
+    return polisher.select(polished)
+
+
+###########################################################
+# Random reads
+###########################################################
+
+
+def random_alignment(rng: random.Random, qname: str, pos: int, reference_length: int, flag: int = 0) -> dict:
+    """Simulate an alignment with substitutions and indels covering reference_length bases."""
+    cstag = ["cs:Z:"]
+    query_length = 0
+    position = 0
+    while position < reference_length:
+        event = rng.random()
+        if event < 0.03:
+            ref, alt = rng.sample("acgt", 2)
+            cstag.append(f"*{ref}{alt}")
+            position += 1
+            query_length += 1
+        elif event < 0.05:
+            length = min(rng.randint(1, 5), reference_length - position)
+            cstag.append("-" + "".join(rng.choices("acgt", k=length)))
+            position += length
+        elif event < 0.07 and position > 0:
+            length = rng.randint(1, 5)
+            cstag.append("+" + "".join(rng.choices("acgt", k=length)))
+            query_length += length
+        else:
+            length = min(rng.randint(1, 60), reference_length - position)
+            cstag.append("=" + "".join(rng.choices("ACGT", k=length)))
+            position += length
+            query_length += length
+    qual = "".join(rng.choices("+5?I", k=query_length))
+    alignment = {"QNAME": qname, "FLAG": flag, "RNAME": "ref", "POS": pos, "CIGAR": "*", "SEQ": "*", "QUAL": qual}
+    alignment["CSTAG"] = "".join(cstag)
+    return alignment
+
+
+def random_reads(rng: random.Random, reference_length: int, num_reads: int) -> list[list[dict]]:
+    """Half of the reads span the reference, and the others have a large deletion near the 3' end.
+    The supplementary alignments are kept short, because the microhomology search is quadratic in their length.
+    """
+    groups = []
+    for i in range(num_reads):
+        if i % 2 == 0:
+            groups.append([random_alignment(rng, f"read{i}", 1, reference_length)])
+            continue
+        deletion = rng.randint(100, 300)
+        breakpoint = reference_length - deletion - 200
+        groups.append(
+            [
+                random_alignment(rng, f"read{i}", 1, breakpoint),
+                random_alignment(rng, f"read{i}", breakpoint + deletion + 1, 200),
+            ]
+        )
+    return groups
+
+
+def run_legacy(groups: list[list[dict]], sqheaders: dict[str, int]) -> list[dict]:
+    return [r for group in groups for r in _polish_legacy(_convert_legacy(deepcopy(group), True), sqheaders)]
+
+
+def run_new(groups: list[list[dict]], sqheaders: dict[str, int]) -> list[dict]:
+    return [r for group in groups for r in polisher.polish(converter.convert(deepcopy(group), True), sqheaders)]
+
+
+def peak_memory(function, *args) -> int:
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    rng = random.Random(1)
+    converter.set_cache_size(0)  # measure the conversion of every read
+
+    print(f"{'reference length':>16} {'legacy (ms/read)':>17} {'new (ms/read)':>14} {'speedup':>8}", end=" ")
+    print(f"{'peak (legacy/new, MB)':>22}")
+    for reference_length in [1_000, 10_000, 50_000]:
+        sqheaders = {"ref": reference_length}
+        groups = random_reads(rng, reference_length, 20)
+        assert run_legacy(groups, sqheaders) == run_new(groups, sqheaders)
+
+        number = max(1, 100_000 // reference_length)
+        legacy = min(timeit.repeat(lambda: run_legacy(groups, sqheaders), number=number, repeat=3))
+        new = min(timeit.repeat(lambda: run_new(groups, sqheaders), number=number, repeat=3))
+        legacy, new = legacy / number / len(groups) * 1000, new / number / len(groups) * 1000
+        peak_legacy = peak_memory(run_legacy, groups, sqheaders) / 1e6
+        peak_new = peak_memory(run_new, groups, sqheaders) / 1e6
+        print(
+            f"{reference_length:>16,} {legacy:>17.3f} {new:>14.3f} {legacy / new:>7.2f}x "
+            f"{peak_legacy:>10.1f} / {peak_new:<9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Helpers shared by the benchmarks: simulated reads, writing them as SAM, and measuring a function.
+
+The benchmarks are run as scripts from the repository root, so this module is imported as `common`.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+
+###########################################################
+# Simulated reads
+###########################################################
+
+
+def short_read(rng: random.Random, qname: str, pos: int, read_length: int) -> list[str]:
+    """Simulate a read aligned at POS with a substitution in the middle."""
+    left = "".join(rng.choices("ACGT", k=read_length // 2))
+    right = "".join(rng.choices("ACGT", k=read_length - len(left) - 1))
+    ref, alt = rng.sample("acgt", 2)
+    seq = left + alt.upper() + right
+    qual = "".join(rng.choices("+5?I", k=read_length))
+    cstag = f"cs:Z:={left}*{ref}{alt}={right}"
+    return [qname, "0", "ref", str(pos), "60", f"{read_length}M", "*", "0", "0", seq, qual, cstag]
+
+
+def random_short_reads(
+    rng: random.Random, reference_length: int, read_length: int, num_reads: int
+) -> Iterator[list[str]]:
+    """Simulate short reads at random positions of the reference."""
+    for i in range(num_reads):
+        pos = rng.randint(1, reference_length - read_length + 1)
+        yield short_read(rng, f"read{i}", pos, read_length)
+
+
+def long_read(rng: random.Random, qname: str, reference_length: int) -> list[str]:
+    """Simulate a read spanning the reference with substitutions and small indels."""
+    cstag, cigar, query = [], [], []
+    position = 0
+    while position < reference_length:
+        event = rng.random()
+        if event < 0.02:
+            ref, alt = rng.sample("acgt", 2)
+            cstag.append(f"*{ref}{alt}")
+            cigar.append("1M")
+            query.append(alt.upper())
+            position += 1
+        elif event < 0.03:
+            length = min(rng.randint(1, 5), reference_length - position)
+            cstag.append("-" + "".join(rng.choices("acgt", k=length)))
+            cigar.append(f"{length}D")
+            position += length
+        elif event < 0.04 and position > 0:
+            bases = "".join(rng.choices("acgt", k=rng.randint(1, 5)))
+            cstag.append("+" + bases)
+            cigar.append(f"{len(bases)}I")
+            query.append(bases.upper())
+        else:
+            bases = "".join(rng.choices("ACGT", k=min(rng.randint(1, 100), reference_length - position)))
+            cstag.append("=" + bases)
+            cigar.append(f"{len(bases)}M")
+            query.append(bases)
+            position += len(bases)
+    seq = "".join(query)
+    qual = "".join(rng.choices("+5?I", k=len(seq)))
+    return [qname, "0", "ref", "1", "60", "".join(cigar), "*", "0", "0", seq, qual, "cs:Z:" + "".join(cstag)]
+
+
+def write_sam(path_sam: Path, reads: Iterable[list[str]], reference_length: int) -> None:
+    """Write reads on a reference named 'ref' as a SAM file."""
+    with open(path_sam, "w") as f:
+        f.write(f"@SQ\tSN:ref\tLN:{reference_length}\n")
+        for read in reads:
+            f.write("\t".join(read) + "\n")
+
+
+###########################################################
+# Measurement
+###########################################################
+
+
+def measure(function: Callable, *args, **kwargs) -> tuple[float, float, object]:
+    """Call a function, returning the elapsed seconds, the peak memory traced in MB, and its result."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, result
+
+
+def measure_time(function: Callable, *args, **kwargs) -> tuple[float, object]:
+    """Call a function without tracing memory, which slows it down, returning the elapsed seconds and its result."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
@@ -2,6 +2,7 @@
 .. include:: ../../README.md
 """
 
-from .main import transform
+from .main import transform, transform_batches, transform_iter
+from .polisher import expand
 
-__all__ = ["transform"]
+__all__ = ["transform", "transform_iter", "transform_batches", "expand"]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import zlib
+from pathlib import Path
+
+from midsv import io
+
+# Bump when the conversion result for the same input and arguments changes
+CACHE_VERSION = 1
+MAX_CACHE_BYTES = 1 << 30
+_SUFFIX = ".midsv.cache"
+
+###########################################################
+# Cache key
+###########################################################
+
+
+def fingerprint(path_input: str | Path, checksum: bool = False) -> dict[str, str | int]:
+    """Identify an input file by its path, size and modification time.
+
+    Args:
+        path_input (str | Path): Path of an input file.
+        checksum (bool, optional): Add the SHA-256 of the file content, so that the key does not depend on
+            the modification time only. Defaults to False.
+
+    Returns:
+        dict[str, str | int]: path, size, mtime_ns and optionally sha256 of the file
+    """
+    path_input = Path(path_input).resolve()
+    stat = path_input.stat()
+    identity = {"path": str(path_input), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if checksum:
+        sha256 = hashlib.sha256()
+        with open(path_input, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(chunk)
+        identity["sha256"] = sha256.hexdigest()
+    return identity
+
+
+def make_key(path_input: str | Path, checksum: bool = False, **arguments) -> str:
+    """Make a cache key from the fingerprint of the input file and the arguments of the conversion."""
+    identity = {
+        "version": CACHE_VERSION,
+        "input": fingerprint(path_input, checksum),
+        "arguments": arguments,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+
+###########################################################
+# Load / Store
+###########################################################
+
+
+def load(cache_dir: str | Path, key: str) -> object | None:
+    """Load a cached result. The cache directory must be trusted, as the result is unpickled.
+    A truncated or corrupt entry, e.g. left by a crash or a full disk, is removed and treated as missing.
+
+    Returns:
+        object | None: the cached result, or None if there is no valid entry of the key
+    """
+    path_cache = Path(cache_dir, key + _SUFFIX)
+    try:
+        data = path_cache.read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        result = pickle.loads(zlib.decompress(data))
+    except (zlib.error, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+        path_cache.unlink(missing_ok=True)
+        return None
+    os.utime(path_cache)  # mark as recently used
+    return result
+
+
+def evict(cache_dir: str | Path, max_bytes: int = MAX_CACHE_BYTES) -> None:
+    """Remove the least recently used entries until the total size is within max_bytes."""
+    entries = []
+    for path_cache in Path(cache_dir).glob("*" + _SUFFIX):
+        try:
+            stat = path_cache.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path_cache))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path_cache in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        path_cache.unlink(missing_ok=True)
+        total_bytes -= size
+
+
+def store(cache_dir: str | Path, key: str, result: object, max_bytes: int = MAX_CACHE_BYTES) -> None:
+    """Store a result in the cache directory, and evict old entries to keep the total size within max_bytes."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    data = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    io.write_atomic(Path(cache_dir, key + _SUFFIX), data)
+    evict(cache_dir, max_bytes)
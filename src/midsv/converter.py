@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Sequence
+from functools import lru_cache
+
+from midsv import formatter, runlength
 
 ###########################################################
 # MIDSV conversion (from CS tag to MIDSV)
 ###########################################################
 
+# An operation and its payload, e.g. "=ACGT" -> ("=", "ACGT")
+_CSTAG_PATTERN = re.compile(r"([=*+~-])([^=*+~-]*)")
+_SPLICE_PATTERN = re.compile(r"[a-z]+([0-9]+)[a-z]+")
+_SPLICE_LENGTH_PATTERN = re.compile(r"[0-9]+")
+
 
 def split_cstag(cstag: str) -> list[str]:
     """Split cstag
@@ -19,83 +28,222 @@ def split_cstag(cstag: str) -> list[str]:
         >>> convert.split_cstag(cstag)
         "['=ACGT', '*ag', '=C', '-g', '=T', '+t', '=ACGT']"
     """
-    cstag_splitted = []
-    for cs in re.split(r"(=|\*|\-|\+|\~)", cstag):
-        if not cs or cs == "cs:Z:":
-            continue
-        if re.match(r"(=|\*|\-|\+|\~)", cs):
-            cstag_splitted.append(cs)
-        else:
-            cstag_splitted[-1] += cs
-    return cstag_splitted
+    return [op + payload for op, payload in _CSTAG_PATTERN.findall(cstag)]
 
 
 ###########################################################
-# Convert to MIDSV
+# Trim CS tag to a region
 ###########################################################
 
 
-def _process_insertion(cstag_splitted: list[str], i: int, midsv_tags: list[str]) -> None:
-    """Process insertion operation in cstag.
+def _qual_length(op: str, payload: str) -> int:
+    """Number of QUAL characters consumed by an operation, as in the MIDSV conversion"""
+    if op == "=":
+        return len(payload) - payload.upper().count("N")
+    if op == "*":
+        return 1 if payload else 0
+    if op == "+":
+        return len(payload)
+    return 0
+
+
+def trim_cstag(
+    cstag: str, pos: int, start: int, end: int, qual: str | None = None
+) -> tuple[str, int, str | None] | None:
+    """Trim a cs tag to the reference positions from start to end (1-based, inclusive), so that only that portion
+    is converted. An insertion belongs to the next position, which is its anchor in MIDSV.
+    QUAL is trimmed to the bases of the trimmed cs tag: deletions, splices and `N` of matches do not consume QUAL.
 
     Args:
-        cstag_splitted (list[str]): Split cstag components.
-        i (int): Current index.
-        midsv_tags (list[str]): List to append processed results.
-    """
-    insertion: str = "+" + "|+".join(cstag_splitted[i][1:])
-    if i + 1 == len(cstag_splitted):
-        midsv_tags.append(insertion)
-        return
-
-    next_cstag: str = cstag_splitted[i + 1]
-    next_op: str = next_cstag[0]
-
-    if next_op == "*":
-        midsv_tags.append(insertion + "|" + next_cstag)
-        cstag_splitted[i + 1] = "*"
-    elif next_op == "~":
-        insertion += "|=N"
-        midsv_tags.append(insertion)
-        splice_match = re.match(r"([a-z]+)([0-9]+)([a-z]+)", next_cstag[1:])
-        if splice_match:
-            left, splice, right = splice_match.groups()
-            cstag_splitted[i + 1] = f"{next_op}{left}{int(splice) - 1}{right}"
-    else:
-        insertion += "|" + next_cstag[:2]
-        midsv_tags.append(insertion)
-        cstag_splitted[i + 1] = next_op + next_cstag[2:]
+        cstag (str): a long format cstag
+        pos (int): POS of the alignment
+        start (int): the first reference position to keep
+        end (int): the last reference position to keep
+        qual (str, optional): QUAL in SAM format. Defaults to None.
+
+    Returns:
+        tuple[str, int, str | None] | None: the trimmed cs tag, its POS and QUAL, or None if no operation is kept
 
+    Examples:
+        >>> convert.trim_cstag("cs:Z:=ACGT+tt=AC", 1, 3, 5, "12345678")
+        ("cs:Z:=GT+tt=A", 3, "34567")
+    """
+    ops = []
+    ref = pos  # reference position of the operation
+    idx = 0  # position in QUAL
+    new_pos = qual_start = qual_end = None
+
+    for op, payload in _CSTAG_PATTERN.findall(cstag):
+        if ref > end:
+            break
+        if op == "+":
+            if ref >= start:
+                ops.append(op + payload)
+                new_pos = ref if new_pos is None else new_pos
+                qual_start = idx if qual_start is None else qual_start
+                qual_end = idx + len(payload)
+            idx += len(payload)
+            continue
 
-def _process_splice(cs: str, midsv_tags: list[str]) -> None:
-    """Process splice operation in cstag.
+        if op == "*":
+            length = 1
+        elif op == "~":
+            length = _splice_length(payload) or 0
+        else:
+            length = len(payload)
+
+        first, last = max(ref, start), min(ref + length - 1, end)
+        if first <= last:
+            if op == "*":
+                kept_payload = payload
+            elif op == "~":
+                kept_payload = _SPLICE_LENGTH_PATTERN.sub(str(last - first + 1), payload, count=1)
+            else:
+                kept_payload = payload[first - ref : last - ref + 1]
+            ops.append(op + kept_payload)
+            new_pos = first if new_pos is None else new_pos
+            qual_first = idx + _qual_length(op, payload[: first - ref])
+            qual_start = qual_first if qual_start is None else qual_start
+            qual_end = qual_first + _qual_length(op, kept_payload)
+        idx += _qual_length(op, payload)
+        ref += length
+
+    if not ops:
+        return None
+    if qual is not None:
+        qual = qual[qual_start:qual_end]
+    return "cs:Z:" + "".join(ops), new_pos, qual
+
+
+def trim_to_region(alignments: list[dict[str, str | int]], region: tuple[str, int, int]) -> list[dict[str, str | int]]:
+    """Trim CSTAG, POS and QUAL of a read with a single alignment to a region before conversion.
+    A read without alignments overlapping the region is removed without walking its cs tags.
+    The alignments of a read with several are left whole, since their microhomology is measured on whole MIDSV
+    (see `midsv.polisher.merge`): the merged record is cropped to the region by `midsv.polisher.crop`, and its
+    CSTAG and QUAL by `trim_fields_to_region`.
 
     Args:
-        cs (str): Current cstag component.
-        midsv_tags (list[str]): List to append processed results.
+        alignments (list[dict[str, str | int]]): dictionarized SAM of a read on the reference of the region
+        region (tuple[str, int, int]): RNAME, START and END of the region (1-based, inclusive)
+
+    Returns:
+        list[dict[str, str | int]]: dictionarized SAM trimmed to the region
     """
-    splice_match = re.match(r"([a-z]+)([0-9]+)([a-z]+)", cs[1:])
-    if splice_match:
-        _, splice, _ = splice_match.groups()
-        midsv_tags.extend(["=N"] * int(splice))
+    if not any(formatter.overlaps_region(alignment, region) for alignment in alignments):
+        return []
+    if len(alignments) > 1:
+        return alignments
+
+    _, start, end = region
+    alignment = alignments[0]
+    trimmed = trim_cstag(alignment["CSTAG"], alignment["POS"], start, end, alignment.get("QUAL"))
+    if trimmed is None:
+        return []
+    alignment["CSTAG"], alignment["POS"], qual = trimmed
+    if "QUAL" in alignment:
+        alignment["QUAL"] = qual
+    return alignments
+
+
+def trim_fields_to_region(
+    alignments: list[dict[str, str | int]], region: tuple[str, int, int]
+) -> list[dict[str, str | int]]:
+    """Trim CSTAG and QUAL of converted alignments to a region, for the fields kept in the output.
+    POS is left as it is for merging, and trimmed by `midsv.polisher.crop`.
+    An alignment outside of the region gets an empty cs tag and QUAL.
+    """
+    _, start, end = region
+    for alignment in alignments:
+        if "CSTAG" not in alignment:
+            continue
+        trimmed = trim_cstag(alignment["CSTAG"], alignment["POS"], start, end, alignment.get("QUAL"))
+        alignment["CSTAG"], _, qual = trimmed or ("cs:Z:", start, "")
+        if "QUAL" in alignment:
+            alignment["QUAL"] = qual
+    return alignments
 
 
-def _process_match(cs: str, midsv_tags: list[str]) -> None:
-    """Process default operation in cstag.
+###########################################################
+# Convert to MIDSV
+###########################################################
 
-    Args:
-        cs (str): Current cstag component.
-        midsv_tags (list[str]): List to append processed results.
+
+class _TokenTable(dict):
+    """Shared MIDSV tokens of an operation and a base, e.g. "=" and "A" -> "=A".
+    Reusing the same string objects keeps token lists small and avoids allocating a string per base.
     """
-    cs_list: list[str] = list(cs[1:])
-    midsv_tags.append(cs[0] + f",{cs[0]}".join(cs_list))
 
+    def __init__(self, op: str) -> None:
+        super().__init__()
+        self.op = op
+
+    def __missing__(self, base: str) -> str:
+        token = self[base] = self.op + base
+        return token
+
+
+_TOKEN_TABLES = {"=": _TokenTable("="), "-": _TokenTable("-")}
+
+
+def _splice_length(payload: str) -> int | None:
+    splice_match = _SPLICE_PATTERN.match(payload)
+    if splice_match:
+        return int(splice_match.group(1))
+    return None
+
+
+def _cstag_to_midsv_tokens(cstag: str, rle: bool = False) -> list[str]:
+    midsv_tags: list[str] = []
+    insertion: str | None = None  # e.g. "+T|+T|", waiting for its anchor
+
+    for op, payload in _CSTAG_PATTERN.findall(cstag):
+        if insertion is not None:
+            if op == "*":
+                midsv_tags.append(insertion + op + payload.upper())
+                insertion = None
+                continue
+            if op == "~":
+                midsv_tags.append(insertion + "=N")
+                insertion = None
+                splice = _splice_length(payload)
+                if splice and splice > 1:
+                    midsv_tags.extend([runlength.run("=N", splice - 1)] if rle else ["=N"] * (splice - 1))
+                continue
+            midsv_tags.append(insertion + op + payload[:1].upper())
+            insertion = None
+            payload = payload[1:]
+
+        if not payload:
+            continue
+
+        if op == "+":
+            insertion = "+" + "|+".join(payload.upper()) + "|"
+        elif op == "*":
+            midsv_tags.append(op + payload.upper())
+        elif op == "~":
+            splice = _splice_length(payload)
+            if splice:
+                midsv_tags.extend([runlength.run("=N", splice)] if rle else ["=N"] * splice)
+        else:
+            midsv_tags.extend(map(_TOKEN_TABLES[op].__getitem__, payload.upper()))
+
+    if insertion is not None:
+        midsv_tags.append(insertion[:-1])
+
+    return midsv_tags
 
-def cstag_to_midsv(cstag: str) -> str:
+
+def cstag_to_midsv(cstag: str, rle: bool = False) -> str:
     """Generate MIDSV, a comma-separated nucreotide sequence
 
+    The cs tag is walked once, and MIDSV tokens are emitted directly.
+    An insertion is held until the next operation, which becomes its anchor:
+    a substitution or the first base of a match or deletion is appended to the insertion,
+    and a splice contributes its first `=N`.
+
     Args:
         cstag (str): a long format cstag
+        rle (bool, optional): Emit a splice as a run such as `=N*10`. Defaults to False.
 
     Returns:
         str: MIDSV
@@ -108,55 +256,213 @@ def cstag_to_midsv(cstag: str) -> str:
         >>> cstag = "cs:Z:=A~ta10cg=T"
         >>> convert.cstag_to_midsv(cstag)
         "=A,=N,=N,=N,=N,=N,=N,=N,=N,=N,=N,=T"
+
+        >>> convert.cstag_to_midsv(cstag, rle=True)
+        "=A,=N*10,=T"
     """
-    cstag_splitted: list[str] = split_cstag(cstag)
+    return ",".join(_cstag_to_midsv_tokens(cstag, rle))
 
-    midsv_converted: list[str] = []
 
-    for i, cs in enumerate(cstag_splitted):
-        if len(cs) == 1:
-            continue
+###########################################################
+# Convert to MIDSV and QSCORE at once
+###########################################################
+
+
+# Steps of a QSCORE plan, which builds QSCORE from the Phred scores of QUAL (see `_cstag_to_qscore_plan`)
+_SLICE = 0  # (_SLICE, start, end): the scores of QUAL[start:end]
+_CONSTANT = 1  # (_CONSTANT, token, count): a token such as "-1" repeated
+_INSERTION = 2  # (_INSERTION, start, end, anchor): the scores of QUAL[start:end] joined by "|", then the anchor
 
-        op: str = cs[0]
+
+def _add_slice(plan: list[tuple], start: int, end: int) -> None:
+    if plan and plan[-1][0] == _SLICE and plan[-1][2] == start:
+        plan[-1] = (_SLICE, plan[-1][1], end)
+    else:
+        plan.append((_SLICE, start, end))
+
+
+def _add_constant(plan: list[tuple], token: str, count: int) -> None:
+    if plan and plan[-1][0] == _CONSTANT and plan[-1][1] == token:
+        plan[-1] = (_CONSTANT, token, plan[-1][2] + count)
+    else:
+        plan.append((_CONSTANT, token, count))
+
+
+def _cstag_to_qscore_plan(cstag: str, rle: bool = False) -> tuple[list[str], list[tuple], int]:
+    """Walk the cs tag once, emitting the MIDSV tokens of `_cstag_to_midsv_tokens` together with a plan of QSCORE.
+    The plan depends on the cs tag only, so it is memoized and applied to the QUAL of each read
+    (see `_apply_qscore_plan`). Consecutive matches and substitutions become a single slice of QUAL.
+    The scores are the same as `qual_to_qscore`: deletions, splices and `=N` are -1 and do not consume QUAL.
+
+    Returns:
+        tuple[list[str], list[tuple], int]: MIDSV tokens, the plan, and the length of QUAL consumed
+    """
+    midsv_tags: list[str] = []
+    plan: list[tuple] = []
+    idx = 0  # position in QUAL
+    insertion: str | None = None
+    insertion_start = 0  # the inserted bases are QUAL[insertion_start:idx], waiting for the anchor
+
+    for op, payload in _CSTAG_PATTERN.findall(cstag):
+        if insertion is not None:
+            if op == "*":
+                midsv_tags.append(insertion + op + payload.upper())
+                plan.append((_INSERTION, insertion_start, idx, idx))
+                idx += 1
+                insertion = None
+                continue
+            if op == "~":
+                midsv_tags.append(insertion + "=N")
+                plan.append((_INSERTION, insertion_start, idx, "-1"))
+                insertion = None
+                splice = _splice_length(payload)
+                if splice and splice > 1:
+                    if rle:
+                        midsv_tags.append(runlength.run("=N", splice - 1))
+                        _add_constant(plan, runlength.run("-1", splice - 1), 1)
+                    else:
+                        midsv_tags.extend(["=N"] * (splice - 1))
+                        _add_constant(plan, "-1", splice - 1)
+                continue
+            anchor = op + payload[:1].upper()
+            midsv_tags.append(insertion + anchor)
+            if op == "-" or anchor == "=N":
+                plan.append((_INSERTION, insertion_start, idx, "-1"))
+            else:
+                plan.append((_INSERTION, insertion_start, idx, idx))
+                idx += 1
+            insertion = None
+            payload = payload[1:]
+
+        if not payload:
+            continue
 
         if op == "+":
-            _process_insertion(cstag_splitted, i, midsv_converted)
+            insertion = "+" + "|+".join(payload.upper()) + "|"
+            insertion_start = idx
+            idx += len(payload)
         elif op == "*":
-            midsv_converted.append(cs)
+            midsv_tags.append(op + payload.upper())
+            _add_slice(plan, idx, idx + 1)
+            idx += 1
         elif op == "~":
-            _process_splice(cs, midsv_converted)
+            splice = _splice_length(payload)
+            if splice:
+                if rle:
+                    midsv_tags.append(runlength.run("=N", splice))
+                    _add_constant(plan, runlength.run("-1", splice), 1)
+                else:
+                    midsv_tags.extend(["=N"] * splice)
+                    _add_constant(plan, "-1", splice)
+        elif op == "-":
+            midsv_tags.extend(map(_TOKEN_TABLES[op].__getitem__, payload.upper()))
+            _add_constant(plan, "-1", len(payload))
         else:
-            _process_match(cs, midsv_converted)
+            payload = payload.upper()
+            midsv_tags.extend(map(_TOKEN_TABLES[op].__getitem__, payload))
+            if "N" not in payload:
+                _add_slice(plan, idx, idx + len(payload))
+                idx += len(payload)
+                continue
+            for base in payload:
+                if base == "N":
+                    _add_constant(plan, "-1", 1)
+                else:
+                    _add_slice(plan, idx, idx + 1)
+                    idx += 1
+
+    if insertion is not None:
+        midsv_tags.append(insertion[:-1])
+        plan.append((_INSERTION, insertion_start, idx, None))
+
+    return midsv_tags, plan, idx
+
+
+def _apply_qscore_plan(plan: Sequence[tuple], scores: list[str]) -> list[str]:
+    """Build QSCORE from a plan of `_cstag_to_qscore_plan` and the Phred scores of QUAL."""
+    qscore: list[str] = []
+    for step in plan:
+        kind = step[0]
+        if kind == _SLICE:
+            qscore.extend(scores[step[1] : step[2]])
+        elif kind == _CONSTANT:
+            qscore.extend([step[1]] * step[2])
+        else:
+            _, start, end, anchor = step
+            inserted = "|".join(scores[start:end])
+            if anchor is None:
+                qscore.append(inserted)
+            elif isinstance(anchor, int):
+                qscore.append(inserted + "|" + scores[anchor])
+            else:
+                qscore.append(inserted + "|" + anchor)
+    return qscore
 
-    return ",".join(cs.upper() for cs in midsv_converted)
 
+def _check_qual_length(qual: str, query_length: int) -> None:
+    if len(qual) < query_length:
+        raise ValueError("QUAL is shorter than the query sequence in the cs tag")
 
-###########################################################
-# Phred score
-###########################################################
 
+def _cstag_to_midsv_qscore_tokens(cstag: str, qual: str, rle: bool = False) -> tuple[list[str], list[str]]:
+    """Emit the MIDSV tokens of `_cstag_to_midsv_tokens` together with their scores,
+    which are sliced from QUAL converted to Phred scores in advance.
+    """
+    midsv_tags, plan, query_length = _cstag_to_qscore_plan(cstag, rle)
+    _check_qual_length(qual, query_length)
+    return midsv_tags, _apply_qscore_plan(plan, qual_to_phred(qual))
 
-def ascii_to_phred(ascii: str) -> str:
-    return str(ord(ascii) - 33)
 
-
-def qual_to_qscore(qual: str, midsv_tag: str) -> str:
-    """Convert ascii quality to phred score.
-    To adjust the same length as midsv tags, insertion is discarded and deletion is interpolated as -1.
+def cstag_to_midsv_qscore(cstag: str, qual: str, rle: bool = False) -> tuple[str, str]:
+    """Generate MIDSV and QSCORE in a single walk of the cs tag.
+    The result is the same as `cstag_to_midsv` followed by `qual_to_qscore`.
 
     Args:
+        cstag (str): a long format cstag
         qual (str): QUAL in SAM format
-        midsv_tag (str): midsv_tag
+        rle (bool, optional): Emit a splice as runs such as `=N*10` and `-1*10`. Defaults to False.
 
     Returns:
-        str: Phred quality score with indel compensation ('-1' is assigned to the deletion loci.)
+        tuple[str, str]: MIDSV and QSCORE
+
+    Examples:
+        >>> convert.cstag_to_midsv_qscore("cs:Z:=A+t=C-a*ag", "!+5?")
+        ("=A,+T|=C,-A,*AG", "0,10|20,-1,30")
     """
+    midsv_tags, qscore = _cstag_to_midsv_qscore_tokens(cstag, qual, rle)
+    return ",".join(midsv_tags), ",".join(qscore)
+
+
+###########################################################
+# Phred score
+###########################################################
+
+
+class _PhredTable(dict):
+    """Phred scores of QUAL characters as strings, e.g. "I" -> "40", computed once per character."""
+
+    def __missing__(self, ascii: str) -> str:
+        score = self[ascii] = str(ord(ascii) - 33)
+        return score
+
+
+_PHRED_TABLE = _PhredTable((chr(i), str(i - 33)) for i in range(33, 127))
+
+
+def ascii_to_phred(ascii: str) -> str:
+    return _PHRED_TABLE[ascii]
+
+
+def _qual_to_qscore_tokens(qual: str, midsv_tags: Sequence[str]) -> list[str]:
     qscore = []
     idx = 0
-    for tag in midsv_tag.split(","):
+    for tag in midsv_tags:
         if tag.startswith("-") or tag == "=N":
             qscore.append("-1")
             idx -= 1
+        elif tag.startswith("=N*"):
+            qscore.append("-1" + tag[2:])
+            idx -= 1
         elif tag.startswith("+"):
             num_insertion = len(tag.split("|")) - 1
             insertion = []
@@ -166,13 +472,89 @@ def qual_to_qscore(qual: str, midsv_tag: str) -> str:
                 insertion.append("-1")
                 idx -= 1
             else:
-                insertion.append(ascii_to_phred(qual[j + 1]))
+                insertion.append(ascii_to_phred(qual[idx + num_insertion]))
             qscore.append("".join(insertion))
             idx += num_insertion
         else:
             qscore.append(ascii_to_phred(qual[idx]))
         idx += 1
-    return ",".join(qscore)
+    return qscore
+
+
+def qual_to_phred(qual: str) -> list[str]:
+    """Convert every character of QUAL to a Phred score by the lookup table."""
+    return list(map(_PHRED_TABLE.__getitem__, qual))
+
+
+def qual_to_qscore(qual: str, midsv_tag: str) -> str:
+    """Convert ascii quality to phred score.
+    To adjust the same length as midsv tags, insertion is discarded and deletion is interpolated as -1.
+    A run of unknown nucleotides such as `=N*10` becomes a run of `-1*10`.
+
+    Args:
+        qual (str): QUAL in SAM format
+        midsv_tag (str): midsv_tag
+
+    Returns:
+        str: Phred quality score with indel compensation ('-1' is assigned to the deletion loci.)
+    """
+    return ",".join(_qual_to_qscore_tokens(qual, midsv_tag.split(",")))
+
+
+###########################################################
+# Memoization
+###########################################################
+
+# Maximum number of memoized results per function.
+# Reads in deep amplicon sequencing often share the same cs tag, so they are converted only once.
+# QUAL is rarely shared by reads, so it is not part of the key: with QSCORE, the memoized plan of the cs tag
+# is applied to the QUAL of each read.
+# The results are held as immutable tuples of tokens, and copied to lists for each alignment.
+CACHE_SIZE = 1024
+
+
+def _cstag_to_midsv_tuple(cstag: str, rle: bool) -> tuple[str, ...]:
+    return tuple(_cstag_to_midsv_tokens(cstag, rle))
+
+
+def _cstag_to_qscore_plan_tuple(cstag: str, rle: bool) -> tuple[tuple[str, ...], tuple[tuple, ...], int]:
+    midsv_tags, plan, query_length = _cstag_to_qscore_plan(cstag, rle)
+    return tuple(midsv_tags), tuple(plan), query_length
+
+
+_cstag_to_midsv_cached = lru_cache(maxsize=CACHE_SIZE)(_cstag_to_midsv_tuple)
+_cstag_to_qscore_plan_cached = lru_cache(maxsize=CACHE_SIZE)(_cstag_to_qscore_plan_tuple)
+
+
+def set_cache_size(maxsize: int | None) -> None:
+    """Set the maximum number of memoized results of cstag_to_midsv and cstag_to_midsv_qscore.
+    The memoized results and counters are cleared.
+
+    The size counts results, not bytes, and each result holds the MIDSV of a whole read: with 30 kb reads, the default
+    size can retain hundreds of MB. For long reads, whose cs tags are rarely shared, lower the size or disable it by 0.
+
+    Args:
+        maxsize (int | None): Maximum number of results. 0 disables memoization, and None makes it unbounded.
+    """
+    global _cstag_to_midsv_cached, _cstag_to_qscore_plan_cached
+    _cstag_to_midsv_cached = lru_cache(maxsize=maxsize)(_cstag_to_midsv_tuple)
+    _cstag_to_qscore_plan_cached = lru_cache(maxsize=maxsize)(_cstag_to_qscore_plan_tuple)
+
+
+def cache_info() -> dict[str, tuple[int, int, int | None, int]]:
+    """Return hits, misses, maxsize and currsize of the memoized cstag_to_midsv (without QSCORE)
+    and cstag_to_midsv_qscore (with QSCORE). Both are keyed on the cs tag only.
+    Note that each worker process of `midsv.transform(workers=N)` has its own memo.
+    """
+    return {
+        "cstag_to_midsv": _cstag_to_midsv_cached.cache_info(),
+        "cstag_to_midsv_qscore": _cstag_to_qscore_plan_cached.cache_info(),
+    }
+
+
+def clear_cache() -> None:
+    _cstag_to_midsv_cached.cache_clear()
+    _cstag_to_qscore_plan_cached.cache_clear()
 
 
 ###########################################################
@@ -180,9 +562,22 @@ def qual_to_qscore(qual: str, midsv_tag: str) -> str:
 ###########################################################
 
 
-def convert(samdict: list[dict[str, str | int]], qscore: bool = False) -> list[dict[str, str | int]]:
+def convert(
+    samdict: list[dict[str, str | int]], qscore: bool = False, rle: bool = False
+) -> list[dict[str, str | int | list[str]]]:
+    """Add MIDSV (and QSCORE) to each alignment as lists of tokens.
+    With qscore, both are generated in a single walk of the cs tag, memoized on the cs tag and applied to QUAL.
+    The lists are carried through `midsv.polisher.polish`, which joins them into comma-separated strings.
+    """
     for alignment in samdict:
-        alignment["MIDSV"] = cstag_to_midsv(alignment["CSTAG"])
         if qscore:
-            alignment["QSCORE"] = qual_to_qscore(alignment["QUAL"], alignment["MIDSV"])
+            midsv_tags, plan, query_length = _cstag_to_qscore_plan_cached(alignment["CSTAG"], rle)
+            try:
+                _check_qual_length(alignment["QUAL"], query_length)
+            except ValueError as e:
+                raise ValueError(f"{e} (QNAME '{alignment['QNAME']}')") from None
+            alignment["MIDSV"] = list(midsv_tags)
+            alignment["QSCORE"] = _apply_qscore_plan(plan, qual_to_phred(alignment["QUAL"]))
+        else:
+            alignment["MIDSV"] = list(_cstag_to_midsv_cached(alignment["CSTAG"], rle))
     return samdict
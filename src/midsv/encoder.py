@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from midsv import runlength
+
+###########################################################
+# NumPy
+###########################################################
+
+
+def import_numpy():
+    """NumPy is an optional dependency that is only required for the array output."""
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("output='array' requires NumPy. Install it by `pip install midsv[array]`") from e
+    return np
+
+
+def _code_dtype(np, num_tokens: int):
+    """Return the smallest unsigned integer type that can hold the token codes."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if num_tokens <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+def _anchor_qscore(qscore: str) -> int:
+    """Return the score of the reference base. Insertion sites such as '30|30|35' end with the anchor base."""
+    return int(qscore.rpartition("|")[2])
+
+
+###########################################################
+# Encode MIDSV as integer arrays
+###########################################################
+
+
+def encode(alignments: Iterable[dict[str, str | int]]) -> dict[str, object]:
+    """Encode MIDSV records as integer matrices stacked by RNAME.
+    Each MIDSV token is replaced by its index in a vocabulary shared across all references,
+    and QSCORE is stored as int8 with the score of the anchor base at insertion sites.
+
+    Args:
+        alignments (Iterable[dict[str, str | int]]): polished SAM, whose MIDSV has the reference length.
+            Run-length encoded MIDSV and QSCORE are expanded.
+
+    Returns:
+        dict[str, object]: {"VOCAB": list of MIDSV tokens, "RNAME": {RNAME: fields}}, where fields has
+            MIDSV as a (reads x reference length) matrix of token codes, QSCORE as an int8 matrix of the same shape
+            if it exists, and lists of the other fields such as QNAME in the order of the reads.
+    """
+    np = import_numpy()
+    vocab: dict[str, int] = {}
+    references: dict[str, dict[str, list]] = {}
+
+    for alignment in alignments:
+        fields = references.setdefault(alignment["RNAME"], {})
+        midsv = runlength.decode(alignment["MIDSV"]).split(",")
+        codes = np.fromiter((vocab.setdefault(token, len(vocab)) for token in midsv), np.uint32, len(midsv))
+        fields.setdefault("MIDSV", []).append(codes)
+        if "QSCORE" in alignment:
+            qscore = runlength.decode(alignment["QSCORE"]).split(",")
+            scores = np.fromiter(map(_anchor_qscore, qscore), np.int8, len(qscore))
+            fields.setdefault("QSCORE", []).append(scores)
+        for key, value in alignment.items():
+            if key not in {"RNAME", "MIDSV", "QSCORE"}:
+                fields.setdefault(key, []).append(value)
+
+    dtype = _code_dtype(np, len(vocab))
+    for fields in references.values():
+        fields["MIDSV"] = np.vstack(fields["MIDSV"]).astype(dtype)
+        if "QSCORE" in fields:
+            fields["QSCORE"] = np.vstack(fields["QSCORE"])
+
+    return {"VOCAB": list(vocab), "RNAME": references}
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 import re
-from collections.abc import Iterator
-from itertools import groupby
+from array import array
+from collections.abc import Iterable, Iterator, MutableMapping
+from itertools import chain, groupby
+from operator import attrgetter, itemgetter
+from typing import NamedTuple
+
+from midsv import validator
 
 ###########################################################
 # Format headers and alignments
@@ -21,22 +26,136 @@ def extract_sqheaders(sam: list[list[str]] | Iterator[list[str]]) -> dict[str, i
     sqheaders = [s for s in sam if "@SQ" in s]
     header_snln = {}
     for sqheader in sqheaders:
-        snln = [sq for sq in sqheader if re.search(("SN:|LN:"), sq)]
-        sn = snln[0].replace("SN:", "")
-        ln = snln[1].replace("LN:", "")
-        header_snln.update({sn: int(ln)})
+        header_snln.update(_parse_sqheader(sqheader))
     return header_snln
 
 
+def _parse_sqheader(sqheader: list[str]) -> dict[str, int]:
+    snln = [sq for sq in sqheader if re.search(("SN:|LN:"), sq)]
+    sn = snln[0].replace("SN:", "")
+    ln = snln[1].replace("LN:", "")
+    return {sn: int(ln)}
+
+
 ###########################################################
-# Remove undesired reads
+# Group alignments by QNAME
+###########################################################
+
+
+def group_alignments(alignments: Iterable[dict[str, str | int]]) -> Iterator[list[dict[str, str | int]]]:
+    """Group alignments by QNAME in a single pass with a dictionary, instead of sorting all alignments.
+    Groups are yielded in the sorted order of QNAME, and alignments keep their input order within a group.
+    Only the QNAMEs are sorted, and not even those when the input is already sorted by QNAME.
+    Each group is released as it is yielded, so processed alignments do not stay in memory.
+
+    Args:
+        alignments (Iterable[dict[str, str | int]]): disctionalized alignments
+
+    Returns:
+        Iterator[list[dict[str, str | int]]]: lists of alignments sharing a QNAME
+    """
+    groups: dict[str, list[dict[str, str | int]]] = {}
+    is_sorted = True
+    last_qname = None
+    for alignment in alignments:
+        qname = alignment["QNAME"]
+        group = groups.get(qname)
+        if group is not None:
+            group.append(alignment)
+            continue
+        if last_qname is not None and qname < last_qname:
+            is_sorted = False
+        last_qname = qname
+        groups[qname] = [alignment]
+
+    qnames = list(groups) if is_sorted else sorted(groups)
+    return (groups.pop(qname) for qname in qnames)
+
+
 ###########################################################
+# Parse CIGAR
+###########################################################
+
+_CIGAR_PATTERN = re.compile(r"([0-9]+)([MIDNSHP=X])")
 
 
-def split_cigar(cigar: str) -> list[str]:
-    cigar_iter = iter(re.split(r"([MIDNSHPX=])", cigar))
-    cigar_splitted = [i + op for i, op in zip(cigar_iter, cigar_iter)]
-    return cigar_splitted
+class Cigar(NamedTuple):
+    """CIGAR parsed into operation lengths and operations.
+
+    Attributes:
+        lengths (array): length of each operation
+        ops (str): operation characters, one per operation
+        reference_span (int): number of reference bases consumed by M, D, N, = and X
+        query_span (int): number of query bases consumed by M, I, = and X, which is SEQ without soft clips
+        left_clip (int): length of the soft clip at the start of the read
+        right_clip (int): length of the soft clip at the end of the read
+    """
+
+    lengths: array
+    ops: str
+    reference_span: int
+    query_span: int
+    left_clip: int
+    right_clip: int
+
+
+def parse_cigar(cigar: str) -> Cigar:
+    """Parse a CIGAR string. Alignments store the result by `get_cigar`, so that each CIGAR is parsed once."""
+    lengths = array("I")
+    ops = []
+    reference_span = query_span = 0
+    for length, op in _CIGAR_PATTERN.findall(cigar):
+        length = int(length)
+        lengths.append(length)
+        ops.append(op)
+        if op in "MDN=X":
+            reference_span += length
+        if op in "MI=X":
+            query_span += length
+    ops = "".join(ops)
+
+    # Soft clips are at the ends, or inside hard clips
+    clipped = ops.strip("H")
+    left_clip = lengths[ops.index("S")] if clipped.startswith("S") else 0
+    right_clip = lengths[ops.rindex("S")] if clipped.endswith("S") and len(clipped) > 1 else 0
+
+    return Cigar(lengths, ops, reference_span, query_span, left_clip, right_clip)
+
+
+def get_cigar(alignment: dict[str, str | int]) -> Cigar:
+    """Return the parsed CIGAR of an alignment, which is parsed once and stored as PARSED_CIGAR."""
+    cigar = alignment.get("PARSED_CIGAR")
+    if cigar is None:
+        cigar = alignment["PARSED_CIGAR"] = parse_cigar(alignment["CIGAR"])
+    return cigar
+
+
+def iter_qname_groups(
+    alignments: Iterable[dict[str, str | int]], check_grouped: bool = False
+) -> Iterator[list[dict[str, str | int]]]:
+    """Group alignments by QNAME as they are read, for input that is grouped by QNAME (e.g. minimap2 output).
+    Only the current group is held, so a QNAME that appears again after other reads is yielded as another group.
+
+    Args:
+        alignments (Iterable[dict[str, str | int]]): disctionalized alignments grouped by QNAME
+        check_grouped (bool, optional): Remember the QNAMEs already yielded and raise an error if one appears
+            again. The memory grows with the number of reads. Defaults to False.
+
+    Returns:
+        Iterator[list[dict[str, str | int]]]: lists of alignments sharing a QNAME, in the input order
+    """
+    qnames = set() if check_grouped else None
+    for qname, group in groupby(alignments, key=itemgetter("QNAME")):
+        if qnames is not None:
+            if qname in qnames:
+                raise ValueError(f"Input is not grouped by QNAME: '{qname}' appears again after other reads")
+            qnames.add(qname)
+        yield list(group)
+
+
+###########################################################
+# Remove undesired reads
+###########################################################
 
 
 def remove_softclips(alignments: list[dict[str, str | int]]) -> list[dict[str, str | int]]:
@@ -50,71 +169,95 @@ def remove_softclips(alignments: list[dict[str, str | int]]) -> list[dict[str, s
     """
     alignments_softclips_removed = []
     for alignment in alignments:
-        cigar = alignment["CIGAR"]
-        if "S" not in cigar:
-            alignments_softclips_removed.append(alignment)
-            continue
-        cigar_split = split_cigar(cigar)
-        left, right = cigar_split[0], cigar_split[-1]
-        if "S" in left:
-            left = int(left[:-1])
-            alignment["SEQ"] = alignment["SEQ"][left:]
-            alignment["QUAL"] = alignment["QUAL"][left:]
-        if "S" in right:
-            right = int(right[:-1])
-            alignment["SEQ"] = alignment["SEQ"][:-right]
-            alignment["QUAL"] = alignment["QUAL"][:-right]
+        cigar = get_cigar(alignment)
+        if cigar.left_clip:
+            alignment["SEQ"] = alignment["SEQ"][cigar.left_clip :]
+            if "QUAL" in alignment:
+                alignment["QUAL"] = alignment["QUAL"][cigar.left_clip :]
+        if cigar.right_clip:
+            alignment["SEQ"] = alignment["SEQ"][: -cigar.right_clip]
+            if "QUAL" in alignment:
+                alignment["QUAL"] = alignment["QUAL"][: -cigar.right_clip]
         alignments_softclips_removed.append(alignment)
     return alignments_softclips_removed
 
 
-def _return_end_of_current_read(alignment: dict[str, str | int]) -> int:
-    start_of_current_read = alignment["POS"]
-    cigar = alignment["CIGAR"]
-    cigar_split = split_cigar(cigar)
-    alignment_length = 0
-    for cig in cigar_split:
-        if "M" in cig or "D" in cig or "N" in cig:
-            alignment_length += int(cig[:-1])
-    return start_of_current_read + alignment_length - 1
-
+def filter_region(
+    alignments: Iterable[dict[str, str | int]], region: tuple[str, int, int]
+) -> Iterator[dict[str, str | int]]:
+    """Skip alignments on references other than that of a region, before they are grouped.
+    Alignments outside of the region on the same reference are kept, since they are merged with the alignments
+    of their reads in the region (see `midsv.converter.trim_to_region`).
+    """
+    rname = region[0]
+    return (alignment for alignment in alignments if alignment["RNAME"] == rname)
 
-def _padding_n_to_sequence(alignment: dict[str, str | int]) -> dict[str, str | int]:
-    """Discard insertion, and add deletion and spliced nucleotides to unify sequence length"""
-    cigar = alignment["CIGAR"]
-    cigar_operations = split_cigar(cigar)
-    sequence = alignment["SEQ"]
 
-    unified_sequence = []
-    unified_sequence.append("N" * (alignment["POS"] - 1))
-    start_position = 0
+def filter_qnames(alignments: Iterable[dict[str, str | int]], qnames: list[str]) -> Iterator[dict[str, str | int]]:
+    """Skip alignments of reads other than qnames, before they are grouped."""
+    qnames = set(qnames)
+    return (alignment for alignment in alignments if alignment["QNAME"] in qnames)
 
-    def process_match(operation: str):
-        nonlocal start_position
-        length = int(operation[:-1])
-        end_position = start_position + length
-        unified_sequence.append(sequence[start_position:end_position])
-        start_position = end_position
 
-    def process_insertion(operation: str):
-        nonlocal start_position
-        length = int(operation[:-1])
-        start_position += length
+def overlaps_region(alignment: dict[str, str | int], region: tuple[str, int, int]) -> bool:
+    """Whether the reference span of an alignment, given by its CIGAR, overlaps a region"""
+    _, start, end = region
+    return alignment["POS"] <= end and alignment["POS"] + get_cigar(alignment).reference_span - 1 >= start
 
-    def process_deletion_or_splice(operation: str):
-        length = int(operation[:-1])
-        unified_sequence.append("N" * length)
 
-    for operation in cigar_operations:
-        if "M" in operation:
-            process_match(operation)
-        elif "I" in operation:
-            process_insertion(operation)
-        elif "D" in operation or "N" in operation:
-            process_deletion_or_splice(operation)
+def _aligned_blocks(alignment: dict[str, str | int]) -> tuple[int, int, list[tuple[int, int, int]]]:
+    """Parse the CIGAR once into the reference intervals of an alignment.
 
-    alignment["SEQ"] = "".join(unified_sequence)
-    return alignment
+    Returns:
+        tuple[int, int, list[tuple[int, int, int]]]: the end position on the reference,
+            the length of the aligned sequence (SEQ without insertions, with deletions and splices as N),
+            and (offset in the aligned sequence, length, offset in SEQ or -1 for N) of each M, D and N operation
+    """
+    cigar = get_cigar(alignment)
+    sequence_length = len(alignment["SEQ"])
+    blocks = []
+    aligned_length = 0
+    seq_offset = 0
+    for length, op in zip(cigar.lengths, cigar.ops):
+        if op in "M=X":
+            # A SEQ shorter than the CIGAR is truncated, as in slicing
+            length_in_seq = min(length, max(0, sequence_length - seq_offset))
+            blocks.append((aligned_length, length_in_seq, seq_offset))
+            aligned_length += length_in_seq
+            seq_offset += length
+        elif op == "I":
+            seq_offset += length
+        elif op in "DN":
+            blocks.append((aligned_length, length, -1))
+            aligned_length += length
+    return alignment["POS"] + cigar.reference_span - 1, aligned_length, blocks
+
+
+def _slice_padded_sequence(
+    alignment: dict[str, str | int], aligned_length: int, blocks: list[tuple[int, int, int]], start: int, end: int
+) -> str:
+    """Return [start:end] of the SEQ padded to the reference coordinate, that is `N * (POS - 1)` followed by
+    the aligned sequence, generating only the requested range instead of the whole padded sequence.
+    """
+    padding = alignment["POS"] - 1
+    end = min(end, padding + aligned_length)
+    if start >= end:
+        return ""
+    pieces = ["N" * (min(end, padding) - start)] if start < padding else []
+    start, end = max(start - padding, 0), end - padding
+    sequence = alignment["SEQ"]
+    for block_start, length, seq_offset in blocks:
+        block_end = block_start + length
+        if block_end <= start:
+            continue
+        if block_start >= end:
+            break
+        lower, upper = max(start, block_start), min(end, block_end)
+        if seq_offset < 0:
+            pieces.append("N" * (upper - lower))
+        else:
+            pieces.append(sequence[seq_offset + lower - block_start : seq_offset + upper - block_start])
+    return "".join(pieces)
 
 
 def remove_resequence(alignments: list[dict[str, str | int]]) -> list[dict[str, str | int]]:
@@ -126,64 +269,211 @@ def remove_resequence(alignments: list[dict[str, str | int]]) -> list[dict[str,
     (2) Overlapped but not the same DNA sequence
     The resequenced fragments will be discarded and the longest alignment will be retain.
     Example reads are in `tests/data/overlap/real_overlap.sam` and `tests/data/overlap/real_overlap2.sam`
+    The reference intervals of each alignment are computed once, and only the overlapping range is compared.
 
     Args:
         alignments (list[dict[str, str | int]]): disctionalized alignments
 
     Returns:
-        list[dict[str, str | int]]: disctionalized SAM with removed overlaped reads
+        list[dict[str, str | int]]: disctionalized SAM with removed overlaped reads, sorted by QNAME and POS
     """
 
-    def is_resequence(prev_read: dict[str, str | int], curr_read: dict[str, str | int]) -> bool:
+    def is_resequence(prev_read: tuple, curr_read: tuple) -> bool:
         """Check if the current read is a resequence of the previous read."""
-        start_overlap = max(prev_read["POS"], curr_read["POS"])
-        end_overlap = min(_return_end_of_current_read(prev_read), _return_end_of_current_read(curr_read))
+        (prev_alignment, prev_end, prev_length, prev_blocks) = prev_read
+        (curr_alignment, curr_end, curr_length, curr_blocks) = curr_read
+        prev_pos, curr_pos = prev_alignment["POS"], curr_alignment["POS"]
 
-        if prev_read["POS"] <= curr_read["POS"] and _return_end_of_current_read(
-            prev_read
-        ) >= _return_end_of_current_read(curr_read):
+        if prev_pos <= curr_pos and prev_end >= curr_end:
             return True  # Completely contained
 
-        overlap_prev = prev_read["SEQ"][start_overlap - prev_read["POS"] : end_overlap - prev_read["POS"]]
-        overlap_curr = curr_read["SEQ"][start_overlap - curr_read["POS"] : end_overlap - curr_read["POS"]]
-
-        for prev_base, curr_base in zip(overlap_prev, overlap_curr):
-            if prev_base != "=N" and curr_base != "=N" and prev_base != curr_base:
-                return True  # Overlapped but different sequences
+        # The overlap is sliced at `position - POS` of the padded sequences, as in previous versions
+        start_overlap = max(prev_pos, curr_pos)
+        end_overlap = min(prev_end, curr_end)
+        overlap_prev = _slice_padded_sequence(
+            prev_alignment, prev_length, prev_blocks, start_overlap - prev_pos, end_overlap - prev_pos
+        )
+        overlap_curr = _slice_padded_sequence(
+            curr_alignment, curr_length, curr_blocks, start_overlap - curr_pos, end_overlap - curr_pos
+        )
 
-        return False
+        # Overlapped but different sequences
+        length = min(len(overlap_prev), len(overlap_curr))
+        return overlap_prev[:length] != overlap_curr[:length]
 
-    alignments.sort(key=lambda x: x["QNAME"])
-    grouped_alignments = groupby(alignments, key=lambda x: x["QNAME"])
     filtered_alignments = []
 
-    for _, group in grouped_alignments:
-        group = sorted((_padding_n_to_sequence(alignment) for alignment in group), key=lambda x: x["POS"])
+    for group in group_alignments(alignments):
+        if len(group) == 1:
+            filtered_alignments.extend(group)
+            continue
+
+        reads = sorted(((alignment, *_aligned_blocks(alignment)) for alignment in group), key=lambda x: x[0]["POS"])
 
         retained_alignments = []
-        longest_alignment = max(group, key=lambda x: len(x["SEQ"]))
+        # The longest padded sequence
+        longest_alignment = max(reads, key=lambda x: x[0]["POS"] - 1 + x[2])[0]
 
-        for i, alignment in enumerate(group):
+        for i, read in enumerate(reads):
             if i == 0:
-                retained_alignments.append(alignment)
+                retained_alignments.append(read)
                 continue
 
-            if is_resequence(retained_alignments[-1], alignment):
-                retained_alignments = [longest_alignment]
+            if is_resequence(retained_alignments[-1], read):
+                retained_alignments = [(longest_alignment,)]
                 break
 
-            retained_alignments.append(alignment)
+            retained_alignments.append(read)
 
-        filtered_alignments.extend(retained_alignments)
+        filtered_alignments.extend(read[0] for read in retained_alignments)
 
     return filtered_alignments
 
 
+###########################################################
+# Alignment records
+###########################################################
+
+
+class Alignment(MutableMapping):
+    """An alignment used from the parsed SAM to the polished record, with its fields stored in __slots__
+    instead of a per-alignment dictionary. It behaves as a dictionary whose keys are limited to __slots__.
+    Fields that are None are missing, and deleting a field sets it to None.
+    `midsv.polisher.select` turns it into a dictionary.
+    """
+
+    __slots__ = (
+        "QNAME",
+        "FLAG",
+        "RNAME",
+        "POS",
+        "CIGAR",
+        "SEQ",
+        "QUAL",
+        "CSTAG",
+        "PARSED_CIGAR",
+        "MIDSV",
+        "QSCORE",
+        "START",
+        "END",
+    )
+
+    def __init__(
+        self,
+        QNAME: str | None = None,
+        FLAG: int | None = None,
+        RNAME: str | None = None,
+        POS: int | None = None,
+        CIGAR: str | None = None,
+        SEQ: str | None = None,
+        QUAL: str | None = None,
+        CSTAG: str | None = None,
+        PARSED_CIGAR: Cigar | None = None,
+        MIDSV: str | list[str] | None = None,
+        QSCORE: str | list[str] | None = None,
+        START: int | None = None,
+        END: int | None = None,
+    ) -> None:
+        self.QNAME = QNAME
+        self.FLAG = FLAG
+        self.RNAME = RNAME
+        self.POS = POS
+        self.CIGAR = CIGAR
+        self.SEQ = SEQ
+        self.QUAL = QUAL
+        self.CSTAG = CSTAG
+        self.PARSED_CIGAR = PARSED_CIGAR
+        self.MIDSV = MIDSV
+        self.QSCORE = QSCORE
+        self.START = START
+        self.END = END
+
+    def __getitem__(self, key: str) -> object:
+        value = getattr(self, key, None) if key in _ALIGNMENT_FIELDS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: object) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(f"{key} is not a field of Alignment") from None
+
+    def __delitem__(self, key: str) -> None:
+        self.pop(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in _ALIGNMENT_FIELDS and getattr(self, key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def __len__(self) -> int:
+        return len(self.items())
+
+    def __repr__(self) -> str:
+        return f"Alignment({dict(self.items())!r})"
+
+    # The methods below are faster than those of MutableMapping, which go through __iter__ and __getitem__
+
+    def items(self) -> list[tuple[str, object]]:
+        return [(key, value) for key, value in zip(self.__slots__, _get_alignment_fields(self)) if value is not None]
+
+    def get(self, key: str, default: object = None) -> object:
+        value = getattr(self, key, None) if key in _ALIGNMENT_FIELDS else None
+        return default if value is None else value
+
+    def pop(self, key: str, *default: object) -> object:
+        value = getattr(self, key, None) if key in _ALIGNMENT_FIELDS else None
+        if value is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        setattr(self, key, None)
+        return value
+
+    def copy(self) -> Alignment:
+        """Shallow copy, as dict.copy"""
+        return Alignment(*_get_alignment_fields(self))
+
+
+_ALIGNMENT_FIELDS = frozenset(Alignment.__slots__)
+_get_alignment_fields = attrgetter(*Alignment.__slots__)
+
+
 ###########################################################
 # alignments_to_dict
 ###########################################################
 
 
+def _alignment_to_dict(alignment: list[str], idx_cstag: int) -> dict[str, str | int]:
+    return dict(
+        QNAME=alignment[0].replace(",", "_"),
+        FLAG=int(alignment[1]),
+        RNAME=alignment[2],
+        POS=int(alignment[3]),
+        CIGAR=alignment[5],
+        SEQ=alignment[9],
+        QUAL=alignment[10],
+        CSTAG=alignment[idx_cstag],
+    )
+
+
+def _alignment_to_record(alignment: list[str], idx_cstag: int, qual: bool = True) -> Alignment:
+    # Positional arguments, which are faster than keyword arguments for every alignment
+    return Alignment(
+        alignment[0].replace(",", "_"),  # QNAME
+        int(alignment[1]),  # FLAG
+        alignment[2],  # RNAME
+        int(alignment[3]),  # POS
+        alignment[5],  # CIGAR
+        alignment[9],  # SEQ
+        alignment[10] if qual else None,  # QUAL
+        alignment[idx_cstag],  # CSTAG
+    )
+
+
 def alignments_to_dict(sam: list[list[str]] | Iterator[list[str]]) -> list[dict[str, str | int]]:
     """Extract mapped alignments from SAM
 
@@ -207,20 +497,23 @@ def alignments_to_dict(sam: list[list[str]] | Iterator[list[str]]) -> list[dict[
         if idx_cstag is None:
             continue
 
-        alignments = dict(
-            QNAME=alignment[0].replace(",", "_"),
-            FLAG=int(alignment[1]),
-            RNAME=alignment[2],
-            POS=int(alignment[3]),
-            CIGAR=alignment[5],
-            SEQ=alignment[9],
-            QUAL=alignment[10],
-            CSTAG=alignment[idx_cstag],
-        )
-        aligns.append(alignments)
+        aligns.append(_alignment_to_dict(alignment, idx_cstag))
     return aligns
 
 
+def organize_alignments(alignments: Iterable[dict[str, str | int]]) -> list[dict[str, str | int]]:
+    """Remove softclips and resequenced fragments from dictionalized alignments
+
+    Args:
+        alignments (Iterable[dict[str, str | int]]): disctionalized alignments
+
+    Returns:
+        list[dict[str, str | int]]: alignments sorted by QNAME and POS
+    """
+    aligns = remove_softclips(alignments)
+    return remove_resequence(aligns)
+
+
 def organize_alignments_to_dict(sam: list[list[str]] | Iterator[list[str]]) -> list[dict[str, str | int]]:
     """Extract mapped alignments from SAM
 
@@ -230,11 +523,76 @@ def organize_alignments_to_dict(sam: list[list[str]] | Iterator[list[str]]) -> l
     Returns:
         list[dict[str, str | int]]: a dictionary containing QNAME, RNAME, POS, QUAL, CSTAG and RLEN
     """
-    aligns = alignments_to_dict(sam)
-    aligns = remove_softclips(aligns)
-    aligns = remove_resequence(aligns)
+    return organize_alignments(alignments_to_dict(sam))
+
+
+###########################################################
+# Parse SAM in a single pass
+###########################################################
+
+
+def _iter_validated_alignments(
+    sam: Iterator[tuple[int, list[str]]], qscore: bool = False, qual: bool = True
+) -> Iterator[Alignment]:
+    has_alignment = False
+    for line_number, alignment in sam:
+        if alignment[0].startswith("@"):
+            continue
+        try:
+            idx_cstag = validator.sam_alignment(alignment, qscore)
+        except ValueError as e:
+            raise ValueError(f"{e} (line {line_number})") from None
+        if idx_cstag is None:
+            continue
+        has_alignment = True
+        yield _alignment_to_record(alignment, idx_cstag, qual)
 
-    return sorted(aligns, key=lambda x: [x["QNAME"], x["POS"]])
+    if not has_alignment:
+        raise ValueError("No alignment information")
+
+
+def parse_sam(
+    sam: list[list[str]] | Iterator[list[str]], qscore: bool = False, keep: list[str] | None = None
+) -> tuple[dict[str, int], Iterator[Alignment]]:
+    """Validate SAM, extract SQ headers and dictionalize alignments as `Alignment` in a single pass.
+    The header section is consumed immediately; alignments are validated and dictionalized lazily
+    as the returned iterator is consumed. Validation errors report the line number of the offending alignment.
+
+    Args:
+        sam (list[list[str]] | Iterator[list[str]]): a list of lists of SAM format including CS tag
+        qscore (bool, optional): Require QUAL information. Defaults to False.
+        keep (list[str], optional): Fields to be kept in the output. QUAL is not dictionalized unless it is kept
+            or qscore is True. Defaults to None (all fields).
+
+    Returns:
+        tuple[dict[str, int], Iterator[Alignment]]: SN and LN of SQ headers, and dictionalized alignments
+    """
+    sam_numbered = enumerate(sam, start=1)
+    sqheaders = {}
+    for line_number, record in sam_numbered:
+        if not record[0].startswith("@"):
+            sam_numbered = chain([(line_number, record)], sam_numbered)
+            break
+        if "@SQ" in record:
+            sqheaders.update(_parse_sqheader(record))
+
+    if not sqheaders:
+        raise ValueError("Input does not have @SQ header")
+
+    # QUAL is only needed to calculate QSCORE or to be kept
+    qual = keep is None or qscore or "QUAL" in keep
+    return sqheaders, _iter_validated_alignments(sam_numbered, qscore, qual)
+
+
+def drop_fields(alignments: list[dict[str, str | int]], fields: Iterable[str]) -> list[dict[str, str | int]]:
+    """Remove fields that are no longer needed, so that large strings such as SEQ and QUAL are released
+    as soon as the last step using them is done.
+    """
+    fields = list(fields)
+    for alignment in alignments:
+        for field in fields:
+            alignment.pop(field, None)
+    return alignments
 
 
 ###########################################################
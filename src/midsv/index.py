@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import json
+import zlib
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from midsv import formatter, io
+
+# Bump when the layout of the index changes
+INDEX_VERSION = 2
+# Width of the bins of the linear index, as in tabix
+BIN_SIZE = 1 << 14
+_SUFFIX = ".midsv.idx"
+
+###########################################################
+# Sidecar index of a SAM file
+###########################################################
+
+
+class SamIndex(NamedTuple):
+    """Byte offsets of the records of an uncompressed SAM file.
+    Byte ranges are [start, end) and always cover whole lines.
+
+    Attributes:
+        size (int): size of the SAM file when it was indexed
+        mtime_ns (int): modification time of the SAM file when it was indexed
+        header_end (int): offset of the first alignment, where the header section ends
+        coordinate_sorted (bool): the alignments of each RNAME are contiguous and sorted by POS
+        rnames (dict[str, list[int]]): byte range of the alignments of each RNAME, if coordinate sorted
+        bins (dict[str, list[int]]): offset of the first alignment overlapping each bin of BIN_SIZE bases of
+            each RNAME, or -1 if no alignment overlaps the bin, if coordinate sorted
+        qnames (list[str]): QNAMEs in the order of their first alignments, with "," replaced by "_" as in
+            `midsv.formatter.parse_sam`
+        qname_ranges (list[int]): byte ranges of the alignments of the QNAMEs, flattened as start, end, start, ...
+            A QNAME has a single range if the SAM file is grouped by QNAME.
+        qname_bounds (list[int]): the byte ranges of qnames[i] are qname_ranges[qname_bounds[i]:qname_bounds[i + 1]].
+            The QNAMEs are held in flat lists rather than a dictionary of lists, which is several times faster
+            to load.
+    """
+
+    size: int
+    mtime_ns: int
+    header_end: int
+    coordinate_sorted: bool
+    rnames: dict[str, list[int]]
+    bins: dict[str, list[int]]
+    qnames: list[str]
+    qname_ranges: list[int]
+    qname_bounds: list[int]
+
+
+def index_path(path_sam: str | Path) -> Path:
+    """Path of the sidecar index of a SAM file, next to it"""
+    return Path(str(path_sam) + _SUFFIX)
+
+
+def _is_compressed(path_sam: Path) -> bool:
+    with open(path_sam, "rb") as f:
+        return f.read(2) == io._GZIP_MAGIC
+
+
+def _add_to_bins(bins: list[int], pos: int, cigar: str, offset: int) -> None:
+    """Record the offset of an alignment in the bins it overlaps, unless an earlier alignment is recorded."""
+    reference_span = formatter.parse_cigar(cigar).reference_span if cigar != "*" else 0
+    first_bin = (pos - 1) // BIN_SIZE
+    last_bin = (pos + max(reference_span, 1) - 2) // BIN_SIZE
+    if len(bins) <= last_bin:
+        bins.extend([-1] * (last_bin + 1 - len(bins)))
+    for i in range(first_bin, last_bin + 1):
+        if bins[i] < 0:
+            bins[i] = offset
+
+
+def build_index(path_sam: str | Path) -> SamIndex:
+    """Index a SAM file in a single pass and store the index next to it (see `index_path`).
+    `midsv.transform` uses the index to read only the records of a region or of reads, as long as the SAM file
+    is not modified.
+
+    Args:
+        path_sam (str | Path): Path of an uncompressed SAM file. Compressed files cannot be indexed because
+            their byte offsets cannot be sought.
+
+    Returns:
+        SamIndex: the index of the SAM file
+    """
+    path_sam = Path(path_sam)
+    if _is_compressed(path_sam):
+        raise ValueError("Only uncompressed SAM files can be indexed")
+    stat = path_sam.stat()
+
+    header_end = None
+    coordinate_sorted = True
+    rnames: dict[str, list[int]] = {}
+    bins: dict[str, list[int]] = {}
+    qnames: dict[str, list[int]] = {}
+    last_rname = None
+    last_pos = 0
+    offset = 0
+    with open(path_sam, "rb") as f:
+        for line_number, line in enumerate(f, start=1):
+            start, offset = offset, offset + len(line)
+            if line.startswith(b"@") or not line.strip(b"\r\n"):
+                continue
+            if header_end is None:
+                header_end = start
+
+            fields = line.split(b"\t", 6)
+            try:
+                qname, rname, pos, cigar = fields[0].decode(), fields[2].decode(), int(fields[3]), fields[5].decode()
+            except (IndexError, ValueError):
+                raise ValueError(f"Alignment may not be SAM format (line {line_number})") from None
+            qname = qname.replace(",", "_")  # as in midsv.formatter.parse_sam
+
+            ranges = qnames.get(qname)
+            if ranges is None:
+                qnames[qname] = [start, offset]
+            elif ranges[-1] == start:
+                ranges[-1] = offset
+            else:
+                ranges += [start, offset]
+
+            if not coordinate_sorted:
+                continue
+            if rname != last_rname:
+                if rname in rnames:
+                    coordinate_sorted = False
+                    continue
+                rnames[rname] = [start, offset]
+                bins[rname] = []
+                last_rname, last_pos = rname, 0
+            if pos < last_pos:
+                coordinate_sorted = False
+                continue
+            last_pos = pos
+            rnames[rname][1] = offset
+            if rname != "*":
+                _add_to_bins(bins[rname], pos, cigar, start)
+
+    if not coordinate_sorted:
+        rnames, bins = {}, {}
+    qname_ranges, qname_bounds = [], [0]
+    for ranges in qnames.values():
+        qname_ranges += ranges
+        qname_bounds.append(len(qname_ranges))
+    sam_index = SamIndex(
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        header_end=offset if header_end is None else header_end,
+        coordinate_sorted=coordinate_sorted,
+        rnames=rnames,
+        bins=bins,
+        qnames=list(qnames),
+        qname_ranges=qname_ranges,
+        qname_bounds=qname_bounds,
+    )
+    _store(index_path(path_sam), sam_index)
+    return sam_index
+
+
+###########################################################
+# Load / Store
+###########################################################
+
+
+def _store(path_index: Path, sam_index: SamIndex) -> None:
+    # JSON rather than pickle, since the index lies next to the SAM file and need not be trusted
+    data = zlib.compress(json.dumps({"version": INDEX_VERSION, **sam_index._asdict()}).encode(), 1)
+    io.write_atomic(path_index, data)
+
+
+def load_index(path_sam: str | Path) -> SamIndex | None:
+    """Load the index of a SAM file.
+
+    Returns:
+        SamIndex | None: the index, or None if the SAM file is not indexed or was modified after indexing
+    """
+    try:
+        data = json.loads(zlib.decompress(index_path(path_sam).read_bytes()))
+    except FileNotFoundError:
+        return None
+    if data.pop("version", None) != INDEX_VERSION:
+        return None
+    sam_index = SamIndex(**data)
+    stat = Path(path_sam).stat()
+    if (sam_index.size, sam_index.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+        return None
+    return sam_index
+
+
+###########################################################
+# Select and read records
+###########################################################
+
+
+def _iter_range_lines(f: BinaryIO, start: int, end: int) -> Iterator[tuple[int, str]]:
+    """Yield each line in a byte range with the offset where it ends"""
+    f.seek(start)
+    while start < end:
+        line = f.readline()
+        if not line:
+            break
+        start += len(line)
+        yield start, line.decode().rstrip("\r\n")
+
+
+def _merge_ranges(ranges: list[list[int]]) -> list[list[int]]:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _qname_ranges(sam_index: SamIndex, qnames: Iterable[str]) -> list[list[int]]:
+    """Byte ranges of the alignments of QNAMEs. Unknown QNAMEs are skipped."""
+    positions = {qname: i for i, qname in enumerate(sam_index.qnames)}
+    ranges = []
+    for qname in qnames:
+        i = positions.get(qname)
+        if i is None:
+            continue
+        flat = sam_index.qname_ranges[sam_index.qname_bounds[i] : sam_index.qname_bounds[i + 1]]
+        ranges.extend([flat[j], flat[j + 1]] for j in range(0, len(flat), 2))
+    return ranges
+
+
+def _region_ranges(f: BinaryIO, sam_index: SamIndex, region: tuple[str, int, int]) -> list[list[int]]:
+    """Byte ranges of the alignments overlapping a region and of the other alignments of their reads,
+    which are merged with them (see `midsv.converter.trim_to_region`).
+    """
+    rname, start, end = region
+    bins = sam_index.bins.get(rname, [])
+    offsets = [offset for offset in bins[(start - 1) // BIN_SIZE : (end - 1) // BIN_SIZE + 1] if offset >= 0]
+    if not offsets:
+        return []
+
+    # The alignments are sorted by POS, so those from the first offset up to POS > END may overlap the region
+    window_start = window_end = min(offsets)
+    qnames = set()
+    for line_end, line in _iter_range_lines(f, window_start, sam_index.rnames[rname][1]):
+        if not line or line.startswith("@"):
+            continue
+        fields = line.split("\t", 4)
+        if int(fields[3]) > end:
+            break
+        qnames.add(fields[0].replace(",", "_"))
+        window_end = line_end
+    return [[window_start, window_end], *_qname_ranges(sam_index, qnames)]
+
+
+def select_ranges(
+    path_sam: str | Path,
+    sam_index: SamIndex,
+    region: tuple[str, int, int] | None = None,
+    qnames: list[str] | None = None,
+) -> list[list[int]] | None:
+    """Byte ranges of the records needed to transform a region or reads, in the order of the SAM file.
+    The ranges may contain other records, which are filtered after parsing.
+
+    Returns:
+        list[list[int]] | None: merged byte ranges, or None if the index cannot narrow down the records, such as
+            a region of a SAM file that is not sorted by coordinate
+    """
+    if qnames is not None:
+        ranges = _qname_ranges(sam_index, qnames)
+    elif region is not None and sam_index.coordinate_sorted:
+        with open(path_sam, "rb") as f:
+            ranges = _region_ranges(f, sam_index, region)
+    else:
+        return None
+    return _merge_ranges(ranges)
+
+
+def read_ranges(path_sam: str | Path, sam_index: SamIndex, ranges: list[list[int]]) -> Iterator[list[str]]:
+    """Read the header and the records in byte ranges of a SAM file as lists of tab-separated fields,
+    in the same format as `midsv.io.read_sam`.
+    """
+    with open(path_sam, "rb") as f:
+        for start, end in [[0, sam_index.header_end], *ranges]:
+            yield from io._split_records(line for _, line in _iter_range_lines(f, start, end))
@@ -1,17 +1,332 @@
 from __future__ import annotations
 
+import gzip
 import json
-from collections.abc import Iterator
+import os
+import struct
+import tempfile
+import zlib
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BufferedWriter, TextIOWrapper
+from itertools import islice
 from pathlib import Path
+from typing import BinaryIO, TextIO
+
+from midsv import runlength
+
+###########################################################
+# Open (gzip-compressed) files
+###########################################################
+
+CHUNK_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _open_binary(path_input: str | Path) -> BinaryIO:
+    """Open a file for reading in binary mode, decompressing it if it is gzip-compressed."""
+    f = open(path_input, "rb")
+    if f.peek(2)[:2] == _GZIP_MAGIC:
+        f.close()
+        return gzip.open(path_input, "rb")
+    return f
+
+
+def _open_text_writer(path_output: str | Path) -> TextIO:
+    """Open a file for writing in text mode, compressing it by gzip if the suffix is '.gz'.
+    Writes are collected in a buffer of WRITE_BUFFER_SIZE bytes before they reach the compressor.
+    """
+    if Path(path_output).suffix == ".gz":
+        compressed = gzip.GzipFile(path_output, mode="wb", compresslevel=6)
+        return TextIOWrapper(BufferedWriter(compressed, buffer_size=WRITE_BUFFER_SIZE), encoding="utf-8")
+    return open(path_output, "w", buffering=WRITE_BUFFER_SIZE)
+
+
+def write_atomic(path_output: str | Path, data: bytes) -> None:
+    """Write data to a temporary file next to path_output and rename it, so that concurrent readers never see
+    a partial file. The temporary file is removed if the write or the rename fails.
+    """
+    path_output = Path(path_output)
+    f = tempfile.NamedTemporaryFile(dir=path_output.parent, suffix=".tmp", delete=False)
+    try:
+        with f:
+            f.write(data)
+        os.replace(f.name, path_output)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+
 
 ###########################################################
 # Read sam
 ###########################################################
 
 
-def read_sam(path_sam: str | Path) -> Iterator[list[str]]:
-    sam = Path(path_sam).read_text().strip().split("\n")
-    return (s.split("\t") for s in sam)
+def _iter_lines(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield lines from a binary stream, reading it in fixed-size chunks.
+    A line spanning several chunks is carried over until its newline is found. The pieces of the line are
+    collected in a list and joined once, so that a line much longer than chunk_size is not copied per chunk.
+    """
+    with f:
+        pieces = []
+        for chunk in iter(partial(f.read, chunk_size), b""):
+            head, newline, rest = chunk.rpartition(b"\n")
+            if not newline:
+                pieces.append(chunk)
+                continue
+            pieces.append(head)
+            yield from b"".join(pieces).decode().split("\n")
+            pieces = [rest]
+        tail = b"".join(pieces)
+        if tail:
+            yield tail.decode()
+
+
+def _split_records(lines: Iterator[str]) -> Iterator[list[str]]:
+    for line in lines:
+        line = line.rstrip("\r")
+        if not line:
+            continue
+        yield line.split("\t")
+
+
+def read_sam(path_sam: str | Path, chunk_size: int = CHUNK_SIZE) -> Iterator[list[str]]:
+    """Stream a SAM file as lists of tab-separated fields.
+    The file is read in chunks of `chunk_size` bytes, so memory usage does not depend on the file size.
+    Gzip-compressed SAM files are decompressed on the fly, and BAM files are detected by their magic number
+    and decoded by `read_bam`.
+
+    Args:
+        path_sam (str | Path): Path of a SAM, gzip-compressed SAM or BAM file.
+        chunk_size (int, optional): Number of bytes read at a time. Defaults to 1 MiB.
+
+    Returns:
+        Iterator[list[str]]: SAM records split by tab. Empty lines are skipped.
+    """
+    path_sam = Path(path_sam)
+    if _is_bam(path_sam):
+        return read_bam(path_sam)
+    f = _open_binary(path_sam)
+    return _split_records(_iter_lines(f, chunk_size))
+
+
+###########################################################
+# Read bam
+###########################################################
+
+_BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+_BAM_MAGIC = b"BAM\x01"
+_CIGAR_OPERATIONS = "MIDNSHP=X"
+_SEQ_TABLE = str.maketrans("0123456789abcdef", "=ACMGRSVTWYHKDBN")
+_QUAL_TABLE = bytes(min(i + 33, 255) for i in range(256))
+_AUX_INTEGER_FORMATS = {"c": "b", "C": "B", "s": "h", "S": "H", "i": "i", "I": "I"}
+_AUX_ARRAY_FORMATS = {**_AUX_INTEGER_FORMATS, "f": "f"}
+
+
+def _read_bgzf_blocks(f: BinaryIO) -> Iterator[tuple[bytes, int, int]]:
+    """Yield compressed BGZF blocks as (CDATA, CRC32, ISIZE) without decompressing them."""
+    while header := f.read(12):
+        if len(header) < 12 or header[:4] != _BGZF_MAGIC:
+            raise ValueError("Input is not BGZF format")
+        xlen = struct.unpack_from("<H", header, 10)[0]
+        extra = f.read(xlen)
+        bsize = None
+        offset = 0
+        while offset + 4 <= xlen:
+            si1, si2, slen = struct.unpack_from("<BBH", extra, offset)
+            if si1 == 66 and si2 == 67:  # "BC" subfield
+                bsize = struct.unpack_from("<H", extra, offset + 4)[0]
+            offset += 4 + slen
+        if bsize is None:
+            raise ValueError("Input is not BGZF format")
+        cdata = f.read(bsize - xlen - 19)
+        crc32, isize = struct.unpack("<II", f.read(8))
+        yield cdata, crc32, isize
+
+
+def _inflate_bgzf_block(block: tuple[bytes, int, int]) -> bytes:
+    cdata, crc32, isize = block
+    data = zlib.decompress(cdata, -15)
+    if len(data) != isize or zlib.crc32(data) != crc32:
+        raise ValueError("BGZF block is corrupted")
+    return data
+
+
+def _decompress_bgzf(f: BinaryIO, threads: int = 1) -> Iterator[bytes]:
+    """Decompress BGZF blocks in order. With `threads` > 1, blocks are inflated in a thread pool,
+    as zlib releases the GIL while decompressing.
+    """
+    blocks = _read_bgzf_blocks(f)
+    if threads == 1:
+        yield from map(_inflate_bgzf_block, blocks)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while batch := list(islice(blocks, threads * 4)):
+            yield from executor.map(_inflate_bgzf_block, batch)
+
+
+class _ByteStream:
+    """Read exact numbers of bytes from an iterator of byte chunks."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+        self._offset = 0
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) - self._offset < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._offset :] + chunk
+            self._offset = 0
+        data = self._buffer[self._offset : self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def read_int32(self) -> int | None:
+        data = self.read(4)
+        if len(data) < 4:
+            return None
+        return struct.unpack("<i", data)[0]
+
+
+def _is_bam(path_bam: Path) -> bool:
+    with open(path_bam, "rb") as f:
+        if f.read(4) != _BGZF_MAGIC:
+            return False
+        f.seek(0)
+        try:
+            return next(_decompress_bgzf(f), b"").startswith(_BAM_MAGIC)
+        except (ValueError, zlib.error, struct.error):
+            return False
+
+
+def _read_bam_header(stream: _ByteStream) -> tuple[list[list[str]], list[str]]:
+    if stream.read(4) != _BAM_MAGIC:
+        raise ValueError("Input is not BAM format")
+    text = stream.read(stream.read_int32()).rstrip(b"\x00").decode()
+    headers = [line.split("\t") for line in text.split("\n") if line]
+    references = []
+    sqheaders = []
+    for _ in range(stream.read_int32()):
+        name = stream.read(stream.read_int32()).rstrip(b"\x00").decode()
+        length = stream.read_int32()
+        references.append(name)
+        sqheaders.append(["@SQ", f"SN:{name}", f"LN:{length}"])
+    if not any(header[0] == "@SQ" for header in headers):
+        headers = sqheaders + headers
+    return headers, references
+
+
+def _format_aux_value(value: int | float) -> str:
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _decode_aux(data: bytes, offset: int) -> dict[str, str]:
+    """Decode optional fields into SAM-formatted strings such as 'cs:Z:=ACGT'."""
+    tags = {}
+    while offset < len(data):
+        tag = data[offset : offset + 2].decode()
+        value_type = chr(data[offset + 2])
+        offset += 3
+        if value_type == "A":
+            tags[tag] = f"{tag}:A:{chr(data[offset])}"
+            offset += 1
+        elif value_type in _AUX_INTEGER_FORMATS:
+            fmt = "<" + _AUX_INTEGER_FORMATS[value_type]
+            tags[tag] = f"{tag}:i:{struct.unpack_from(fmt, data, offset)[0]}"
+            offset += struct.calcsize(fmt)
+        elif value_type == "f":
+            tags[tag] = f"{tag}:f:{_format_aux_value(struct.unpack_from('<f', data, offset)[0])}"
+            offset += 4
+        elif value_type in {"Z", "H"}:
+            end = data.index(b"\x00", offset)
+            tags[tag] = f"{tag}:{value_type}:{data[offset:end].decode()}"
+            offset = end + 1
+        elif value_type == "B":
+            subtype = chr(data[offset])
+            count = struct.unpack_from("<i", data, offset + 1)[0]
+            fmt = f"<{count}{_AUX_ARRAY_FORMATS[subtype]}"
+            values = struct.unpack_from(fmt, data, offset + 5)
+            tags[tag] = ",".join([f"{tag}:B:{subtype}", *map(_format_aux_value, values)])
+            offset += 5 + struct.calcsize(fmt)
+        else:
+            raise ValueError(f"Unknown type '{value_type}' of optional field {tag}")
+    return tags
+
+
+def _decode_bam_record(data: bytes, references: list[str]) -> list[str]:
+    (ref_id, pos, l_read_name, mapq, _, n_cigar_op, flag, l_seq, next_ref_id, next_pos, tlen) = struct.unpack_from(
+        "<iiBBHHHIiii", data, 0
+    )
+    offset = 32
+    qname = data[offset : offset + l_read_name - 1].decode()
+    offset += l_read_name
+
+    cigar_ops = struct.unpack_from(f"<{n_cigar_op}I", data, offset)
+    offset += 4 * n_cigar_op
+
+    seq = data[offset : offset + (l_seq + 1) // 2].hex().translate(_SEQ_TABLE)[:l_seq] or "*"
+    offset += (l_seq + 1) // 2
+
+    qual = data[offset : offset + l_seq]
+    qual = "*" if not qual or qual[0] == 0xFF else qual.translate(_QUAL_TABLE).decode()
+    offset += l_seq
+
+    tags = _decode_aux(data, offset)
+    if "CG" in tags:  # CIGAR with more than 65535 operations
+        cigar_ops = [int(op) for op in tags.pop("CG").split(",")[1:]]
+    cigar = "".join(f"{op >> 4}{_CIGAR_OPERATIONS[op & 0xF]}" for op in cigar_ops) or "*"
+
+    rname = references[ref_id] if ref_id >= 0 else "*"
+    if next_ref_id < 0:
+        rnext = "*"
+    elif next_ref_id == ref_id:
+        rnext = "="
+    else:
+        rnext = references[next_ref_id]
+
+    return [
+        qname,
+        str(flag),
+        rname,
+        str(pos + 1),
+        str(mapq),
+        cigar,
+        rnext,
+        str(next_pos + 1),
+        str(tlen),
+        seq,
+        qual,
+        *tags.values(),
+    ]
+
+
+def _iter_bam(f: BinaryIO, threads: int = 1) -> Iterator[list[str]]:
+    with f:
+        stream = _ByteStream(_decompress_bgzf(f, threads))
+        headers, references = _read_bam_header(stream)
+        yield from headers
+        while (block_size := stream.read_int32()) is not None:
+            yield _decode_bam_record(stream.read(block_size), references)
+
+
+def read_bam(path_bam: str | Path, threads: int = 1) -> Iterator[list[str]]:
+    """Stream a BAM file as lists of SAM fields, in the same form as `read_sam`.
+    BGZF blocks are decompressed and binary records are decoded with the standard library only.
+
+    Args:
+        path_bam (str | Path): Path of a BAM file.
+        threads (int, optional): Number of threads to decompress BGZF blocks. Defaults to 1.
+
+    Returns:
+        Iterator[list[str]]: header lines and alignments split into SAM fields
+    """
+    f = open(Path(path_bam), "rb")
+    return _iter_bam(f, threads)
 
 
 ###########################################################
@@ -20,16 +335,15 @@ def read_sam(path_sam: str | Path) -> Iterator[list[str]]:
 
 
 def read_jsonl(path_input: str | Path) -> Iterator[dict[str, str]]:
-    with open(path_input, "r") as f:
+    with TextIOWrapper(_open_binary(path_input), encoding="utf-8") as f:
         for line in f:
             yield json.JSONDecoder(strict=False).decode(line)
 
 
-def write_jsonl(dicts: list[dict[str, str]], path_output: str | Path):
-    with open(path_output, "w") as f:
+def write_jsonl(dicts: Iterable[dict[str, str]], path_output: str | Path):
+    with _open_text_writer(path_output) as f:
         for line in dicts:
-            json.dump(line, f)
-            f.write("\n")
+            f.write(json.dumps(line) + "\n")
 
 
 ###########################################################
@@ -81,14 +395,27 @@ def _parse_insertion_token(token: str) -> tuple[str, str, str, str]:
     return inserted, anchor_ref, anchor_alt, anchor_op
 
 
+def _split_midsv_runs(midsv: str) -> list[tuple[str, int]]:
+    """Split MIDSV into tokens and their counts. Runs of matches, unknown nucleotides and inversions are kept
+    as runs, so that the walk scales with the number of events, and other runs are expanded.
+    """
+    tokens = []
+    for token, count in runlength.split_runs(midsv):
+        if count == 1 or token.startswith("=") or _is_inversion_token(token):
+            tokens.append((token, count))
+        else:
+            tokens.extend([(token, 1)] * count)
+    return tokens
+
+
 def _alignment_to_vcf_records(
     alignment: dict[str, str | int], large_sv_threshold: int
 ) -> list[dict[str, object]]:
     chrom = str(alignment["RNAME"])
     qname = str(alignment.get("QNAME", ""))
-    tokens = str(alignment["MIDSV"]).split(",")
+    tokens = _split_midsv_runs(str(alignment["MIDSV"]))
     records: list[dict[str, str | int]] = []
-    pos = 1
+    pos = int(alignment.get("START", 1))
     inv_start = None
     inv_bases: list[str] = []
     n_start = None
@@ -120,14 +447,14 @@ def _alignment_to_vcf_records(
 
     idx = 0
     while idx < len(tokens):
-        token = tokens[idx]
+        token, count = tokens[idx]
 
         if _is_inversion_token(token):
             flush_unknown_run()
             if inv_start is None:
                 inv_start = pos
-            inv_bases.append(_reference_base(token))
-            pos += 1
+            inv_bases.extend([_reference_base(token)] * count)
+            pos += count
             idx += 1
             continue
         flush_inversion()
@@ -136,14 +463,14 @@ def _alignment_to_vcf_records(
             if n_start is None:
                 n_start = pos
                 n_len = 0
-            n_len += 1
-            pos += 1
+            n_len += count
+            pos += count
             idx += 1
             continue
         flush_unknown_run()
 
         if token.startswith("="):
-            pos += 1
+            pos += count
             idx += 1
             continue
 
@@ -162,7 +489,7 @@ def _alignment_to_vcf_records(
             start_pos = pos
             deleted_seq = token[1:].upper()
             consumed = 1
-            for look_ahead in tokens[idx + 1 :]:
+            for look_ahead, _ in tokens[idx + 1 :]:
                 if not look_ahead.startswith("-") or _is_inversion_token(look_ahead):
                     break
                 deleted_seq += look_ahead[1:].upper()
@@ -206,8 +533,9 @@ def write_vcf(alignments: list[dict[str, str | int]], path_output: str | Path, l
     """Export MIDSV alignments to VCF format.
 
     Args:
-        alignments (list[dict[str, str | int]]): Output of midsv.transform including MIDSV.
-        path_output (str | Path): Destination VCF path.
+        alignments (list[dict[str, str | int]]): Output of midsv.transform including MIDSV. With pad=False,
+            MIDSV starts at START and the regions not covered by the read are not reported.
+        path_output (str | Path): Destination VCF path. The output is gzip-compressed if the suffix is '.gz'.
         large_sv_threshold (int, optional): Insertions longer than this use symbolic ALT. Defaults to 50.
     """
     records: list[dict[str, object]] = []
@@ -219,7 +547,7 @@ def write_vcf(alignments: list[dict[str, str | int]], path_output: str | Path, l
 
     records.sort(key=lambda r: (r["CHROM"], r["POS"], r["_order"]))
 
-    with open(path_output, "w") as f:
+    with _open_text_writer(path_output) as f:
         f.write("##fileformat=VCFv4.3\n")
         f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
         for record in records:
@@ -1,37 +1,350 @@
 from __future__ import annotations
 
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from pathlib import Path
 
-from midsv import converter, formatter, io, polisher, validator
+from midsv import cache, converter, encoder, formatter, index, io, polisher, validator
+
+# Number of QNAME groups sent to a worker process at a time
+SHARD_SIZE = 1000
+
+
+def _transform_group(
+    alignments: list[dict[str, str | int]],
+    sqheaders: dict[str, int],
+    qscore: bool,
+    keep: list[str],
+    rle: bool,
+    pad: bool,
+    region: tuple[str, int, int] | None,
+) -> list[dict[str, str | int]]:
+    """Format, convert and polish the alignments of a single QNAME."""
+    alignments = _convert_group(alignments, qscore, keep, rle, region)
+    return polisher.polish(alignments, sqheaders, keep, rle, pad, region)
+
+
+def _convert_group(
+    alignments: list[dict[str, str | int]],
+    qscore: bool,
+    keep: list[str],
+    rle: bool,
+    region: tuple[str, int, int] | None,
+) -> list[dict[str, str | int]]:
+    """Format and convert the alignments of a single QNAME.
+    With a region, only the portion of the cs tag within the region is converted for a read with a single
+    alignment (see `midsv.converter.trim_to_region`).
+    Fields that are not kept are dropped as soon as the last step using them is done.
+    """
+    alignments = formatter.organize_alignments(alignments)
+    if region is not None:
+        alignments = converter.trim_to_region(alignments, region)
+    alignments = formatter.drop_fields(alignments, {"SEQ", "CIGAR", "PARSED_CIGAR"}.difference(keep))
+    alignments = converter.convert(alignments, qscore, rle)
+    if region is not None and len(alignments) > 1 and {"QUAL", "CSTAG"}.intersection(keep):
+        alignments = converter.trim_fields_to_region(alignments, region)
+    return formatter.drop_fields(alignments, {"QUAL", "CSTAG"}.difference(keep))
+
+
+def _transform_groups(
+    groups: Iterable[list[dict[str, str | int]]],
+    sqheaders: dict[str, int],
+    qscore: bool,
+    keep: list[str],
+    rle: bool,
+    pad: bool,
+    region: tuple[str, int, int] | None,
+) -> Iterator[dict[str, str | int]]:
+    for alignments in groups:
+        yield from _transform_group(alignments, sqheaders, qscore, keep, rle, pad, region)
+
+
+def _transform_shard(
+    groups: list[list[dict[str, str | int]]],
+    sqheaders: dict[str, int],
+    qscore: bool,
+    keep: list[str],
+    rle: bool,
+    pad: bool,
+    region: tuple[str, int, int] | None,
+) -> list[dict[str, str | int]]:
+    return list(_transform_groups(groups, sqheaders, qscore, keep, rle, pad, region))
+
+
+def _transform_batches(
+    groups: Iterable[list[dict[str, str | int]]],
+    sqheaders: dict[str, int],
+    batch_size: int,
+    qscore: bool,
+    keep: list[str],
+    rle: bool,
+    pad: bool,
+    region: tuple[str, int, int] | None,
+) -> Iterator[dict[str, list]]:
+    # A QNAME group is merged into a single record or removed, so every batch except the last has batch_size records
+    columns = {}
+    for alignments in groups:
+        alignments = _convert_group(alignments, qscore, keep, rle, region)
+        polisher.polish_columns(alignments, sqheaders, columns, keep, rle, pad, region)
+        if len(columns.get("QNAME", ())) == batch_size:
+            yield columns
+            columns = {}
+    if columns:
+        yield columns
+
+
+def _transform_parallel(
+    groups: Iterable[list[dict[str, str | int]]],
+    sqheaders: dict[str, int],
+    qscore: bool,
+    keep: list[str],
+    rle: bool,
+    pad: bool,
+    region: tuple[str, int, int] | None,
+    workers: int,
+) -> Iterator[dict[str, str | int]]:
+    """Split QNAME groups into shards and process them in a process pool.
+    Since all alignments of a QNAME are in the same shard, each shard is processed independently.
+    The results are yielded in the order of the shards.
+    """
+    groups = iter(groups)
+    shards = iter(lambda: list(islice(groups, SHARD_SIZE)), [])
+    transform_shard = partial(
+        _transform_shard, sqheaders=sqheaders, qscore=qscore, keep=keep, rle=rle, pad=pad, region=region
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for records in executor.map(transform_shard, shards):
+            yield from records
+
+
+def _read_sam(
+    path_sam: Path, region: tuple[str, int, int] | None, qnames: list[str] | None
+) -> tuple[Iterator[list[str]], bool]:
+    """Read the SAM file, or only the records of the region or the reads if the SAM file has an up-to-date index.
+
+    Returns:
+        tuple[Iterator[list[str]], bool]: SAM records, and whether any alignment is selected by the index
+    """
+    sam_index = None
+    if region is not None or qnames is not None:
+        sam_index = index.load_index(path_sam)
+    if sam_index is not None:
+        ranges = index.select_ranges(path_sam, sam_index, region, qnames)
+        if ranges is not None:
+            return index.read_ranges(path_sam, sam_index, ranges), bool(ranges)
+    return io.read_sam(path_sam), True
+
+
+def _read_alignments(
+    path_sam: Path,
+    qscore: bool,
+    keep: list[str],
+    region: tuple[str, int, int] | None,
+    qnames: list[str] | None = None,
+) -> tuple[dict[str, int], Iterator[dict[str, str | int]]]:
+    """Parse the SAM file, skipping alignments outside of the region and of the reads if they are given."""
+    sam, selected = _read_sam(path_sam, region, qnames)
+    sqheaders, alignments = formatter.parse_sam(sam, qscore, keep)
+    if not selected:
+        alignments = iter(())  # the header only, without "No alignment information"
+    if region is not None:
+        validator.region_in_sqheaders(region, sqheaders)
+        alignments = formatter.filter_region(alignments, region)
+    if qnames is not None:
+        alignments = formatter.filter_qnames(alignments, qnames)
+    return sqheaders, alignments
 
 
 def transform(
     path_sam: Path | str,
     qscore: bool = False,
     keep: str | list[str] = None,
-) -> list[dict[str, str | int]]:
+    workers: int = 1,
+    cache_dir: str | Path | None = None,
+    collapse: bool = False,
+    collapse_qnames: int = 0,
+    output: str = "dict",
+    rle: bool = False,
+    pad: bool = True,
+    region: str | None = None,
+    qnames: str | list[str] | None = None,
+    cache_checksum: bool = False,
+) -> list[dict[str, str | int]] | dict[str, object]:
     """Integrated function to perform MIDSV conversion.
 
     Args:
-        path_sam (str | Path): Path of a SAM file.
+        path_sam (str | Path): Path of a SAM or BAM file.
         qscore (bool, optional): Output QSCORE. Defaults to False.
         keep (str | list[str], optional): Subset of 'FLAG', 'POS', 'CIGAR', 'SEQ', 'QUAL', 'CSTAG' to keep. Defaults to None.
+        workers (int, optional): Number of processes to convert reads, which are distributed by QNAME. Defaults to 1.
+        cache_dir (str | Path, optional): Directory to cache the result. The cache is keyed on the size and
+            modification time of the input file and the arguments. Defaults to None (no cache).
+        collapse (bool, optional): Collapse reads with identical outputs except QNAME into one record with COUNT.
+            Defaults to False.
+        collapse_qnames (int, optional): Number of QNAMEs listed as QNAMES in each collapsed record. Defaults to 0.
+        output (str, optional): 'dict' to return a list of dictionaries, or 'array' to return MIDSV and QSCORE as
+            NumPy matrices stacked by RNAME (see midsv.encoder.encode). 'array' requires NumPy. Defaults to 'dict'.
+        rle (bool, optional): Run-length encode MIDSV and QSCORE, e.g. '=N*100' for 100 unknown nucleotides
+            (see midsv.runlength). Defaults to False.
+        pad (bool, optional): Pad MIDSV and QSCORE with '=N' and '-1' to the reference length. If False, only the
+            region covered by the read is output with its 1-based START and END, and midsv.expand restores the
+            padded record (given the same region, if any). Defaults to True.
+        region (str, optional): Region such as 'chr1:1001-2000' (1-based, inclusive). Only reads overlapping the
+            region are converted, and their output is cropped to the region, so MIDSV and QSCORE have the length
+            of the region. POS, QUAL and CSTAG kept are trimmed to the region. Defaults to None (the whole reference).
+        qnames (str | list[str], optional): Read names to convert. Defaults to None (all reads).
+            If the SAM file is indexed by midsv.index.build_index, only the records of the region or the reads
+            are read from the file.
+        cache_checksum (bool, optional): Also key the cache on the SHA-256 of the input file, which detects
+            changes that keep its size and modification time at the cost of reading the whole file. Defaults to False.
 
     Returns:
         list[dict[str, str]]: Dictionary containing QNAME, RNAME, MIDSV, QSCORE, and fields specified by the keep argument.
+            With output='array', a dictionary of the token vocabulary and the matrices of each RNAME.
     """
-    # Validation
     keep = validator.keep_argument(keep)
-    validator.validate_sam(path_sam, qscore)
+    workers = validator.workers_argument(workers)
+    output = validator.output_argument(output)
+    region = validator.region_argument(region)
+    qnames = validator.qnames_argument(qnames)
+    path_sam = validator.sam_path(path_sam)
+
+    if cache_dir is not None:
+        key = cache.make_key(
+            path_sam,
+            checksum=cache_checksum,
+            qscore=qscore,
+            keep=sorted(keep),
+            collapse=collapse,
+            collapse_qnames=collapse_qnames,
+            output=output,
+            rle=rle,
+            pad=pad,
+            region=region,
+            qnames=qnames,
+        )
+        cached = cache.load(cache_dir, key)
+        if cached is not None:
+            return cached
+
+    # Validation, header extraction and formatting in a single pass
+    sqheaders, alignments = _read_alignments(path_sam, qscore, keep, region, qnames)
+
+    # Conversion to MIDSV and polishing per QNAME
+    groups = formatter.group_alignments(alignments)
 
-    # Formatting
-    sqheaders: dict[str, int] = formatter.extract_sqheaders(io.read_sam(path_sam))
-    alignments: list[dict[str, str | int]] = formatter.organize_alignments_to_dict(io.read_sam(path_sam))
+    # The matrices have a column per position, so the records are padded for output='array'
+    pad = pad or output == "array"
+    if workers > 1:
+        records = _transform_parallel(groups, sqheaders, qscore, keep, rle, pad, region, workers)
+    else:
+        records = _transform_groups(groups, sqheaders, qscore, keep, rle, pad, region)
 
-    # Conversion to MIDSV
-    alignments = converter.convert(alignments, qscore)
+    # Collapse the records as they are produced, so that only unique records are held
+    if collapse:
+        records = polisher.collapse(records, collapse_qnames)
 
-    # Polishing
-    alignments = polisher.polish(alignments, sqheaders, keep)
+    if output == "array":
+        alignments = encoder.encode(records)
+    else:
+        alignments = list(records)
+
+    if cache_dir is not None:
+        cache.store(cache_dir, key, alignments)
 
     return alignments
+
+
+def transform_iter(
+    path_sam: Path | str,
+    qscore: bool = False,
+    keep: str | list[str] = None,
+    rle: bool = False,
+    pad: bool = True,
+    region: str | None = None,
+    qnames: str | list[str] | None = None,
+    check_grouped: bool = False,
+) -> Iterator[dict[str, str | int]]:
+    """Lazily perform MIDSV conversion, yielding each read as soon as its alignments are processed.
+    The SAM file must be grouped by QNAME (e.g. minimap2 output) because the alignments of a read are
+    collected until a different QNAME appears, so memory usage is bounded by the largest group of alignments
+    sharing a QNAME. A QNAME that appears again after other reads is yielded again as another record, unless
+    check_grouped is set. Records are yielded in the order of the SAM file.
+
+    Args:
+        path_sam (str | Path): Path of a SAM or BAM file grouped by QNAME.
+        qscore (bool, optional): Output QSCORE. Defaults to False.
+        keep (str | list[str], optional): Subset of 'FLAG', 'POS', 'CIGAR', 'SEQ', 'QUAL', 'CSTAG' to keep.
+            Defaults to None.
+        rle (bool, optional): Run-length encode MIDSV and QSCORE. Defaults to False.
+        pad (bool, optional): Pad MIDSV and QSCORE to the reference length, or output START and END instead.
+            Defaults to True.
+        region (str, optional): Region such as 'chr1:1001-2000' to convert. Defaults to None.
+        qnames (str | list[str], optional): Read names to convert. Defaults to None (all reads).
+            As `transform`, an indexed SAM file is read only for the records of the region or the reads.
+        check_grouped (bool, optional): Raise a ValueError if a QNAME appears again after other reads.
+            The QNAMEs already processed are kept, so memory grows with the number of reads. Defaults to False.
+
+    Returns:
+        Iterator[dict[str, str | int]]: Dictionary containing QNAME, RNAME, MIDSV, QSCORE, and fields specified
+            by the keep argument.
+    """
+    keep = validator.keep_argument(keep)
+    region = validator.region_argument(region)
+    qnames = validator.qnames_argument(qnames)
+    path_sam = validator.sam_path(path_sam)
+
+    sqheaders, alignments = _read_alignments(path_sam, qscore, keep, region, qnames)
+    groups = formatter.iter_qname_groups(alignments, check_grouped)
+
+    return _transform_groups(groups, sqheaders, qscore, keep, rle, pad, region)
+
+
+def transform_batches(
+    path_sam: Path | str,
+    batch_size: int = 10_000,
+    qscore: bool = False,
+    keep: str | list[str] = None,
+    rle: bool = False,
+    pad: bool = True,
+    region: str | None = None,
+    qnames: str | list[str] | None = None,
+    check_grouped: bool = False,
+) -> Iterator[dict[str, list]]:
+    """Lazily perform MIDSV conversion and yield the records in column-oriented batches, such as
+    {"QNAME": [...], "RNAME": [...], "MIDSV": [...], "QSCORE": [...]}, which can be passed to
+    `pandas.DataFrame` or `pyarrow.table` directly. The columns are filled from the pipeline without
+    a dictionary per record. As `transform_iter`, the SAM file must be grouped by QNAME, so memory usage is
+    bounded by a batch and the largest group of alignments sharing a QNAME. Records are in the order of the SAM file.
+
+    Args:
+        path_sam (str | Path): Path of a SAM or BAM file grouped by QNAME.
+        batch_size (int, optional): Number of records in a batch, except for the last one. Defaults to 10,000.
+        qscore (bool, optional): Output QSCORE. Defaults to False.
+        keep (str | list[str], optional): Subset of 'FLAG', 'POS', 'CIGAR', 'SEQ', 'QUAL', 'CSTAG' to keep.
+            Defaults to None.
+        rle (bool, optional): Run-length encode MIDSV and QSCORE. Defaults to False.
+        pad (bool, optional): Pad MIDSV and QSCORE to the reference length, or output START and END instead.
+            Defaults to True.
+        region (str, optional): Region such as 'chr1:1001-2000' to convert. Defaults to None.
+        qnames (str | list[str], optional): Read names to convert. Defaults to None (all reads).
+            As `transform`, an indexed SAM file is read only for the records of the region or the reads.
+        check_grouped (bool, optional): Raise a ValueError if a QNAME appears again after other reads.
+            The QNAMEs already processed are kept, so memory grows with the number of reads. Defaults to False.
+
+    Returns:
+        Iterator[dict[str, list]]: Batches of parallel lists of QNAME, RNAME, MIDSV, QSCORE, and fields specified
+            by the keep argument.
+    """
+    keep = validator.keep_argument(keep)
+    batch_size = validator.batch_size_argument(batch_size)
+    region = validator.region_argument(region)
+    qnames = validator.qnames_argument(qnames)
+    path_sam = validator.sam_path(path_sam)
+
+    sqheaders, alignments = _read_alignments(path_sam, qscore, keep, region, qnames)
+    groups = formatter.iter_qname_groups(alignments, check_grouped)
+
+    return _transform_batches(groups, sqheaders, batch_size, qscore, keep, rle, pad, region)
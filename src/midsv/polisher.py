@@ -1,7 +1,14 @@
 from __future__ import annotations
 
-from copy import deepcopy
-from itertools import groupby
+from collections.abc import Iterable
+from itertools import chain
+
+from midsv import formatter, runlength, validator
+
+
+def _length(tags: list[str], rle: bool) -> int:
+    """Return the number of reference positions of MIDSV tokens."""
+    return runlength.length(tags) if rle else len(tags)
 
 
 def is_forward_strand(flag: int) -> bool:
@@ -22,157 +29,422 @@ def process_inversion(current_alignment: dict[str, int | str], first_strand: boo
     """Detect and mark inversion in the current alignment."""
     current_read_is_forward = is_forward_strand(current_alignment["FLAG"])
     if first_strand is not current_read_is_forward:
-        current_alignment["MIDSV"] = current_alignment["MIDSV"].lower()
+        current_alignment["MIDSV"] = [tag.lower() for tag in current_alignment["MIDSV"]]
 
 
-def calculate_microhomology(previous_alignment: dict[str, int | str], current_alignment: dict[str, int | str]) -> int:
-    """Calculate the length of microhomology between two alignments."""
-    previous_midsv = previous_alignment["MIDSV"].split(",")
-    current_midsv = current_alignment["MIDSV"].split(",")
-    if "QSCORE" in current_alignment:
-        previous_qscore = previous_alignment["QSCORE"].split(",")
-        current_qscore = current_alignment["QSCORE"].split(",")
+# Never equal to any token, so that an overlap does not extend across the two alignments
+_SEPARATOR = object()
 
-    num_microhomology = 0
+
+def _prefix_function(tokens: list) -> list[int]:
+    """Return the length of the longest proper prefix that is also a suffix of tokens[: i + 1] for each i."""
+    prefix_lengths = [0] * len(tokens)
+    k = 0
+    for i in range(1, len(tokens)):
+        while k and tokens[i] != tokens[k]:
+            k = prefix_lengths[k - 1]
+        if tokens[i] == tokens[k]:
+            k += 1
+        prefix_lengths[i] = k
+    return prefix_lengths
+
+
+def _overlap_lengths(previous_tokens: list, current_tokens: list) -> list[int]:
+    """Return all lengths i in ascending order where the last i tokens of previous_tokens equal
+    the first i tokens of current_tokens. Both lists must have the same length.
+    """
+    if not current_tokens:
+        return []
+    prefix_lengths = _prefix_function(current_tokens + [_SEPARATOR] + previous_tokens)
+    overlap_lengths = []
+    k = prefix_lengths[-1]
+    while k:
+        overlap_lengths.append(k)
+        k = prefix_lengths[k - 1]
+    return overlap_lengths[::-1]
+
+
+def calculate_microhomology(
+    previous_alignment: dict[str, int | list[str]], current_alignment: dict[str, int | list[str]]
+) -> int:
+    """Calculate the length of microhomology between two alignments.
+    The microhomology is the longest suffix of the previous MIDSV that matches the prefix of the current MIDSV,
+    and the extension stops at the first match whose QSCORE differs.
+    All candidates are found in linear time by the prefix function (KMP) of the current + previous tokens.
+    """
+    previous_midsv = previous_alignment["MIDSV"]
+    current_midsv = current_alignment["MIDSV"]
     min_length = min(len(previous_midsv), len(current_midsv))
-    for i in range(1, len(current_midsv) + 1):
-        if i == min_length + 1:
+    previous_start = len(previous_midsv) - min_length
+
+    overlap_lengths = _overlap_lengths(previous_midsv[previous_start:], current_midsv[:min_length])
+    if not overlap_lengths or "QSCORE" not in current_alignment:
+        return overlap_lengths[-1] if overlap_lengths else 0
+
+    previous_tokens = list(zip(previous_midsv[previous_start:], previous_alignment["QSCORE"][previous_start:]))
+    current_tokens = list(zip(current_midsv[:min_length], current_alignment["QSCORE"][:min_length]))
+    overlap_lengths_with_qscore = set(_overlap_lengths(previous_tokens, current_tokens))
+
+    num_microhomology = 0
+    for overlap_length in overlap_lengths:
+        if overlap_length not in overlap_lengths_with_qscore:
             break
-        prev_index = len(previous_midsv) - i
-        if previous_midsv[prev_index:] == current_midsv[:i]:
-            if "QSCORE" in current_alignment and previous_qscore[prev_index:] != current_qscore[:i]:
-                break
-            num_microhomology = i
+        num_microhomology = overlap_length
     return num_microhomology
 
 
-def remove_microhomology(current_alignment: dict[str, str], num_microhomology: int) -> None:
+def remove_microhomology(current_alignment: dict[str, int | list[str]], num_microhomology: int) -> None:
     """Remove microhomology and update the current alignment."""
-    current_midsv = current_alignment["MIDSV"].split(",")
-    current_alignment["MIDSV"] = ",".join(current_midsv[num_microhomology:])
-
+    if num_microhomology == 0:
+        return
+    # The token lists are replaced rather than modified, since they may be shared with the input alignments
+    removed_midsv = current_alignment["MIDSV"][:num_microhomology]
+    current_alignment["MIDSV"] = current_alignment["MIDSV"][num_microhomology:]
     if "QSCORE" in current_alignment:
-        current_qscore = current_alignment["QSCORE"].split(",")
-        current_alignment["QSCORE"] = ",".join(current_qscore[num_microhomology:])
+        current_alignment["QSCORE"] = current_alignment["QSCORE"][num_microhomology:]
 
-    current_alignment["POS"] += num_microhomology
+    current_alignment["POS"] += runlength.length(removed_midsv)
 
 
-def fill_gap(sam_template: dict[str, int | str], gap: int) -> None:
-    """Fill the gap between alignments with unknown nucleotides."""
-    sam_template["MIDSV"] += ",=N" * gap
-    if "QSCORE" in sam_template:
-        sam_template["QSCORE"] += ",-1" * gap
-
+class SegmentBuilder:
+    """Collect the tokens of the alignments of a read and the gaps between them as pieces,
+    and join them once, so that merging is linear in the number and length of the alignments.
+    """
 
-def merge(alignments: list[dict[str, int | str]]) -> list[dict[str, int | str]]:
+    def __init__(self, qscore: bool, rle: bool = False) -> None:
+        self.rle = rle
+        self.midsv_pieces: list[list[str]] = []
+        self.qscore_pieces: list[list[str]] | None = [] if qscore else None
+
+    def add_alignment(self, alignment: dict[str, int | list[str]]) -> None:
+        self.midsv_pieces.append(alignment["MIDSV"])
+        if self.qscore_pieces is not None:
+            self.qscore_pieces.append(alignment["QSCORE"])
+
+    def add_gap(self, gap: int) -> None:
+        """Fill the gap between alignments with unknown nucleotides."""
+        if gap <= 0:
+            return
+        if self.rle:
+            self.midsv_pieces.append([runlength.run("=N", gap)])
+            if self.qscore_pieces is not None:
+                self.qscore_pieces.append([runlength.run("-1", gap)])
+            return
+        self.midsv_pieces.append(["=N"] * gap)
+        if self.qscore_pieces is not None:
+            self.qscore_pieces.append(["-1"] * gap)
+
+    def build(self) -> dict[str, list[str]]:
+        merged = {"MIDSV": list(chain.from_iterable(self.midsv_pieces))}
+        if self.qscore_pieces is not None:
+            merged["QSCORE"] = list(chain.from_iterable(self.qscore_pieces))
+        return merged
+
+
+def merge(alignments: list[dict[str, int | str]], rle: bool = False) -> list[dict[str, int | str]]:
     """Merge splitted reads including large deletion or inversion.
 
     Args:
         alignments (list[dict[str, int | str]]): dictionarized SAM
+        rle (bool, optional): Fill the gaps between alignments as runs of `=N`. Defaults to False.
 
     Returns:
         list[dict[str, int | str]]: SAM with joined splitted reads to single read
     """
-    sam_sorted = sorted(alignments, key=lambda x: [x["QNAME"], x["POS"]])
-    sam_groupby = groupby(sam_sorted, key=lambda x: x["QNAME"])
     sam_merged = []
 
-    for *_, records in sam_groupby:
-        records = list(records)
+    for records in formatter.group_alignments(alignments):
         if len(records) == 1:
             sam_merged.append(records[0])
             continue
 
-        sam_template = deepcopy(records[0])
-        first_strand = is_forward_strand(sam_template["FLAG"])
+        records.sort(key=lambda x: x["POS"])
+        first_strand = is_forward_strand(records[0]["FLAG"])
+        builder = SegmentBuilder("QSCORE" in records[0], rle)
+        builder.add_alignment(records[0])
 
-        for i, current_alignment in enumerate(records[1:], start=1):
+        previous_alignment = records[0]
+        for current_alignment in records[1:]:
+            # A shallow copy, as the trimmed tokens and POS must not leak into the input alignments
+            current_alignment = current_alignment.copy()
             process_inversion(current_alignment, first_strand)
 
-            previous_alignment = records[i - 1]
             num_microhomology = calculate_microhomology(previous_alignment, current_alignment)
             remove_microhomology(current_alignment, num_microhomology)
 
-            previous_end = previous_alignment["POS"] + len(previous_alignment["MIDSV"].split(",")) - 1
+            previous_end = previous_alignment["POS"] + _length(previous_alignment["MIDSV"], rle) - 1
             current_start = current_alignment["POS"] - 1
 
-            fill_gap(sam_template, current_start - previous_end)
-
-            sam_template["MIDSV"] += "," + current_alignment["MIDSV"]
-            if "QSCORE" in sam_template:
-                sam_template["QSCORE"] += "," + current_alignment["QSCORE"]
+            builder.add_gap(current_start - previous_end)
+            builder.add_alignment(current_alignment)
+            previous_alignment = current_alignment
 
-        sam_merged.append(sam_template)
+        merged_alignment = records[0].copy()
+        merged_alignment.update(builder.build())
+        sam_merged.append(merged_alignment)
 
     return sam_merged
 
 
-def pad(alignments: list[dict[str, int | str]], sqheaders: dict[str, int]) -> list[dict[str, int | str]]:
+def _reference_range(rname: str, sqheaders: dict[str, int], region: tuple[str, int, int] | None) -> tuple[int, int]:
+    """The first and last positions of the output, which are the whole reference or the region"""
+    if region is None:
+        return 1, sqheaders[rname]
+    return region[1], region[2]
+
+
+def _slice_tags(tags: list[str], start: int, stop: int, rle: bool) -> list[str]:
+    """Return the tokens of the reference positions [start, stop) (0-based) of MIDSV or QSCORE."""
+    if not rle:
+        return tags[start:stop]
+    sliced = []
+    position = 0
+    for token, count in runlength.split_runs(tags):
+        if position >= stop:
+            break
+        first, last = max(position, start), min(position + count, stop)
+        if first < last:
+            sliced.append(runlength.run(token, last - first))
+        position += count
+    return sliced
+
+
+def crop(
+    alignments: list[dict[str, int | list[str]]], region: tuple[str, int, int], rle: bool = False
+) -> list[dict[str, int | list[str]]]:
+    """Crop MIDSV and QSCORE of merged alignments to a region, so that they are the same as the output of the
+    whole reference sliced to the region. POS becomes the first position within the region.
+    Cropping after `merge` keeps the microhomology between split alignments measured on their whole MIDSV.
+
+    Args:
+        alignments (list[dict[str, int | list[str]]]): merged SAM
+        region (tuple[str, int, int]): RNAME, START and END of the region (1-based, inclusive)
+        rle (bool, optional): MIDSV and QSCORE contain runs such as `=N*100`. Defaults to False.
+
+    Returns:
+        list[dict[str, int | list[str]]]: SAM cropped to the region
+    """
+    _, start, end = region
+    for alignment in alignments:
+        pos = alignment["POS"]
+        if pos >= start and pos + _length(alignment["MIDSV"], rle) - 1 <= end:
+            continue
+        left, right = max(0, start - pos), max(0, end - pos + 1)
+        alignment["MIDSV"] = _slice_tags(alignment["MIDSV"], left, right, rle)
+        if "QSCORE" in alignment:
+            alignment["QSCORE"] = _slice_tags(alignment["QSCORE"], left, right, rle)
+        alignment["POS"] = max(pos, start)
+    return alignments
+
+
+def pad(
+    alignments: list[dict[str, int | str]],
+    sqheaders: dict[str, int],
+    rle: bool = False,
+    region: tuple[str, int, int] | None = None,
+) -> list[dict[str, int | str]]:
     """Padding left and right flanks as "=" in MIDSV, "-1" in QUAL
 
     Args:
         sam (list[dict[str, int | str]]): dictionarized SAM
         sqheaders (dict[str, int]): dictionary as {SQ:LN}
+        rle (bool, optional): Pad the flanks as runs such as `=N*100`. Defaults to False.
+        region (tuple[str, int, int], optional): Pad to the region (RNAME, START, END) instead of the reference.
+            Defaults to None.
 
     Returns:
         list[dict[str, int | str]]: dictionarized SAM with padding as "=N" in MIDSV and CSSPLIT, and "-1" in QUAL
     """
     alignments_padding = []
     for alignment in alignments:
-        ref_length = sqheaders[alignment["RNAME"]]
-        left_pad = max(0, alignment["POS"] - 1)
-        right_pad = max(0, ref_length - (len(alignment["MIDSV"].split(",")) + left_pad))
-        left_pad_midsv, right_pad_midsv = "=N," * left_pad, ",=N" * right_pad
-        left_pad_qscore, right_pad_qscore = "-1," * left_pad, ",-1" * right_pad
+        first, last = _reference_range(alignment["RNAME"], sqheaders, region)
+        left_pad = max(0, alignment["POS"] - first)
+        right_pad = max(0, last - first + 1 - (_length(alignment["MIDSV"], rle) + left_pad))
 
-        alignment["MIDSV"] = left_pad_midsv + alignment["MIDSV"] + right_pad_midsv
+        alignment["MIDSV"] = _flank("=N", left_pad, rle) + alignment["MIDSV"] + _flank("=N", right_pad, rle)
         if "QSCORE" in alignment:
-            alignment["QSCORE"] = left_pad_qscore + alignment["QSCORE"] + right_pad_qscore
+            alignment["QSCORE"] = _flank("-1", left_pad, rle) + alignment["QSCORE"] + _flank("-1", right_pad, rle)
 
         alignments_padding.append(alignment)
 
     return alignments_padding
 
 
+def _flank(token: str, count: int, rle: bool) -> list[str]:
+    if count <= 0:
+        return []
+    return [runlength.run(token, count)] if rle else [token] * count
+
+
+def pad_virtually(alignments: list[dict[str, int | list[str]]], rle: bool = False) -> list[dict[str, int | list[str]]]:
+    """Record the region covered by MIDSV as START and END (1-based, inclusive) instead of padding the flanks.
+    The records can be padded to the reference length later by `expand`.
+
+    Args:
+        alignments (list[dict[str, int | list[str]]]): dictionarized SAM
+        rle (bool, optional): MIDSV is run-length encoded. Defaults to False.
+
+    Returns:
+        list[dict[str, int | list[str]]]: dictionarized SAM with START and END
+    """
+    for alignment in alignments:
+        alignment["START"] = alignment["POS"]
+        alignment["END"] = alignment["POS"] + _length(alignment["MIDSV"], rle) - 1
+    return alignments
+
+
+def expand(
+    alignment: dict[str, int | str], sqheaders: dict[str, int], rle: bool = False, region: str | None = None
+) -> dict[str, int | str]:
+    """Pad a record with START and END to the reference length, as if it was transformed with `pad=True`.
+    Records without START are returned as they are.
+
+    Args:
+        alignment (dict[str, int | str]): a record of `midsv.transform(pad=False)`
+        sqheaders (dict[str, int]): dictionary as {SQ:LN}
+        rle (bool, optional): MIDSV and QSCORE are run-length encoded. Defaults to False.
+        region (str, optional): The region passed to `midsv.transform`, such as 'chr1:1001-2000'. The record is
+            padded to the region instead of the reference. Defaults to None.
+
+    Returns:
+        dict[str, int | str]: a new record with MIDSV and QSCORE of the reference or region length,
+            without START and END
+    """
+    if "START" not in alignment:
+        return alignment
+    first, last = _reference_range(alignment["RNAME"], sqheaders, validator.region_argument(region))
+    left_pad = alignment["START"] - first
+    right_pad = last - alignment["END"]
+
+    def expand_tag(tag: str, token: str) -> str:
+        # A record cropped to a region may have no token
+        tag = ",".join([*_flank(token, left_pad, rle), *([tag] if tag else []), *_flank(token, right_pad, rle)])
+        # Merge the flanks with runs of the same token at the ends of the tag
+        return runlength.encode(tag) if rle else tag
+
+    expanded = {key: value for key, value in alignment.items() if key not in {"START", "END"}}
+    expanded["MIDSV"] = expand_tag(alignment["MIDSV"], "=N")
+    if "QSCORE" in alignment:
+        expanded["QSCORE"] = expand_tag(alignment["QSCORE"], "-1")
+    return expanded
+
+
 def remove_different_length(
-    alignments: list[dict[str, int | str]], sqheaders: dict[str, int]
+    alignments: list[dict[str, int | str]],
+    sqheaders: dict[str, int],
+    rle: bool = False,
+    region: tuple[str, int, int] | None = None,
 ) -> list[dict[str, int | str]]:
-    """remove different sequence length of the reference
+    """remove different sequence length of the reference.
+    Records with END (see `pad_virtually`) are checked arithmetically: they fit when END is within the reference.
 
     Args:
         sam (list[dict[str, int | str]]): dictionarized SAM
         sqheaders (dict[str, int]): dictionary as {SQ:LN}
+        rle (bool, optional): MIDSV is run-length encoded. Defaults to False.
+        region (tuple[str, int, int], optional): Compare with the region (RNAME, START, END) instead of the
+            reference. Defaults to None.
 
     Returns:
         list[dict[str, int | str]]: filtered SAM by different sequence length of the reference
     """
     alignments_filtered = []
     for alignment in alignments:
-        ref_length = sqheaders[alignment["RNAME"]]
-        if len(alignment["MIDSV"].split(",")) != ref_length:
+        first, last = _reference_range(alignment["RNAME"], sqheaders, region)
+        if "END" in alignment:
+            if alignment["END"] > last:
+                continue
+        elif _length(alignment["MIDSV"], rle) != last - first + 1:
             continue
         alignments_filtered.append(alignment)
     return alignments_filtered
 
 
 def select(alignments: list[dict[str, int | str]], keep: list[str] = None) -> list[dict[str, int | str]]:
-    """Select QNAME, RNAME, MIDSV, CSSPLIT and QSCORE
+    """Select QNAME, RNAME, MIDSV, CSSPLIT and QSCORE as new dictionaries, which are the output records
 
     Args:
-        alignments (list[dict[str, int | str]]): dictionarized SAM
+        alignments (list[dict[str, int | str]]): dictionarized SAM or `midsv.formatter.Alignment`
         keep (list(str), optional): Subset of ['FLAG', 'POS', 'SEQ', 'QUAL', 'CIGAR', 'CSTAG'] to keep. Defaults to None.
     Returns:
         list[dict[str, int | str]]: dictionarized SAM of QNAME, RNAME, MIDSV, CSSPLIT and QSCORE
     """
+    keys_to_delete = _keys_to_delete(keep)
+    return [{key: value for key, value in record.items() if key not in keys_to_delete} for record in alignments]
+
+
+def select_columns(
+    alignments: list[dict[str, int | str]], columns: dict[str, list], keep: list[str] = None
+) -> dict[str, list]:
+    """Append the fields selected as `select` to columns of parallel lists, without a dictionary per record
+
+    Args:
+        alignments (list[dict[str, int | str]]): dictionarized SAM or `midsv.formatter.Alignment`
+        columns (dict[str, list]): columns to be appended, such as {"QNAME": [...], "MIDSV": [...]}
+        keep (list(str), optional): Subset of ['FLAG', 'POS', 'SEQ', 'QUAL', 'CIGAR', 'CSTAG'] to keep.
+            Defaults to None.
+    Returns:
+        dict[str, list]: the columns
+    """
+    keys_to_delete = _keys_to_delete(keep)
+    for record in alignments:
+        for key, value in record.items():
+            if key not in keys_to_delete:
+                columns.setdefault(key, []).append(value)
+    return columns
+
+
+def _keys_to_delete(keep: list[str] | None) -> set[str]:
     keep = set(keep) if keep else set()
-    keys_to_delete = {"FLAG", "POS", "SEQ", "QUAL", "CIGAR", "CSTAG"} - keep
-    selected = []
+    return {"FLAG", "POS", "SEQ", "QUAL", "CIGAR", "CSTAG", "PARSED_CIGAR"} - keep
+
+
+def serialize(alignments: list[dict[str, int | list[str]]], rle: bool = False) -> list[dict[str, int | str]]:
+    """Join MIDSV and QSCORE tokens into comma-separated strings
+
+    Args:
+        alignments (list[dict[str, int | list[str]]]): dictionarized SAM with MIDSV and QSCORE as lists of tokens
+        rle (bool, optional): Run-length encode MIDSV and QSCORE. Defaults to False.
+
+    Returns:
+        list[dict[str, int | str]]: dictionarized SAM with MIDSV and QSCORE as strings
+    """
+    join = runlength.encode if rle else ",".join
+    for alignment in alignments:
+        alignment["MIDSV"] = join(alignment["MIDSV"])
+        if "QSCORE" in alignment:
+            alignment["QSCORE"] = join(alignment["QSCORE"])
+    return alignments
+
+
+###############################################################################
+# collapse
+###############################################################################
+
+
+def collapse(alignments: Iterable[dict[str, int | str]], num_qnames: int = 0) -> list[dict[str, int | str]]:
+    """Collapse records that are identical except for QNAME into a single record with COUNT.
+    The records are compared by RNAME and MIDSV, and also by QSCORE and kept fields if they exist.
+
+    Args:
+        alignments (Iterable[dict[str, int | str]]): polished SAM
+        num_qnames (int, optional): Number of QNAMEs to list as QNAMES in each collapsed record. Defaults to 0.
+
+    Returns:
+        list[dict[str, int | str]]: collapsed records in the order of their first appearance. QNAME is the first read.
+    """
+    collapsed: dict[tuple, dict[str, int | str]] = {}
     for record in alignments:
-        for key in keys_to_delete:
-            record.pop(key)
-        selected.append(record)
-    return selected
+        key = tuple((field, value) for field, value in record.items() if field != "QNAME")
+        if key not in collapsed:
+            collapsed[key] = {**record, "COUNT": 0}
+            if num_qnames > 0:
+                collapsed[key]["QNAMES"] = []
+        collapsed_record = collapsed[key]
+        collapsed_record["COUNT"] += 1
+        if num_qnames > 0 and len(collapsed_record["QNAMES"]) < num_qnames:
+            collapsed_record["QNAMES"].append(record["QNAME"])
+    return list(collapsed.values())
 
 
 ###############################################################################
@@ -181,18 +453,60 @@ def select(alignments: list[dict[str, int | str]], keep: list[str] = None) -> li
 
 
 def polish(
-    alignments: list[dict[str, int | str]], sqheaders: dict[str, int], keep: list[str] = None
+    alignments: list[dict[str, int | str]],
+    sqheaders: dict[str, int],
+    keep: list[str] = None,
+    rle: bool = False,
+    padding: bool = True,
+    region: tuple[str, int, int] | None = None,
 ) -> list[dict[str, int | str]]:
     """Polish SAM by merging splitted reads, padding, removing different length, and selecting fields
     Args:
         alignments (list[dict[str, int | str]]): dictionarized SAM
         sqheaders (dict[str, int]): dictionary as {SQ:LN}
         keep (list(str), optional): Subset of ['FLAG', 'POS', 'SEQ', 'QUAL', 'CIGAR', 'CSTAG'] to keep. Defaults to None.
+        rle (bool, optional): Run-length encode MIDSV and QSCORE. Defaults to False.
+        padding (bool, optional): Pad MIDSV and QSCORE to the reference length. If False, record START and END
+            instead (see `pad_virtually`). Defaults to True.
+        region (tuple[str, int, int], optional): Crop the merged alignments to the region (RNAME, START, END)
+            (see `crop`) and pad to the region instead of the reference. Defaults to None.
 
     Returns:
         list[dict[str, int | str]]: polished SAM
     """
-    alignments_polished = merge(alignments)
-    alignments_polished = pad(alignments_polished, sqheaders)
-    alignments_polished = remove_different_length(alignments_polished, sqheaders)
-    return select(alignments_polished, keep)
+    return select(_polish_records(alignments, sqheaders, rle, padding, region), keep)
+
+
+def polish_columns(
+    alignments: list[dict[str, int | str]],
+    sqheaders: dict[str, int],
+    columns: dict[str, list],
+    keep: list[str] = None,
+    rle: bool = False,
+    padding: bool = True,
+    region: tuple[str, int, int] | None = None,
+) -> dict[str, list]:
+    """Polish SAM as `polish`, and append the selected fields to columns of parallel lists (see `select_columns`)
+
+    Returns:
+        dict[str, list]: the columns
+    """
+    return select_columns(_polish_records(alignments, sqheaders, rle, padding, region), columns, keep)
+
+
+def _polish_records(
+    alignments: list[dict[str, int | str]],
+    sqheaders: dict[str, int],
+    rle: bool,
+    padding: bool,
+    region: tuple[str, int, int] | None,
+) -> list[dict[str, int | str]]:
+    alignments_polished = merge(alignments, rle)
+    if region is not None:
+        alignments_polished = crop(alignments_polished, region, rle)
+    if padding:
+        alignments_polished = pad(alignments_polished, sqheaders, rle, region)
+    else:
+        alignments_polished = pad_virtually(alignments_polished, rle)
+    alignments_polished = remove_different_length(alignments_polished, sqheaders, rle, region)
+    return serialize(alignments_polished, rle)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import re
+
+###########################################################
+# Run-length encoding of MIDSV and QSCORE
+###########################################################
+
+# A run of identical tokens is written as "<token>*<count>", e.g. "=N*3" for "=N,=N,=N".
+# Substitutions such as "*AG" never end with digits, so they are not confused with runs.
+_RUN_PATTERN = re.compile(r"\*([0-9]+)(?=,|$)")
+
+
+def run(token: str, count: int) -> str:
+    """Return a token repeated count times in the run-length encoded form."""
+    if count == 1:
+        return token
+    return f"{token}*{count}"
+
+
+def _split_run(token: str) -> tuple[str, int]:
+    body, sep, count = token.rpartition("*")
+    if sep and count.isdigit():
+        return body, int(count)
+    return token, 1
+
+
+def split_runs(midsv: str | list[str]) -> list[tuple[str, int]]:
+    """Split run-length encoded MIDSV or QSCORE into tokens and their counts.
+
+    Examples:
+        >>> split_runs("=N*3,=A,-C")
+        [("=N", 3), ("=A", 1), ("-C", 1)]
+    """
+    tokens = midsv.split(",") if isinstance(midsv, str) else midsv
+    return [_split_run(token) for token in tokens]
+
+
+def length(midsv: str | list[str]) -> int:
+    """Return the number of positions of MIDSV or QSCORE, which may be run-length encoded."""
+    if isinstance(midsv, str):
+        return midsv.count(",") + 1 + sum(int(count) - 1 for count in _RUN_PATTERN.findall(midsv))
+    return sum(count for _, count in map(_split_run, midsv))
+
+
+def encode(midsv: str | list[str]) -> str:
+    """Run-length encode MIDSV or QSCORE. Adjacent runs of the same token are merged.
+
+    Examples:
+        >>> encode("=N,=N,=N,=A,=N*2,=N")
+        "=N*3,=A,=N*3"
+    """
+    runs: list[list[str | int]] = []
+    for token, count in split_runs(midsv):
+        if runs and runs[-1][0] == token:
+            runs[-1][1] += count
+        else:
+            runs.append([token, count])
+    return ",".join(run(token, count) for token, count in runs)
+
+
+def decode(midsv: str) -> str:
+    """Expand run-length encoded MIDSV or QSCORE into one token per position.
+
+    Examples:
+        >>> decode("=N*3,=A")
+        "=N,=N,=N,=A"
+    """
+    if not _RUN_PATTERN.search(midsv):
+        return midsv
+    return ",".join(",".join([token] * count) for token, count in split_runs(midsv))
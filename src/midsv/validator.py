@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import re
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
-from midsv import io
+from midsv import encoder, io
 
 ###########################################################
 # Validate keep argument
@@ -25,11 +25,101 @@ def keep_argument(keep: str | list[str]) -> list[str]:
     return keep
 
 
+###########################################################
+# Validate workers argument
+###########################################################
+
+
+def workers_argument(workers: int) -> int:
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+        raise ValueError("'workers' must be a positive integer")
+    return workers
+
+
+###########################################################
+# Validate batch_size argument
+###########################################################
+
+
+def batch_size_argument(batch_size: int) -> int:
+    if isinstance(batch_size, bool) or not isinstance(batch_size, int) or batch_size < 1:
+        raise ValueError("'batch_size' must be a positive integer")
+    return batch_size
+
+
+###########################################################
+# Validate qnames argument
+###########################################################
+
+
+def qnames_argument(qnames: str | list[str] | None) -> list[str] | None:
+    if qnames is None:
+        return None
+    if isinstance(qnames, str):
+        qnames = [qnames]
+    if not isinstance(qnames, Iterable) or not all(isinstance(qname, str) for qname in qnames):
+        raise ValueError("'qnames' must be a string or a list of strings")
+    # QNAMEs are matched with "," replaced by "_", as in the output
+    return sorted({qname.replace(",", "_") for qname in qnames})
+
+
+###########################################################
+# Validate region argument
+###########################################################
+
+_REGION_RANGE_PATTERN = re.compile(r"([0-9,]+)-([0-9,]+)")
+
+
+def region_argument(region: str | None) -> tuple[str, int, int] | None:
+    """Parse a region such as 'chr1:1,001-2,000' into RNAME and 1-based, inclusive START and END.
+    RNAME may contain ':', as the range follows the last one.
+    """
+    if region is None:
+        return None
+    rname, _, interval = str(region).rpartition(":")
+    match = _REGION_RANGE_PATTERN.fullmatch(interval)
+    if not rname or match is None:
+        raise ValueError("'region' must be in the format of 'RNAME:START-END'")
+    start, end = (int(position.replace(",", "")) for position in match.groups())
+    if not 1 <= start <= end:
+        raise ValueError("'region' must satisfy 1 <= START <= END")
+    return rname, start, end
+
+
+def region_in_sqheaders(region: tuple[str, int, int], sqheaders: dict[str, int]) -> None:
+    rname, _, end = region
+    if rname not in sqheaders:
+        raise ValueError(f"'region' has a reference '{rname}' that is not in the @SQ headers")
+    if end > sqheaders[rname]:
+        raise ValueError(f"'region' ends after the length of the reference '{rname}' ({sqheaders[rname]})")
+
+
+###########################################################
+# Validate output argument
+###########################################################
+
+
+def output_argument(output: str) -> str:
+    if output not in {"dict", "array"}:
+        raise ValueError("'output' must be 'dict' or 'array'")
+    if output == "array":
+        encoder.import_numpy()  # fail before the conversion if NumPy is not installed
+    return output
+
+
 ###########################################################
 # Validate sam format
 ###########################################################
 
 
+def sam_path(path_sam: str | Path) -> Path:
+    """Check the SAM file exists"""
+    path_sam = Path(path_sam)
+    if not path_sam.exists():
+        raise FileNotFoundError(f"{path_sam} does not exist")
+    return path_sam
+
+
 def sam_headers(sam: list[list[str]] | Iterator[list[str]]) -> None:
     """Check headers containing SN (Reference sequence name) and LN (Reference sequence length)
 
@@ -42,6 +132,31 @@ def sam_headers(sam: list[list[str]] | Iterator[list[str]]) -> None:
         raise ValueError("Input does not have @SQ header")
 
 
+def sam_alignment(alignment: list[str], qscore: bool = False) -> int | None:
+    """Check an alignment is mapped and has long-formatted cs tag
+
+    Args:
+        alignment (list[str]): a SAM alignment split by tab
+        qscore (bool, optional): Require QUAL information. Defaults to False.
+
+    Returns:
+        int | None: index of the long-formatted cs tag, or None if the read is not aligned
+    """
+    if len(alignment) < 10:
+        raise ValueError("Alignment may not be SAM format because it has less than 10 columns")
+
+    if alignment[2] == "*" or alignment[9] == "*":  # No alignment of reads
+        return None
+
+    if qscore and alignment[10] == "*":
+        raise ValueError("Input does not have QUAL information")
+
+    for i, a in enumerate(alignment):
+        if a.startswith("cs:Z:") and not re.search(r":[0-9]+", a):
+            return i
+    raise ValueError("Input does not have long-formatted cs tag")
+
+
 def sam_alignments(sam: list[list[str]] | Iterator[list[str]], qscore: bool = False) -> None:
     """Check alignments are mapped and have long-formatted cs tag
 
@@ -52,24 +167,8 @@ def sam_alignments(sam: list[list[str]] | Iterator[list[str]], qscore: bool = Fa
     for alignment in sam:
         if alignment[0].startswith("@"):
             continue
-
-        if len(alignment) < 10:
-            raise ValueError("Alignment may not be SAM format because it has less than 10 columns")
-
-        if alignment[2] == "*" or alignment[9] == "*":  # No alignment of reads
-            continue
-        has_alignment = True
-
-        if qscore and alignment[10] == "*":
-            raise ValueError("Input does not have QUAL information")
-
-        idx_cstag = None
-        for i, a in enumerate(alignment):
-            if a.startswith("cs:Z:") and not re.search(r":[0-9]+", alignment[i]):
-                idx_cstag = i
-                break
-        if idx_cstag is None:
-            raise ValueError("Input does not have long-formatted cs tag")
+        if sam_alignment(alignment, qscore) is not None:
+            has_alignment = True
 
     if not has_alignment:
         raise ValueError("No alignment information")
@@ -87,8 +186,6 @@ def validate_sam(path_sam: str | Path, qscore: bool = False) -> None:
         sam (list[list[str]] | Iterator[list[str]]): a list of lists of SAM format
 
     """
-    path_sam = Path(path_sam)
-    if not path_sam.exists():
-        raise FileNotFoundError(f"{path_sam} does not exist")
+    path_sam = sam_path(path_sam)
     sam_headers(io.read_sam(path_sam))
     sam_alignments(io.read_sam(path_sam), qscore)
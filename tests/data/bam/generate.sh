@@ -0,0 +1,4 @@
+#!/bin/sh
+
+samtools view -b --no-PG tests/data/real/tyr_cslong.sam >tests/data/bam/tyr_cslong.bam
+samtools view -b --no-PG tests/data/integrate/subindelinv_cslong_10bp.sam >tests/data/bam/subindelinv_cslong_10bp.bam
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from src import midsv
+from src.midsv import cache
+
+
+def test_make_key_depends_on_arguments():
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    key = cache.make_key(path_sam, qscore=False, keep=[])
+    assert key == cache.make_key(path_sam, qscore=False, keep=[])
+    assert key != cache.make_key(path_sam, qscore=True, keep=[])
+    assert key != cache.make_key(path_sam, qscore=False, keep=["FLAG"])
+    assert key != cache.make_key(path_sam, checksum=True, qscore=False, keep=[])
+
+
+def test_make_key_depends_on_input(tmp_path):
+    path_input = Path(tmp_path, "tmp.sam")
+    path_input.write_text("hoge")
+    key = cache.make_key(path_input)
+    path_input.write_text("fugafuga")
+    assert key != cache.make_key(path_input)
+
+
+def test_store_and_load(tmp_path):
+    result = [{"QNAME": "read1", "MIDSV": "=A,=C"}]
+    assert cache.load(tmp_path, "key") is None
+    cache.store(tmp_path, "key", result)
+    assert cache.load(tmp_path, "key") == result
+
+
+def test_evict_least_recently_used(tmp_path):
+    result = [{"QNAME": f"read{i}", "MIDSV": "=A,=C"} for i in range(10)]
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.store(tmp_path, key, result)
+        path_cache = Path(tmp_path, key + cache._SUFFIX)
+        timestamp = path_cache.stat().st_mtime - 100 + i
+        cache.os.utime(path_cache, (timestamp, timestamp))
+    cache.load(tmp_path, "used")
+
+    size = Path(tmp_path, "new" + cache._SUFFIX).stat().st_size
+    cache.evict(tmp_path, max_bytes=size * 2)
+    assert cache.load(tmp_path, "old") is None
+    assert cache.load(tmp_path, "used") == result
+    assert cache.load(tmp_path, "new") == result
+
+
+def test_transform_cache(tmp_path, monkeypatch):
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    answer = midsv.transform(path_sam, qscore=True, cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("SAM is parsed despite the cache")
+
+    monkeypatch.setattr(midsv.main.formatter, "parse_sam", fail)
+    assert midsv.transform(path_sam, qscore=True, cache_dir=tmp_path) == answer
+
+
+def test_load_corrupt_entry(tmp_path):
+    result = [{"QNAME": "read1", "MIDSV": "=A,=C"}]
+    cache.store(tmp_path, "key", result)
+    path_cache = Path(tmp_path, "key" + cache._SUFFIX)
+    path_cache.write_bytes(path_cache.read_bytes()[:-5])
+    assert cache.load(tmp_path, "key") is None
+    assert not path_cache.exists()
+    path_cache.write_bytes(b"")
+    assert cache.load(tmp_path, "key") is None
+
+
+def test_transform_cache_corrupt_entry(tmp_path):
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    answer = midsv.transform(path_sam, qscore=True, cache_dir=tmp_path)
+    (path_cache,) = tmp_path.iterdir()
+    path_cache.write_bytes(b"corrupt")
+    assert midsv.transform(path_sam, qscore=True, cache_dir=tmp_path) == answer
+    assert cache.load(tmp_path, path_cache.name.removesuffix(cache._SUFFIX)) == answer
+
+
+def test_transform_cache_checksum(tmp_path):
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    answer = midsv.transform(path_sam, qscore=True, cache_dir=tmp_path)
+    assert midsv.transform(path_sam, qscore=True, cache_dir=tmp_path, cache_checksum=True) == answer
+    assert len(list(tmp_path.iterdir())) == 2
@@ -1,3 +1,6 @@
+import random
+import re
+
 import pytest
 
 from src.midsv import converter
@@ -15,46 +18,30 @@ def test_split():
 
 
 @pytest.mark.parametrize(
-    "cstag_splitted, i, expected",
-    [
-        pytest.param(["+ttt", "*ag"], 0, ["+t|+t|+t|*ag"], id="case_normal_insertion_with_star"),
-        pytest.param(["+a", "~ta10cg"], 0, ["+a|=N"], id="case_insertion_with_splice"),
-        pytest.param(["+a", "=T"], 0, ["+a|=T"], id="case_insertion_with_match"),
-        pytest.param(
-            ["+a"], 0, ["+a"], id="case_insertion_at_end"
-        ),  # New case for the condition i + 1 == len(cstag_splitted)
-    ],
-)
-def test_process_insertion(cstag_splitted, i, expected):
-    results = []
-    converter._process_insertion(cstag_splitted, i, results)
-    assert results == expected
-
-
-@pytest.mark.parametrize(
-    "cs, expected",
+    "cstag, expected",
     [
-        ("~ta10cg", ["=N"] * 10),
-        ("~cg5ta", ["=N"] * 5),
+        pytest.param("cs:Z:+ttt*ag", "+T|+T|+T|*AG", id="case_normal_insertion_with_star"),
+        pytest.param("cs:Z:+a~ta10cg", "+A|=N,=N,=N,=N,=N,=N,=N,=N,=N,=N", id="case_insertion_with_splice"),
+        pytest.param("cs:Z:+a=T", "+A|=T", id="case_insertion_with_match"),
+        pytest.param("cs:Z:+a-gt=T", "+A|-G,-T,=T", id="case_insertion_with_deletion"),
+        pytest.param("cs:Z:=A+a", "=A,+A", id="case_insertion_at_end"),
     ],
 )
-def test_process_splice(cs, expected):
-    results = []
-    converter._process_splice(cs, results)
-    assert results == expected
+def test_cstag_to_midsv_insertion(cstag, expected):
+    assert converter.cstag_to_midsv(cstag) == expected
 
 
 @pytest.mark.parametrize(
-    "cs, expected",
+    "cstag, expected",
     [
-        ("=ACGT", ["=A,=C,=G,=T"]),
-        ("-GTC", ["-G,-T,-C"]),
+        ("cs:Z:~ta10cg", ",".join(["=N"] * 10)),
+        ("cs:Z:~cg5ta", ",".join(["=N"] * 5)),
+        ("cs:Z:=ACGT", "=A,=C,=G,=T"),
+        ("cs:Z:-GTC", "-G,-T,-C"),
     ],
 )
-def test_process_match(cs, expected):
-    results = []
-    converter._process_match(cs, results)
-    assert results == expected
+def test_cstag_to_midsv_single_operation(cstag, expected):
+    assert converter.cstag_to_midsv(cstag) == expected
 
 
 @pytest.mark.parametrize(
@@ -71,6 +58,19 @@ def test_cstag_to_midsv(cstag, expected):
     assert converter.cstag_to_midsv(cstag) == expected
 
 
+@pytest.mark.parametrize(
+    "cstag, expected",
+    [
+        ("cs:Z:=A~ta10cg=T", "=A,=N*10,=T"),
+        ("cs:Z:=A+a~ta10cg=T", "=A,+A|=N,=N*9,=T"),
+        ("cs:Z:=A+a~ta1cg=T", "=A,+A|=N,=T"),
+        ("cs:Z:=ACGT*ag=TT", "=A,=C,=G,=T,*AG,=T,=T"),
+    ],
+)
+def test_cstag_to_midsv_rle(cstag, expected):
+    assert converter.cstag_to_midsv(cstag, rle=True) == expected
+
+
 ###########################################################
 # qual_to_qscore
 ###########################################################
@@ -124,9 +124,210 @@ def test_qual_to_qscore_splicing():
     assert test == answer
 
 
+def test_qual_to_qscore_splicing_rle():
+    qual = "!!@"
+    cssplit = "=A,+A|=N,=N*9,=T"
+    test = converter.qual_to_qscore(qual, cssplit)
+    answer = "0,0|-1,-1*9,31"
+    assert test == answer
+
+
 def test_qual_to_qscore_splicing_inversion():
     qual = "!!!@@"
     cssplit = "+C|+A|+G|=N,=N,=N,=N,=N,=N,=N,=N,=N,=N,=C,=C"
     test = converter.qual_to_qscore(qual, cssplit)
     answer = "0|0|0|-1,-1,-1,-1,-1,-1,-1,-1,-1,-1,31,31"
     assert test == answer
+
+
+def test_qual_to_qscore_trailing_insertion():
+    qual = "!+5?"
+    cssplit = "=A,+C|=G,+T"
+    test = converter.qual_to_qscore(qual, cssplit)
+    answer = "0,10|20,30"
+    assert test == answer
+
+
+###########################################################
+# cstag_to_midsv_qscore
+###########################################################
+
+
+@pytest.mark.parametrize(
+    "cstag, qual, rle, expected",
+    [
+        ("cs:Z:=A+t=C-a*ag", "!+5?", False, ("=A,+T|=C,-A,*AG", "0,10|20,-1,30")),
+        ("cs:Z:=ANC", "!+5", False, ("=A,=N,=C", "0,-1,10")),
+        (
+            "cs:Z:=A+a~ta10cg=T",
+            "!!@",
+            False,
+            ("=A,+A|=N," + ",".join(["=N"] * 9) + ",=T", "0,0|-1," + ",".join(["-1"] * 9) + ",31"),
+        ),
+        ("cs:Z:=A+a~ta10cg=T", "!!@", True, ("=A,+A|=N,=N*9,=T", "0,0|-1,-1*9,31")),
+        ("cs:Z:=A+cg", "!+5", False, ("=A,+C|+G", "0,10|20")),
+    ],
+)
+def test_cstag_to_midsv_qscore(cstag, qual, rle, expected):
+    assert converter.cstag_to_midsv_qscore(cstag, qual, rle) == expected
+
+
+def _random_cstag(rng: random.Random) -> tuple[str, str, int]:
+    """A random cs tag, its QUAL and the length of the reference it spans"""
+    cstag = ["cs:Z:"]
+    query_length = reference_length = 0
+    for _ in range(rng.randint(1, 8)):
+        op = rng.choice("=*-+~")
+        if op == "=":
+            bases = "".join(rng.choices("ACGTN", k=rng.randint(1, 4)))
+            query_length += len(bases)
+            reference_length += len(bases)
+        elif op == "*":
+            bases = "".join(rng.sample("acgt", 2))
+            query_length += 1
+            reference_length += 1
+        elif op == "~":
+            splice = rng.randint(1, 5)
+            bases = f"gt{splice}ag"
+            reference_length += splice
+        else:
+            bases = "".join(rng.choices("acgt", k=rng.randint(1, 3)))
+            query_length += len(bases) if op == "+" else 0
+            reference_length += len(bases) if op == "-" else 0
+        cstag.append(op + bases)
+    qual = "".join(rng.choices("!+5?I", k=query_length))
+    return "".join(cstag), qual, reference_length
+
+
+def test_cstag_to_midsv_qscore_matches_two_pass():
+    rng = random.Random(0)
+    for _ in range(1000):
+        cstag, qual, _ = _random_cstag(rng)
+        for rle in [False, True]:
+            midsv = converter.cstag_to_midsv(cstag, rle)
+            assert converter.cstag_to_midsv_qscore(cstag, qual, rle) == (midsv, converter.qual_to_qscore(qual, midsv))
+
+
+@pytest.mark.parametrize("cstag", ["cs:Z:=ACGT", "cs:Z:=AC*ag=T", "cs:Z:=AC+gg=T", "cs:Z:=ACG+tt"])
+def test_cstag_to_midsv_qscore_short_qual(cstag):
+    with pytest.raises(ValueError) as e:
+        converter.cstag_to_midsv_qscore(cstag, "!!!")
+    assert str(e.value) == "QUAL is shorter than the query sequence in the cs tag"
+
+
+def test_convert_short_qual():
+    samdict = [{"QNAME": "read1", "CSTAG": "cs:Z:=AC*ag", "QUAL": "!!"}]
+    with pytest.raises(ValueError) as e:
+        converter.convert(samdict, qscore=True)
+    assert str(e.value) == "QUAL is shorter than the query sequence in the cs tag (QNAME 'read1')"
+
+
+###########################################################
+# Trim CS tag to a region
+###########################################################
+
+
+@pytest.mark.parametrize(
+    "cstag, pos, start, end, expected",
+    [
+        ("cs:Z:=ACGT+tt=AC", 1, 3, 5, ("cs:Z:=GT+tt=A", 3, "34567")),
+        ("cs:Z:=ACGT+tt=AC", 1, 6, 6, ("cs:Z:=C", 6, "8")),
+        ("cs:Z:=ACGT+tt=AC", 1, 1, 4, ("cs:Z:=ACGT", 1, "1234")),
+        ("cs:Z:=ACNT*ag-cc=A", 11, 13, 17, ("cs:Z:=NT*ag-cc", 13, "34")),
+        ("cs:Z:=AC~gt10ag=T", 1, 5, 13, ("cs:Z:~gt8ag=T", 5, "3")),
+        ("cs:Z:=ACGT", 1, 5, 10, None),
+        ("cs:Z:=ACGT", 5, 1, 4, None),
+    ],
+)
+def test_trim_cstag(cstag, pos, start, end, expected):
+    assert converter.trim_cstag(cstag, pos, start, end, "12345678") == expected
+
+
+def test_trim_cstag_matches_slice():
+    rng = random.Random(0)
+    for _ in range(2000):
+        cstag, qual, reference_length = _random_cstag(rng)
+        if "++" in re.sub(r"[acgt]", "", cstag):
+            continue  # adjacent insertions are not output by minimap2
+        pos = rng.randint(1, 5)
+        start = rng.randint(1, pos + reference_length)
+        end = rng.randint(start, pos + reference_length + 2)
+        midsv, qscore = converter._cstag_to_midsv_qscore_tokens(cstag, qual)
+        left, right = max(0, start - pos), max(0, end - pos + 1)
+        expected = midsv[left:right], qscore[left:right]
+        trimmed = converter.trim_cstag(cstag, pos, start, end, qual)
+        if trimmed is None:
+            assert expected == ([], [])
+            continue
+        cstag_trimmed, pos_trimmed, qual_trimmed = trimmed
+        assert pos_trimmed == max(pos, start)
+        assert converter._cstag_to_midsv_qscore_tokens(cstag_trimmed, qual_trimmed) == expected
+
+
+def test_trim_to_region_single_alignment():
+    alignments = [{"QNAME": "read1", "FLAG": 0, "POS": 11, "CIGAR": "4M", "CSTAG": "cs:Z:=ACGT", "QUAL": "5678"}]
+    result = converter.trim_to_region(alignments, ("chr1", 12, 20))
+    assert [(a["POS"], a["CSTAG"], a["QUAL"]) for a in result] == [(12, "cs:Z:=CGT", "678")]
+
+
+def test_trim_to_region_leaves_split_alignments_whole():
+    alignments = [
+        {"QNAME": "read1", "FLAG": 0, "POS": 1, "CIGAR": "4M", "CSTAG": "cs:Z:=ACGT", "QUAL": "1234"},
+        {"QNAME": "read1", "FLAG": 16, "POS": 11, "CIGAR": "4M", "CSTAG": "cs:Z:=ACGT", "QUAL": "5678"},
+    ]
+    result = converter.trim_to_region(alignments, ("chr1", 12, 20))
+    assert [(a["POS"], a["CSTAG"], a["QUAL"]) for a in result] == [
+        (1, "cs:Z:=ACGT", "1234"),
+        (11, "cs:Z:=ACGT", "5678"),
+    ]
+    result = converter.trim_fields_to_region(result, ("chr1", 12, 20))
+    assert [(a["POS"], a["CSTAG"], a["QUAL"]) for a in result] == [(1, "cs:Z:", ""), (11, "cs:Z:=CGT", "678")]
+
+
+def test_trim_to_region_skips_read_outside():
+    alignments = [{"QNAME": "read1", "FLAG": 0, "POS": 1, "CIGAR": "4M", "CSTAG": "cs:Z:=ACGT"}]
+    assert converter.trim_to_region(alignments, ("chr1", 5, 20)) == []
+
+
+###########################################################
+# Memoization
+###########################################################
+
+
+def test_convert_memoization():
+    converter.set_cache_size(2)
+    samdict = [
+        {"CSTAG": "cs:Z:=ACGT", "QUAL": "!!!!"},
+        {"CSTAG": "cs:Z:=ACGT", "QUAL": "!!!!"},
+        {"CSTAG": "cs:Z:=A*ag=GT", "QUAL": "!!@!"},
+        {"CSTAG": "cs:Z:=ACGT", "QUAL": "!!!!"},
+    ]
+    test = converter.convert(samdict, qscore=True)
+    assert [",".join(t["MIDSV"]) for t in test] == ["=A,=C,=G,=T", "=A,=C,=G,=T", "=A,*AG,=G,=T", "=A,=C,=G,=T"]
+    assert [",".join(t["QSCORE"]) for t in test] == ["0,0,0,0", "0,0,0,0", "0,0,31,0", "0,0,0,0"]
+    # Memoized results are shared, but each alignment has its own list
+    assert test[0]["MIDSV"] == test[1]["MIDSV"] and test[0]["MIDSV"] is not test[1]["MIDSV"]
+    info = converter.cache_info()
+    assert (info["cstag_to_midsv_qscore"].hits, info["cstag_to_midsv_qscore"].misses) == (2, 2)
+    assert info["cstag_to_midsv_qscore"].maxsize == 2
+
+    converter.convert([{"CSTAG": "cs:Z:=ACGT"}, {"CSTAG": "cs:Z:=ACGT"}])
+    info = converter.cache_info()
+    assert (info["cstag_to_midsv"].hits, info["cstag_to_midsv"].misses) == (1, 1)
+
+    converter.clear_cache()
+    assert converter.cache_info()["cstag_to_midsv"].currsize == 0
+    converter.set_cache_size(converter.CACHE_SIZE)
+
+
+def test_convert_memoization_ignores_qual():
+    converter.set_cache_size(converter.CACHE_SIZE)
+    samdict = [
+        {"CSTAG": "cs:Z:=AC+t*ag=T", "QUAL": "!+5?I"},
+        {"CSTAG": "cs:Z:=AC+t*ag=T", "QUAL": "I?5+!"},
+        {"CSTAG": "cs:Z:=AC+t*ag=T", "QUAL": "+++++"},
+    ]
+    test = converter.convert(samdict, qscore=True)
+    assert [",".join(t["QSCORE"]) for t in test] == ["0,10,20|30,40", "40,30,20|10,0", "10,10,10|10,10"]
+    info = converter.cache_info()["cstag_to_midsv_qscore"]
+    assert (info.hits, info.misses) == (2, 1)
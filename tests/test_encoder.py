@@ -0,0 +1,40 @@
+import pytest
+
+from src.midsv import encoder
+
+np = pytest.importorskip("numpy")
+
+
+def test_encode():
+    alignments = [
+        {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,*CG,=T", "QSCORE": "10,20,30"},
+        {"QNAME": "read2", "RNAME": "chr2", "MIDSV": "=A,-C", "QSCORE": "10,-1"},
+        {"QNAME": "read3", "RNAME": "chr1", "MIDSV": "=A,+G|+G|=C,=t", "QSCORE": "15,5|6|25,35"},
+    ]
+    test = encoder.encode(alignments)
+    assert test["VOCAB"] == ["=A", "*CG", "=T", "-C", "+G|+G|=C", "=t"]
+    chr1 = test["RNAME"]["chr1"]
+    assert chr1["QNAME"] == ["read1", "read3"]
+    assert chr1["MIDSV"].dtype == np.uint8
+    assert chr1["MIDSV"].tolist() == [[0, 1, 2], [0, 4, 5]]
+    assert chr1["QSCORE"].dtype == np.int8
+    assert chr1["QSCORE"].tolist() == [[10, 20, 30], [15, 25, 35]]
+    chr2 = test["RNAME"]["chr2"]
+    assert chr2["QNAME"] == ["read2"]
+    assert chr2["MIDSV"].tolist() == [[0, 3]]
+    assert chr2["QSCORE"].tolist() == [[10, -1]]
+
+
+def test_encode_without_qscore():
+    alignments = [{"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=C", "FLAG": 0}]
+    test = encoder.encode(alignments)
+    assert set(test["RNAME"]["chr1"]) == {"QNAME", "MIDSV", "FLAG"}
+    assert test["RNAME"]["chr1"]["FLAG"] == [0]
+
+
+def test_encode_uint16():
+    alignments = [{"QNAME": f"read{i}", "RNAME": "chr1", "MIDSV": f"=A,+{'A' * i}|=C"} for i in range(300)]
+    test = encoder.encode(alignments)
+    assert len(test["VOCAB"]) == 301
+    assert test["RNAME"]["chr1"]["MIDSV"].dtype == np.uint16
+    assert test["RNAME"]["chr1"]["MIDSV"][-1].tolist() == [0, 300]
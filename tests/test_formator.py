@@ -1,3 +1,4 @@
+import pickle
 from pathlib import Path
 
 import pytest
@@ -17,6 +18,45 @@ def test_extract_sqheaders():
     assert test == answer
 
 
+###########################################################
+# Group alignments by QNAME
+###########################################################
+
+
+@pytest.mark.parametrize(
+    "qnames, expected",
+    [
+        (["a", "a", "b", "c"], [["a", "a"], ["b"], ["c"]]),
+        (["c", "a", "b", "a"], [["a", "a"], ["b"], ["c"]]),
+        (["b", "a", "b"], [["a"], ["b", "b"]]),
+        ([], []),
+    ],
+)
+def test_group_alignments(qnames, expected):
+    groups = formatter.group_alignments({"QNAME": qname} for qname in qnames)
+    assert [[alignment["QNAME"] for alignment in group] for group in groups] == expected
+
+
+def test_group_alignments_keeps_input_order_within_group():
+    alignments = [{"QNAME": "b", "POS": 5}, {"QNAME": "a", "POS": 1}, {"QNAME": "b", "POS": 2}]
+    groups = list(formatter.group_alignments(alignments))
+    assert groups == [[{"QNAME": "a", "POS": 1}], [{"QNAME": "b", "POS": 5}, {"QNAME": "b", "POS": 2}]]
+
+
+def test_iter_qname_groups():
+    alignments = [{"QNAME": qname} for qname in ["b", "b", "a", "c"]]
+    groups = formatter.iter_qname_groups(alignments)
+    assert [[x["QNAME"] for x in group] for group in groups] == [["b", "b"], ["a"], ["c"]]
+
+
+def test_iter_qname_groups_not_grouped():
+    alignments = [{"QNAME": qname} for qname in ["a", "b", "a"]]
+    with pytest.raises(ValueError, match=r"Input is not grouped by QNAME: 'a' appears again after other reads"):
+        list(formatter.iter_qname_groups(alignments, check_grouped=True))
+    groups = formatter.iter_qname_groups(alignments)
+    assert [[x["QNAME"] for x in group] for group in groups] == [["a"], ["b"], ["a"]]
+
+
 ###########################################################
 # Remove undesired reads
 ###########################################################
@@ -25,15 +65,31 @@ def test_extract_sqheaders():
 @pytest.mark.parametrize(
     "cigar, expected",
     [
-        pytest.param("10M5I2D", ["10M", "5I", "2D"], id="case_simple_operations"),
-        pytest.param("5M1S3M", ["5M", "1S", "3M"], id="case_with_softclip"),
-        pytest.param("20M", ["20M"], id="case_single_operation"),
-        pytest.param("", [], id="case_empty_string"),
-        pytest.param("10M1I1M2S", ["10M", "1I", "1M", "2S"], id="case_complex_operations"),
+        pytest.param("10M5I2D", ([10, 5, 2], "MID", 12, 15, 0, 0), id="case_simple_operations"),
+        pytest.param("3S5M1N2M4S", ([3, 5, 1, 2, 4], "SMNMS", 8, 7, 3, 4), id="case_softclips"),
+        pytest.param("2H3S5M2H", ([2, 3, 5, 2], "HSMH", 5, 5, 3, 0), id="case_softclip_inside_hardclip"),
+        pytest.param("4=1X2=", ([4, 1, 2], "=X=", 7, 7, 0, 0), id="case_eqx"),
+        pytest.param("*", ([], "", 0, 0, 0, 0), id="case_unavailable"),
     ],
 )
-def test_split_cigar(cigar, expected):
-    assert formatter.split_cigar(cigar) == expected
+def test_parse_cigar(cigar, expected):
+    lengths, *others = expected
+    parsed = formatter.parse_cigar(cigar)
+    assert list(parsed.lengths) == lengths
+    assert tuple(parsed)[1:] == tuple(others)
+
+
+def test_get_cigar_is_stored_on_alignment():
+    alignment = {"CIGAR": "5M"}
+    cigar = formatter.get_cigar(alignment)
+    assert alignment["PARSED_CIGAR"] is cigar
+    assert formatter.get_cigar(alignment) is cigar
+
+
+def test_remove_softclips_inside_hardclips():
+    alignment = {"CIGAR": "2H3S5M2S", "SEQ": "TTTACGTAGG", "QUAL": "!!!IIIII##"}
+    (result,) = formatter.remove_softclips([alignment])
+    assert result["SEQ"] == "ACGTA" and result["QUAL"] == "IIIII"
 
 
 def test_remove_softclips():
@@ -54,11 +110,23 @@ def test_remove_softclips():
         pytest.param({"POS": 1, "SEQ": "ACGT", "CIGAR": "2M5N2M"}, {"SEQ": "ACNNNNNGT"}, id="case_splicing"),
     ],
 )
-def test_padding_n_to_sequence(alignment, expected):
-    result = formatter._padding_n_to_sequence(alignment)
-    del result["POS"]
-    del result["CIGAR"]
-    assert result == expected
+def test_slice_padded_sequence(alignment, expected):
+    _, aligned_length, blocks = formatter._aligned_blocks(alignment)
+    assert formatter._slice_padded_sequence(alignment, aligned_length, blocks, 0, 100) == expected["SEQ"]
+    assert formatter._slice_padded_sequence(alignment, aligned_length, blocks, 3, 7) == expected["SEQ"][3:7]
+
+
+@pytest.mark.parametrize(
+    "alignment, expected",
+    [
+        pytest.param({"POS": 1, "SEQ": "ACGT", "CIGAR": "2M1I1D1M"}, 4, id="case_simple_cigar"),
+        pytest.param({"POS": 6, "SEQ": "ACGT", "CIGAR": "2H2M1I1D1M"}, 9, id="case_start_with_5nt"),
+        pytest.param({"POS": 1, "SEQ": "ACGT", "CIGAR": "2M5N2M"}, 9, id="case_splicing"),
+    ],
+)
+def test_aligned_blocks_end(alignment, expected):
+    end, *_ = formatter._aligned_blocks(alignment)
+    assert end == expected
 
 
 def test_remove_resequence():
@@ -76,6 +144,14 @@ def test_remove_resequence():
     assert count_overlap == 1 and count_nonoverlap == 2
 
 
+def test_remove_resequence_keeps_seq():
+    alignments = [
+        {"QNAME": "read1", "POS": 5, "SEQ": "ACGT", "CIGAR": "4M"},
+        {"QNAME": "read1", "POS": 20, "SEQ": "ACGT", "CIGAR": "2M2D2M"},
+    ]
+    assert formatter.remove_resequence(alignments) == alignments
+
+
 ###########################################################
 # alignments_to_dict
 ###########################################################
@@ -194,3 +270,146 @@ def test_revcomp_insertion_shift():
     midsv_tag = "=A,=A,-G,+T|+C|=A,=A,*AG,=C"
     expected = "=G,*TC,=T,=T,+G|+A|-C,=T,=T"
     assert formatter.revcomp(midsv_tag) == expected
+
+
+###########################################################
+# Parse SAM in a single pass
+###########################################################
+
+
+def test_parse_sam():
+    path = Path("tests", "data", "real", "tyr_cslong.sam")
+    sqheaders, alignments = formatter.parse_sam(io.read_sam(path))
+    assert sqheaders == formatter.extract_sqheaders(io.read_sam(path))
+    assert list(alignments) == formatter.alignments_to_dict(io.read_sam(path))
+
+
+@pytest.mark.parametrize(
+    "qscore, keep, has_qual",
+    [
+        (False, None, True),
+        (False, [], False),
+        (True, [], True),
+        (False, ["QUAL"], True),
+    ],
+)
+def test_parse_sam_qual(qscore, keep, has_qual):
+    path = Path("tests", "data", "real", "tyr_cslong.sam")
+    _, alignments = formatter.parse_sam(io.read_sam(path), qscore, keep)
+    assert all(("QUAL" in alignment) is has_qual for alignment in alignments)
+
+
+def test_drop_fields():
+    alignments = [{"QNAME": "read1", "SEQ": "ACGT", "QUAL": "!!!!"}, {"QNAME": "read2", "SEQ": "ACGT"}]
+    assert formatter.drop_fields(alignments, {"SEQ", "QUAL"}) == [{"QNAME": "read1"}, {"QNAME": "read2"}]
+
+
+def test_drop_fields_alignment():
+    alignments = [formatter.Alignment(QNAME="read1", SEQ="ACGT", QUAL="!!!!")]
+    assert formatter.drop_fields(alignments, {"SEQ", "QUAL"}) == [{"QNAME": "read1"}]
+
+
+@pytest.mark.parametrize(
+    "pos, cigar, expected",
+    [(1, "10M", True), (1, "9M", False), (16, "5S5M", True), (21, "5M", False), (1, "5M10D5M", True)],
+)
+def test_overlaps_region(pos, cigar, expected):
+    alignment = {"POS": pos, "CIGAR": cigar}
+    assert formatter.overlaps_region(alignment, ("chr1", 10, 20)) is expected
+
+
+def test_filter_region():
+    alignments = [{"QNAME": "read1", "RNAME": "chr1"}, {"QNAME": "read2", "RNAME": "chr2"}]
+    assert list(formatter.filter_region(alignments, ("chr1", 1, 10))) == [alignments[0]]
+
+
+###########################################################
+# Alignment
+###########################################################
+
+
+def test_alignment_as_dict():
+    alignment = formatter.Alignment(QNAME="read1", POS=1)
+    alignment["MIDSV"] = ["=A"]
+    assert alignment == {"QNAME": "read1", "POS": 1, "MIDSV": ["=A"]}
+    assert list(alignment) == ["QNAME", "POS", "MIDSV"]
+    assert len(alignment) == 3
+    assert "MIDSV" in alignment
+    assert "QSCORE" not in alignment
+    assert alignment.get("QSCORE", "missing") == "missing"
+    assert alignment.pop("POS") == 1
+    assert alignment.pop("POS", None) is None
+    del alignment["MIDSV"]
+    assert dict(alignment) == {"QNAME": "read1"}
+
+
+def test_alignment_missing_field():
+    alignment = formatter.Alignment(QNAME="read1")
+    with pytest.raises(KeyError):
+        alignment["QSCORE"]
+    with pytest.raises(KeyError):
+        del alignment["QSCORE"]
+    with pytest.raises(KeyError):
+        alignment["COUNT"] = 1
+
+
+def test_alignment_copy_and_pickle():
+    alignment = formatter.Alignment(QNAME="read1", MIDSV=["=A"])
+    copied = alignment.copy()
+    copied["QNAME"] = "read2"
+    assert alignment["QNAME"] == "read1"
+    assert copied["MIDSV"] is alignment["MIDSV"]
+    assert pickle.loads(pickle.dumps(alignment)) == alignment
+
+
+def test_alignment_has_no_dict():
+    assert not hasattr(formatter.Alignment(), "__dict__")
+
+
+@pytest.mark.parametrize(
+    "sam, qscore, message",
+    [
+        pytest.param(
+            [["@HD", "VN:1.6"], ["read1", "0", "chr1", "1", "60", "4M", "*", "0", "0", "ACGT", "!!!!", "cs:Z:=ACGT"]],
+            False,
+            "Input does not have @SQ header",
+            id="case_no_sqheader",
+        ),
+        pytest.param(
+            [
+                ["@SQ", "SN:chr1", "LN:10"],
+                ["read1", "0", "chr1", "1", "60", "4M", "*", "0", "0", "ACGT", "!!!!", "cs:Z:=ACGT"],
+                ["read2", "0", "chr1", "1", "60", "4M", "*", "0", "0", "ACGT", "!!!!", "cs:Z:4"],
+            ],
+            False,
+            "Input does not have long-formatted cs tag (line 3)",
+            id="case_cs_short",
+        ),
+        pytest.param(
+            [
+                ["@SQ", "SN:chr1", "LN:10"],
+                ["read1", "0", "chr1", "1", "60", "4M", "*", "0", "0", "ACGT", "*", "cs:Z:=ACGT"],
+            ],
+            True,
+            "Input does not have QUAL information (line 2)",
+            id="case_no_qual",
+        ),
+        pytest.param(
+            [["@SQ", "SN:chr1", "LN:10"], ["read1", "0", "chr1", "1"]],
+            False,
+            "Alignment may not be SAM format because it has less than 10 columns (line 2)",
+            id="case_invalid_columns",
+        ),
+        pytest.param(
+            [["@SQ", "SN:chr1", "LN:10"], ["read1", "4", "*", "0", "0", "*", "*", "0", "0", "*", "*"]],
+            False,
+            "No alignment information",
+            id="case_no_alignment",
+        ),
+    ],
+)
+def test_parse_sam_invalid(sam, qscore, message):
+    with pytest.raises(ValueError) as excinfo:
+        _, alignments = formatter.parse_sam(sam, qscore)
+        list(alignments)
+    assert str(excinfo.value) == message
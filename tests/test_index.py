@@ -0,0 +1,161 @@
+import gzip
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src import midsv
+from src.midsv import index, io
+
+SAM = """@SQ\tSN:chr1\tLN:100
+@SQ\tSN:chr2\tLN:100
+read1\t0\tchr1\t1\t60\t4M\t*\t0\t0\tACGT\t!!!!\tcs:Z:=ACGT
+read2\t0\tchr1\t3\t60\t4M\t*\t0\t0\tGTAC\t!!!!\tcs:Z:=GTAC
+read1\t2048\tchr2\t50\t60\t4M\t*\t0\t0\tACGT\t!!!!\tcs:Z:=ACGT
+read3\t0\tchr2\t60\t60\t2M\t*\t0\t0\tAC\t!!\tcs:Z:=AC
+"""
+
+
+@pytest.fixture
+def path_sam(tmp_path):
+    path_sam = Path(tmp_path, "test.sam")
+    path_sam.write_text(SAM)
+    return path_sam
+
+
+def _sort_by_coordinate(path_input: Path, path_output: Path) -> None:
+    lines = path_input.read_text().splitlines(keepends=True)
+    headers = [line for line in lines if line.startswith("@")]
+    alignments = [line for line in lines if not line.startswith("@")]
+    alignments.sort(key=lambda line: (line.split("\t")[2], int(line.split("\t")[3])))
+    path_output.write_text("".join(headers + alignments))
+
+
+###########################################################
+# Build and load
+###########################################################
+
+
+def test_build_index(path_sam):
+    sam_index = index.build_index(path_sam)
+    offsets = [0]
+    for line in SAM.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(line))
+    assert sam_index.header_end == offsets[2]
+    assert sam_index.coordinate_sorted
+    assert sam_index.rnames == {"chr1": [offsets[2], offsets[4]], "chr2": [offsets[4], offsets[6]]}
+    assert sam_index.bins == {"chr1": [offsets[2]], "chr2": [offsets[4]]}
+    assert sam_index.qnames == ["read1", "read2", "read3"]
+    assert sam_index.qname_ranges == [offsets[2], offsets[3], offsets[4], offsets[5], *offsets[3:5], *offsets[5:7]]
+    assert sam_index.qname_bounds == [0, 4, 6, 8]
+    assert index.load_index(path_sam) == sam_index
+
+
+def test_build_index_not_sorted(tmp_path):
+    path_sam = Path(tmp_path, "tyr_cslong.sam")
+    shutil.copy(Path("tests", "data", "real", "tyr_cslong.sam"), path_sam)
+    sam_index = index.build_index(path_sam)
+    assert not sam_index.coordinate_sorted
+    assert sam_index.rnames == sam_index.bins == {}
+    # Grouped by QNAME, so each read is a single range
+    assert sam_index.qname_bounds == list(range(0, 2 * len(sam_index.qnames) + 1, 2))
+
+
+def test_load_index_modified(path_sam):
+    assert index.load_index(path_sam) is None
+    index.build_index(path_sam)
+    path_sam.write_text(SAM + SAM)
+    assert index.load_index(path_sam) is None
+
+
+def test_build_index_compressed(tmp_path):
+    path_sam = Path(tmp_path, "test.sam.gz")
+    path_sam.write_bytes(gzip.compress(SAM.encode()))
+    with pytest.raises(ValueError, match=r"Only uncompressed SAM files can be indexed"):
+        index.build_index(path_sam)
+
+
+###########################################################
+# Select and read records
+###########################################################
+
+
+@pytest.mark.parametrize(
+    "region, qnames, expected",
+    [
+        (None, ["read2"], ["read2"]),
+        (None, ["read1", "unknown"], ["read1", "read1"]),
+        (("chr2", 61, 100), None, ["read3"]),
+        # The other alignment of read1 is read, since it is merged with the alignment in the region
+        (("chr2", 1, 51), None, ["read1", "read1"]),
+        (("chr1", 90, 100), None, []),
+    ],
+)
+def test_select_and_read_ranges(monkeypatch, path_sam, region, qnames, expected):
+    monkeypatch.setattr(index, "BIN_SIZE", 10)
+    sam_index = index.build_index(path_sam)
+    ranges = index.select_ranges(path_sam, sam_index, region, qnames)
+    records = list(index.read_ranges(path_sam, sam_index, ranges))
+    assert records[:2] == list(io.read_sam(path_sam))[:2]
+    assert [record[0] for record in records[2:]] == expected
+
+
+def test_select_ranges_region_not_sorted(tmp_path):
+    path_sam = Path(tmp_path, "tyr_cslong.sam")
+    shutil.copy(Path("tests", "data", "real", "tyr_cslong.sam"), path_sam)
+    sam_index = index.build_index(path_sam)
+    assert index.select_ranges(path_sam, sam_index, region=("control", 1, 100)) is None
+
+
+###########################################################
+# Transform with the index
+###########################################################
+
+
+@pytest.mark.parametrize("region", ["control:1-100", "control:1001-1200", "control:2801-2845"])
+def test_transform_region_with_index(tmp_path, region):
+    path_sam = Path(tmp_path, "tyr_cslong.sam")
+    _sort_by_coordinate(Path("tests", "data", "real", "tyr_cslong.sam"), path_sam)
+    answer = midsv.transform(path_sam, qscore=True, region=region)
+    index.build_index(path_sam)
+    assert midsv.transform(path_sam, qscore=True, region=region) == answer
+
+
+def test_transform_qnames_with_index(tmp_path):
+    path_sam = Path(tmp_path, "subindelinv_cslong_10bp.sam")
+    shutil.copy(Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam"), path_sam)
+    records = midsv.transform(path_sam, qscore=True)
+    qnames = [records[1]["QNAME"], records[-1]["QNAME"]]
+    answer = [record for record in records if record["QNAME"] in qnames]
+    assert midsv.transform(path_sam, qscore=True, qnames=qnames) == answer
+    index.build_index(path_sam)
+    assert midsv.transform(path_sam, qscore=True, qnames=qnames) == answer
+    assert midsv.transform(path_sam, qnames="unknown") == []
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_transform_iter_and_batches_qnames(tmp_path, indexed):
+    path_sam = Path(tmp_path, "subindelinv_cslong_10bp.sam")
+    shutil.copy(Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam"), path_sam)
+    records = midsv.transform(path_sam, qscore=True)
+    qnames = [records[1]["QNAME"], records[-1]["QNAME"]]
+    answer = {record["QNAME"]: record for record in records if record["QNAME"] in qnames}
+    if indexed:
+        index.build_index(path_sam)
+    # Records are in the order of the SAM file
+    test = list(midsv.transform_iter(path_sam, qscore=True, qnames=qnames))
+    assert {record["QNAME"]: record for record in test} == answer
+    (batch,) = midsv.transform_batches(path_sam, qscore=True, qnames=qnames)
+    assert batch["QNAME"] == [record["QNAME"] for record in test]
+    assert batch["MIDSV"] == [record["MIDSV"] for record in test]
+
+
+def test_transform_qnames_with_comma(tmp_path):
+    path_sam = Path(tmp_path, "comma.sam")
+    path_sam.write_text(SAM.replace("read1", "read,1"))
+    answer = midsv.transform(path_sam, qscore=True, qnames="read_1")
+    assert [record["QNAME"] for record in answer] == ["read_1"]
+    sam_index = index.build_index(path_sam)
+    assert sam_index.qnames == ["read_1", "read2", "read3"]
+    assert midsv.transform(path_sam, qscore=True, qnames="read_1") == answer
+    assert midsv.transform(path_sam, qscore=True, qnames="read,1") == answer
@@ -1,7 +1,9 @@
 from pathlib import Path
 
+import pytest
+
 from src import midsv
-from src.midsv import converter, formatter, io, polisher, validator
+from src.midsv import converter, formatter, io, polisher, runlength, validator
 
 
 def test_integration_midsv():
@@ -73,3 +75,217 @@ def test_keep_option_preserves_flag():
     path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
     result = midsv.transform(path_sam=path_sam, qscore=False, keep={"FLAG"})
     assert all("FLAG" in record for record in result)
+
+
+def test_transform_reports_line_number():
+    path_sam = Path("tests", "data", "real", "tyr_cs.sam")
+    with pytest.raises(ValueError) as excinfo:
+        midsv.transform(path_sam)
+    assert str(excinfo.value) == "Input does not have long-formatted cs tag (line 3)"
+
+
+def test_transform_iter():
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    test = midsv.transform_iter(path_sam, qscore=True)
+    assert not isinstance(test, list)
+    answer = midsv.transform(path_sam, qscore=True)
+    assert sorted(test, key=lambda x: x["QNAME"]) == answer
+
+
+@pytest.mark.parametrize("transform", [midsv.transform_iter, midsv.transform_batches])
+def test_transform_iter_not_grouped_by_qname(tmp_path, transform):
+    lines = Path("tests", "data", "real", "tyr_cslong.sam").read_text().splitlines(keepends=True)
+    headers = [line for line in lines if line.startswith("@")]
+    alignments = [line for line in lines if not line.startswith("@")]
+    qname = alignments[0].split("\t")[0]
+    path_sam = Path(tmp_path, "not_grouped.sam")
+    path_sam.write_text("".join(headers + alignments + alignments[:1]))
+    with pytest.raises(ValueError, match=rf"not grouped by QNAME: '{qname}'"):
+        list(transform(path_sam, check_grouped=True))
+    # Without the check, the read is output again
+    records = list(transform(path_sam))
+    if transform is midsv.transform_batches:
+        records = [{"QNAME": qname} for batch in records for qname in batch["QNAME"]]
+    assert [record["QNAME"] for record in records].count(qname) == 2
+    # transform groups the reads
+    assert len(midsv.transform(path_sam)) == len(midsv.transform(Path("tests", "data", "real", "tyr_cslong.sam")))
+
+
+def test_transform_iter_write_jsonl(tmp_path):
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    path_jsonl = Path(tmp_path, "tmp.jsonl")
+    io.write_jsonl(midsv.transform_iter(path_sam), path_jsonl)
+    test = sorted(io.read_jsonl(path_jsonl), key=lambda x: x["QNAME"])
+    assert test == midsv.transform(path_sam)
+
+
+def test_transform_workers(monkeypatch):
+    monkeypatch.setattr(midsv.main, "SHARD_SIZE", 3)
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    test = midsv.transform(path_sam, qscore=True, workers=2)
+    answer = midsv.transform(path_sam, qscore=True)
+    assert test == answer
+
+
+def test_transform_bam():
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    path_bam = Path("tests", "data", "bam", "tyr_cslong.bam")
+    test = midsv.transform(path_bam, qscore=True)
+    answer = midsv.transform(path_sam, qscore=True)
+    assert test == answer
+
+
+def test_transform_collapse():
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    records = midsv.transform(path_sam)
+    test = midsv.transform(path_sam, collapse=True, collapse_qnames=3)
+    assert sum(t["COUNT"] for t in test) == len(records)
+    assert len({(t["RNAME"], t["MIDSV"]) for t in test}) == len(test)
+    assert all(1 <= len(t["QNAMES"]) <= 3 for t in test)
+
+
+def test_transform_array():
+    np = pytest.importorskip("numpy")
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    records = midsv.transform(path_sam, qscore=True)
+    test = midsv.transform(path_sam, qscore=True, output="array")
+    vocab = np.array(test["VOCAB"], dtype=object)
+    for rname, fields in test["RNAME"].items():
+        answer = [r for r in records if r["RNAME"] == rname]
+        assert fields["QNAME"] == [r["QNAME"] for r in answer]
+        assert [",".join(row) for row in vocab[fields["MIDSV"]]] == [r["MIDSV"] for r in answer]
+        assert fields["QSCORE"].shape == fields["MIDSV"].shape
+
+
+@pytest.mark.parametrize(
+    "path_sam",
+    [
+        Path("tests", "data", "splicing", "real_splicing.sam"),
+        Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam"),
+    ],
+)
+def test_transform_rle(path_sam):
+    test = midsv.transform(path_sam, qscore=True, rle=True)
+    answer = midsv.transform(path_sam, qscore=True)
+    for t, a in zip(test, answer, strict=True):
+        assert len(t["MIDSV"]) <= len(a["MIDSV"])
+        assert runlength.decode(t["MIDSV"]) == a["MIDSV"]
+        assert runlength.decode(t["QSCORE"]) == a["QSCORE"]
+
+
+@pytest.mark.parametrize("rle", [False, True])
+def test_transform_without_padding(rle):
+    path_sam = Path("tests", "data", "splicing", "real_splicing.sam")
+    sqheaders = {"deletion": 3582}
+    answer = midsv.transform(path_sam, qscore=True, rle=rle)
+    test = midsv.transform(path_sam, qscore=True, rle=rle, pad=False)
+    assert all(1 <= t["START"] <= t["END"] <= 3582 for t in test)
+    assert [midsv.expand(t, sqheaders, rle) for t in test] == answer
+
+
+@pytest.mark.parametrize(
+    "path_sam, region",
+    [
+        (Path("tests", "data", "splicing", "real_splicing.sam"), "deletion:2001-3000"),
+        (Path("tests", "data", "overlap", "overlapped.sam"), "random_100bp:33-66"),
+        (Path("tests", "data", "overlap", "overlapped.sam"), "random_100bp:52-60"),
+    ],
+)
+@pytest.mark.parametrize("rle", [False, True])
+def test_transform_without_padding_region(path_sam, region, rle):
+    sqheaders = formatter.extract_sqheaders(io.read_sam(path_sam))
+    answer = midsv.transform(path_sam, qscore=True, rle=rle, region=region)
+    test = midsv.transform(path_sam, qscore=True, rle=rle, region=region, pad=False)
+    assert [midsv.expand(t, sqheaders, rle, region) for t in test] == answer
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+def test_transform_batches(batch_size):
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    answer = list(midsv.transform_iter(path_sam, qscore=True, keep=["FLAG", "SEQ"]))
+    batches = list(midsv.transform_batches(path_sam, batch_size, qscore=True, keep=["FLAG", "SEQ"]))
+    assert [len(batch["QNAME"]) for batch in batches[:-1]] == [batch_size] * (len(batches) - 1)
+    for batch in batches:
+        assert list(batch) == ["QNAME", "FLAG", "RNAME", "SEQ", "MIDSV", "QSCORE"]
+    test = [dict(zip(batch, values)) for batch in batches for values in zip(*batch.values())]
+    assert test == answer
+
+
+def test_transform_batches_validates_arguments():
+    with pytest.raises(ValueError, match=r"'batch_size' must be a positive integer"):
+        midsv.transform_batches(Path("tests", "data", "real", "tyr_cslong.sam"), batch_size=0)
+
+
+@pytest.mark.parametrize(
+    "path_sam, region",
+    [
+        (Path("tests", "data", "real", "tyr_cslong.sam"), "control:1001-1200"),
+        (Path("tests", "data", "splicing", "real_splicing.sam"), "deletion:2001-3000"),
+    ],
+)
+def test_transform_region(path_sam, region):
+    start, end = (int(x) for x in region.split(":")[1].split("-"))
+    answer = {}
+    for record in midsv.transform(path_sam, qscore=True):
+        midsv_tokens = record["MIDSV"].split(",")[start - 1 : end]
+        qscore_tokens = record["QSCORE"].split(",")[start - 1 : end]
+        answer[record["QNAME"]] = {**record, "MIDSV": ",".join(midsv_tokens), "QSCORE": ",".join(qscore_tokens)}
+    test = midsv.transform(path_sam, qscore=True, region=region)
+    assert 0 < len(test) <= len(answer)
+    assert test == [answer.pop(record["QNAME"]) for record in test]
+    # Reads not in the output do not cover the region
+    assert all(set(record["MIDSV"].split(",")) == {"=N"} for record in answer.values())
+
+
+@pytest.mark.parametrize(
+    "path_sam",
+    [
+        Path("tests", "data", "overlap", "overlapped.sam"),
+        Path("tests", "data", "overlap", "real_overlap.sam"),
+        Path("tests", "data", "overlap", "real_overlap2.sam"),
+        Path("tests", "data", "inversion", "inv_cslong.sam"),
+        Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam"),
+        Path("tests", "data", "splicing", "real_splicing.sam"),
+    ],
+)
+@pytest.mark.parametrize("rle", [False, True])
+def test_transform_region_matches_sliced_output(path_sam, rle):
+    # Split alignments are merged before cropping, so microhomology is measured on the whole alignments
+    rname, length = next(iter(formatter.extract_sqheaders(io.read_sam(path_sam)).items()))
+    records = midsv.transform(path_sam, qscore=True)
+    width = max(4, length // 3)
+    for start in range(1, length + 1, max(1, length // 20)):
+        end = min(length, start + width - 1)
+        answer = {}
+        for record in records:
+            answer[record["QNAME"]] = [
+                ",".join(record[key].split(",")[start - 1 : end]) for key in ["MIDSV", "QSCORE"]
+            ]
+        test = midsv.transform(path_sam, qscore=True, rle=rle, region=f"{rname}:{start}-{end}")
+        for record in test:
+            tags = [record["MIDSV"], record["QSCORE"]]
+            assert (runlength.decode(tags[0]), runlength.decode(tags[1])) == tuple(answer.pop(record["QNAME"]))
+        # Reads not in the output do not cover the region
+        assert all(set(midsv_tags.split(",")) == {"=N"} for midsv_tags, _ in answer.values())
+
+
+def test_transform_region_keeps_strand_of_first_alignment():
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    answer = [record["MIDSV"].split(",")[5:9] for record in midsv.transform(path_sam)]
+    test = [record["MIDSV"].split(",") for record in midsv.transform(path_sam, region="example:6-9")]
+    assert test == answer
+
+
+def test_transform_region_invalid_reference():
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    with pytest.raises(ValueError, match=r"'region' has a reference 'chr1' that is not in the @SQ headers"):
+        midsv.transform(path_sam, region="chr1:1-10")
+
+
+def test_transform_supplementary_within_microhomology():
+    # The second alignment of "non-overlapped" is identical to the first, so all of its tokens are microhomology
+    path_sam = Path("tests", "data", "overlap", "overlapped.sam")
+    for record in midsv.transform(path_sam):
+        tokens = record["MIDSV"].split(",")
+        assert len(tokens) == 100
+        assert "" not in tokens
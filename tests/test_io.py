@@ -1,8 +1,9 @@
+import gzip
 from pathlib import Path
 
 import pytest
 
-from src.midsv import io
+from src.midsv import io, runlength
 
 ###########################################################
 # Read sam
@@ -25,6 +26,38 @@ def test_check_read_sam_Path():
     assert test == answer
 
 
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_check_read_sam_chunk_size(chunk_size):
+    path = Path("tests", "data", "subindel", "subindel_cslong.sam")
+    test = list(io.read_sam(path, chunk_size=chunk_size))
+    answer = eval(Path("tests", "data", "read_sam", "answer.txt").read_text())
+    assert test == answer
+
+
+def test_check_read_sam_without_trailing_newline(tmp_path):
+    path = Path(tmp_path, "tmp.sam")
+    path.write_bytes(b"@SQ\tSN:example\tLN:10\r\n\nread\t0\texample")
+    test = list(io.read_sam(path, chunk_size=4))
+    assert test == [["@SQ", "SN:example", "LN:10"], ["read", "0", "example"]]
+
+
+def test_check_read_sam_line_longer_than_chunks(tmp_path):
+    path = Path(tmp_path, "tmp.sam")
+    seq = "ACGT" * 100_000
+    path.write_text(f"@SQ\tSN:example\tLN:400000\nread\t0\texample\t1\t{seq}\nread2\n")
+    test = list(io.read_sam(path, chunk_size=64))
+    assert test == [["@SQ", "SN:example", "LN:400000"], ["read", "0", "example", "1", seq], ["read2"]]
+
+
+def test_check_read_sam_gzip(tmp_path):
+    path = Path("tests", "data", "subindel", "subindel_cslong.sam")
+    path_gz = Path(tmp_path, "tmp.sam.gz")
+    path_gz.write_bytes(gzip.compress(path.read_bytes()))
+    test = list(io.read_sam(path_gz, chunk_size=64))
+    answer = eval(Path("tests", "data", "read_sam", "answer.txt").read_text())
+    assert test == answer
+
+
 def test_check_read_sam_TypeError():
     with pytest.raises(TypeError):
         assert io.read_sam(1)
@@ -35,6 +68,59 @@ def test_check_read_sam_FileNotFoundError():
         assert io.read_sam("hoge")
 
 
+###########################################################
+# Read bam
+###########################################################
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_read_bam(threads):
+    path_sam = Path("tests", "data", "integrate", "subindelinv_cslong_10bp.sam")
+    path_bam = Path("tests", "data", "bam", "subindelinv_cslong_10bp.bam")
+    test = list(io.read_bam(path_bam, threads=threads))
+    answer = list(io.read_sam(path_sam))
+    assert test == answer
+
+
+def test_read_bam_real():
+    path_sam = Path("tests", "data", "real", "tyr_cslong.sam")
+    path_bam = Path("tests", "data", "bam", "tyr_cslong.bam")
+    test = list(io.read_bam(path_bam))
+    answer = list(io.read_sam(path_sam))
+    assert len(test) == len(answer)
+    for t, a in zip(test, answer):
+        # Floating-point tags such as de:f are reformatted by samtools
+        assert [f for f in t if ":f:" not in f] == [f for f in a if ":f:" not in f]
+
+
+def test_read_sam_detects_bam():
+    path_bam = Path("tests", "data", "bam", "tyr_cslong.bam")
+    assert list(io.read_sam(path_bam)) == list(io.read_bam(path_bam))
+
+
+def test_decode_aux():
+    data = b"".join(
+        [
+            b"XAAz",
+            b"XBc\xff",
+            b"XCSd\x00",
+            b"XDf\x00\x00\xc0\x3f",
+            b"csZ=ACGT\x00",
+            b"XEBs\x02\x00\x00\x00\x01\x00\xfe\xff",
+        ]
+    )
+    test = io._decode_aux(data, 0)
+    answer = {
+        "XA": "XA:A:z",
+        "XB": "XB:i:-1",
+        "XC": "XC:i:100",
+        "XD": "XD:f:1.5",
+        "cs": "cs:Z:=ACGT",
+        "XE": "XE:B:s,1,-2",
+    }
+    assert test == answer
+
+
 ###########################################################
 # Read / Write jsonl
 ###########################################################
@@ -55,6 +141,14 @@ def test_write_jsonl(tmp_path):
     assert output_path.read_text() == '{"hoge": 1, "fuga": 2}\n{"foo": "3", "bar": "4"}\n'
 
 
+def test_write_and_read_jsonl_gzip(tmp_path):
+    dicts = [{"hoge": 1, "fuga": 2}, {"foo": "3", "bar": "4"}]
+    output_path = Path(tmp_path, "tmp.jsonl.gz")
+    io.write_jsonl(iter(dicts), output_path)
+    assert gzip.decompress(output_path.read_bytes()).decode() == '{"hoge": 1, "fuga": 2}\n{"foo": "3", "bar": "4"}\n'
+    assert list(io.read_jsonl(output_path)) == dicts
+
+
 def test_write_vcf(tmp_path):
     alignments = [
         {"QNAME": "large-deletion", "RNAME": "example", "MIDSV": "=A,=C,=N,=N,=N,=N,=N,=N,=G,=T"},
@@ -76,3 +170,43 @@ def test_write_vcf(tmp_path):
         "longins\t1\t.\tG\t<INS>\t.\tPASS\tTYPE=INS;SVLEN=6;SEQ=AAAAAA;QNAME=long-ins",
     ]
     assert content == expected
+
+    output_path_gz = Path(tmp_path, "variants.vcf.gz")
+    io.write_vcf(alignments, output_path_gz, large_sv_threshold=5)
+    assert gzip.decompress(output_path_gz.read_bytes()).decode().strip().split("\n") == expected
+
+
+def test_write_vcf_rle(tmp_path):
+    alignments = [
+        {"QNAME": "large-deletion", "RNAME": "example", "MIDSV": "=A,=C,=N,=N,=N,=N,=N,=N,=G,=T"},
+        {"QNAME": "indel_sub", "RNAME": "example", "MIDSV": "=A,=C,=G,=T,*AG,+T|+T|+T|=C,-A,-A,=G,=T"},
+        {"QNAME": "inversion", "RNAME": "example", "MIDSV": "=A,=C,=G,=T,=A,=c,=g,=t,=A,=C"},
+        {"QNAME": "sub_run", "RNAME": "example", "MIDSV": "=A,*AG,*AG,=n,=n,=N,=N,=A,=C,=G"},
+    ]
+    path_plain = Path(tmp_path, "plain.vcf")
+    path_rle = Path(tmp_path, "rle.vcf")
+    io.write_vcf(alignments, path_plain)
+    io.write_vcf([{**a, "MIDSV": runlength.encode(a["MIDSV"])} for a in alignments], path_rle)
+    assert path_rle.read_text() == path_plain.read_text()
+
+
+###########################################################
+# Write atomically
+###########################################################
+
+
+def test_write_atomic(tmp_path):
+    path_output = Path(tmp_path, "output.bin")
+    io.write_atomic(path_output, b"data")
+    assert path_output.read_bytes() == b"data"
+    assert list(tmp_path.iterdir()) == [path_output]
+
+
+def test_write_atomic_removes_temporary_file(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(io.os, "replace", fail)
+    with pytest.raises(OSError, match=r"No space left on device"):
+        io.write_atomic(Path(tmp_path, "output.bin"), b"data")
+    assert list(tmp_path.iterdir()) == []
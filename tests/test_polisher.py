@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import random
+from copy import deepcopy
+
 import pytest
 
-from src.midsv import polisher
+from src.midsv import formatter, polisher, runlength
 
 ###########################################################
 # merge
@@ -25,10 +28,10 @@ def test_is_forward_strand(flag, expected):
 @pytest.mark.parametrize(
     "current_alignment, first_read_is_forward, expected_mid_sv",
     [
-        ({"FLAG": 0, "MIDSV": "=A,=C,=G,=T"}, True, "=A,=C,=G,=T"),
-        ({"FLAG": 16, "MIDSV": "=A,=C,=G,=T"}, True, "=a,=c,=g,=t"),
-        ({"FLAG": 16, "MIDSV": "=A,=C,=G,=T"}, False, "=A,=C,=G,=T"),
-        ({"FLAG": 0, "MIDSV": "=A,=C,=G,=T"}, False, "=a,=c,=g,=t"),
+        ({"FLAG": 0, "MIDSV": ["=A", "=C", "=G", "=T"]}, True, ["=A", "=C", "=G", "=T"]),
+        ({"FLAG": 16, "MIDSV": ["=A", "=C", "=G", "=T"]}, True, ["=a", "=c", "=g", "=t"]),
+        ({"FLAG": 16, "MIDSV": ["=A", "=C", "=G", "=T"]}, False, ["=A", "=C", "=G", "=T"]),
+        ({"FLAG": 0, "MIDSV": ["=A", "=C", "=G", "=T"]}, False, ["=a", "=c", "=g", "=t"]),
     ],
 )
 def test_process_inversion(current_alignment, first_read_is_forward, expected_mid_sv):
@@ -40,43 +43,43 @@ def test_process_inversion(current_alignment, first_read_is_forward, expected_mi
     "previous_alignment, current_alignment, expected",
     [
         (
-            {"MIDSV": "=A,=C,=G,=T", "QSCORE": "10,20,30,40"},
-            {"MIDSV": "=G,=T,=A,=C", "QSCORE": "30,40,50,60"},
+            {"MIDSV": ["=A", "=C", "=G", "=T"], "QSCORE": ["10", "20", "30", "40"]},
+            {"MIDSV": ["=G", "=T", "=A", "=C"], "QSCORE": ["30", "40", "50", "60"]},
             2,  # Microhomology length for "=G,=T"
         ),
         (
-            {"MIDSV": "=A,=C,=G,=T", "QSCORE": "10,20,30,40"},
-            {"MIDSV": "=C,=A,=C,=G", "QSCORE": "40,50,60,70"},
+            {"MIDSV": ["=A", "=C", "=G", "=T"], "QSCORE": ["10", "20", "30", "40"]},
+            {"MIDSV": ["=C", "=A", "=C", "=G"], "QSCORE": ["40", "50", "60", "70"]},
             0,  # No microhomology
         ),
         (
-            {"MIDSV": "=A,=C,=G,=T", "QSCORE": "10,20,30,40"},
-            {"MIDSV": "=A,=C,=G,=T", "QSCORE": "10,20,30,40"},
+            {"MIDSV": ["=A", "=C", "=G", "=T"], "QSCORE": ["10", "20", "30", "40"]},
+            {"MIDSV": ["=A", "=C", "=G", "=T"], "QSCORE": ["10", "20", "30", "40"]},
             4,  # Full match
         ),
         (
-            {"MIDSV": "=A,=C,=G,=T", "QSCORE": "10,20,30,40"},
-            {"MIDSV": "=C,=G,=T,=A", "QSCORE": "20,30,40,50"},
+            {"MIDSV": ["=A", "=C", "=G", "=T"], "QSCORE": ["10", "20", "30", "40"]},
+            {"MIDSV": ["=C", "=G", "=T", "=A"], "QSCORE": ["20", "30", "40", "50"]},
             3,  # Microhomology length for "=C,=G,=T"
         ),
         (
-            {"MIDSV": "=A,=C,=G,=T", "QSCORE": "10,20,30,40"},
-            {"MIDSV": "=C,=G,=T,=A", "QSCORE": "25,30,40,50"},  # Slight QScore mismatch
+            {"MIDSV": ["=A", "=C", "=G", "=T"], "QSCORE": ["10", "20", "30", "40"]},
+            {"MIDSV": ["=C", "=G", "=T", "=A"], "QSCORE": ["25", "30", "40", "50"]},  # Slight QScore mismatch
             0,  # Microhomology stops at QScore mismatch
         ),
         (
-            {"MIDSV": "=A,=C,=G", "QSCORE": "10,20,30"},
-            {"MIDSV": "=G,=A,=C", "QSCORE": "30,40,50"},
+            {"MIDSV": ["=A", "=C", "=G"], "QSCORE": ["10", "20", "30"]},
+            {"MIDSV": ["=G", "=A", "=C"], "QSCORE": ["30", "40", "50"]},
             1,  # Microhomology length for "=G"
         ),
         (
-            {"MIDSV": "=A,=C,=G,=T,=A", "QSCORE": "10,20,30,40,50"},
-            {"MIDSV": "=C,=A,=C,=G", "QSCORE": "40,50,60,70"},
+            {"MIDSV": ["=A", "=C", "=G", "=T", "=A"], "QSCORE": ["10", "20", "30", "40", "50"]},
+            {"MIDSV": ["=C", "=A", "=C", "=G"], "QSCORE": ["40", "50", "60", "70"]},
             0,  # No microhomology for odd length
         ),
         (
-            {"MIDSV": "=A,=C,=G", "QSCORE": "10,20,30"},
-            {"MIDSV": "=C,=G,=C,=G", "QSCORE": "20,30,60,70"},
+            {"MIDSV": ["=A", "=C", "=G"], "QSCORE": ["10", "20", "30"]},
+            {"MIDSV": ["=C", "=G", "=C", "=G"], "QSCORE": ["20", "30", "60", "70"]},
             2,  # prevのほうが短い
         ),
     ],
@@ -95,17 +98,52 @@ def test_calculate_microhomology(previous_alignment, current_alignment, expected
     assert polisher.calculate_microhomology(previous_alignment, current_alignment) == expected
 
 
+def _calculate_microhomology_quadratic(previous_alignment, current_alignment):
+    """Compare every suffix and prefix as midsv v0.13.1 did"""
+    previous_midsv, current_midsv = previous_alignment["MIDSV"], current_alignment["MIDSV"]
+    num_microhomology = 0
+    for i in range(1, min(len(previous_midsv), len(current_midsv)) + 1):
+        prev_index = len(previous_midsv) - i
+        if previous_midsv[prev_index:] == current_midsv[:i]:
+            if previous_alignment["QSCORE"][prev_index:] != current_alignment["QSCORE"][:i]:
+                break
+            num_microhomology = i
+    return num_microhomology
+
+
+def test_calculate_microhomology_random():
+    rng = random.Random(0)
+    for _ in range(2000):
+        previous_alignment, current_alignment = (
+            {"MIDSV": rng.choices(["=A", "=C"], k=n), "QSCORE": rng.choices(["30", "30", "30", "10"], k=n)}
+            for n in (rng.randint(0, 12), rng.randint(0, 12))
+        )
+        expected = _calculate_microhomology_quadratic(previous_alignment, current_alignment)
+        assert polisher.calculate_microhomology(previous_alignment, current_alignment) == expected
+        previous_alignment.pop("QSCORE")
+        current_alignment.pop("QSCORE")
+        expected = _calculate_microhomology_quadratic(
+            {**previous_alignment, "QSCORE": previous_alignment["MIDSV"]},
+            {**current_alignment, "QSCORE": current_alignment["MIDSV"]},
+        )
+        assert polisher.calculate_microhomology(previous_alignment, current_alignment) == expected
+
+
 @pytest.mark.parametrize(
     "current_alignment, num_microhomology, expected_alignment",
     [
-        ({"MIDSV": "A,B,C,D", "POS": 1}, 2, {"MIDSV": "C,D", "POS": 3}),
+        ({"MIDSV": ["A", "B", "C", "D"], "POS": 1}, 2, {"MIDSV": ["C", "D"], "POS": 3}),
         (
-            {"MIDSV": "A,B,C,D", "QSCORE": "10,20,30,40", "POS": 1},
+            {"MIDSV": ["A", "B", "C", "D"], "QSCORE": ["10", "20", "30", "40"], "POS": 1},
             1,
-            {"MIDSV": "B,C,D", "QSCORE": "20,30,40", "POS": 2},
+            {"MIDSV": ["B", "C", "D"], "QSCORE": ["20", "30", "40"], "POS": 2},
+        ),
+        (
+            {"MIDSV": ["A", "B", "C", "D"], "QSCORE": ["10", "20", "30", "40"], "POS": 1},
+            3,
+            {"MIDSV": ["D"], "QSCORE": ["40"], "POS": 4},
         ),
-        ({"MIDSV": "A,B,C,D", "QSCORE": "10,20,30,40", "POS": 1}, 3, {"MIDSV": "D", "QSCORE": "40", "POS": 4}),
-        ({"MIDSV": "A,B,C,D", "POS": 1}, 0, {"MIDSV": "A,B,C,D", "POS": 1}),
+        ({"MIDSV": ["A", "B", "C", "D"], "POS": 1}, 0, {"MIDSV": ["A", "B", "C", "D"], "POS": 1}),
     ],
 )
 def test_remove_microhomology(
@@ -116,25 +154,44 @@ def test_remove_microhomology(
 
 
 @pytest.mark.parametrize(
-    "sam_template, gap, expected_template",
+    "alignment, gap, expected",
     [
-        ({"MIDSV": "A,B,C", "POS": 1}, 2, {"MIDSV": "A,B,C,=N,=N", "POS": 1}),
+        ({"MIDSV": ["A", "B", "C"], "POS": 1}, 2, {"MIDSV": ["A", "B", "C", "=N", "=N"]}),
         (
-            {"MIDSV": "A,B,C", "QSCORE": "10,20,30", "POS": 1},
+            {"MIDSV": ["A", "B", "C"], "QSCORE": ["10", "20", "30"], "POS": 1},
             1,
-            {"MIDSV": "A,B,C,=N", "QSCORE": "10,20,30,-1", "POS": 1},
+            {"MIDSV": ["A", "B", "C", "=N"], "QSCORE": ["10", "20", "30", "-1"]},
         ),
         (
-            {"MIDSV": "A,B,C", "QSCORE": "10,20,30", "POS": 1},
+            {"MIDSV": ["A", "B", "C"], "QSCORE": ["10", "20", "30"], "POS": 1},
             3,
-            {"MIDSV": "A,B,C,=N,=N,=N", "QSCORE": "10,20,30,-1,-1,-1", "POS": 1},
+            {"MIDSV": ["A", "B", "C", "=N", "=N", "=N"], "QSCORE": ["10", "20", "30", "-1", "-1", "-1"]},
         ),
-        ({"MIDSV": "A,B,C", "POS": 1}, 0, {"MIDSV": "A,B,C", "POS": 1}),
+        ({"MIDSV": ["A", "B", "C"], "POS": 1}, 0, {"MIDSV": ["A", "B", "C"]}),
     ],
 )
-def test_fill_gap(sam_template: dict[str, int | str], gap: int, expected_template: dict[str, int | str]) -> None:
-    polisher.fill_gap(sam_template, gap)
-    assert sam_template == expected_template
+def test_segment_builder_add_gap(alignment: dict[str, int | str], gap: int, expected: dict[str, int | str]) -> None:
+    builder = polisher.SegmentBuilder("QSCORE" in alignment)
+    builder.add_alignment(alignment)
+    builder.add_gap(gap)
+    assert builder.build() == expected
+
+
+def test_segment_builder_add_gap_rle():
+    builder = polisher.SegmentBuilder(qscore=True, rle=True)
+    builder.add_alignment({"MIDSV": ["=A"], "QSCORE": ["30"]})
+    builder.add_gap(1000)
+    assert builder.build() == {"MIDSV": ["=A", "=N*1000"], "QSCORE": ["30", "-1*1000"]}
+
+
+def test_segment_builder_does_not_modify_alignments():
+    alignments = [{"MIDSV": ["=A", "=C"], "QSCORE": ["30", "30"]}, {"MIDSV": ["=G"], "QSCORE": ["20"]}]
+    builder = polisher.SegmentBuilder(qscore=True)
+    builder.add_alignment(alignments[0])
+    builder.add_gap(2)
+    builder.add_alignment(alignments[1])
+    assert builder.build() == {"MIDSV": ["=A", "=C", "=N", "=N", "=G"], "QSCORE": ["30", "30", "-1", "-1", "20"]}
+    assert alignments == [{"MIDSV": ["=A", "=C"], "QSCORE": ["30", "30"]}, {"MIDSV": ["=G"], "QSCORE": ["20"]}]
 
 
 @pytest.mark.parametrize(
@@ -142,40 +199,58 @@ def test_fill_gap(sam_template: dict[str, int | str], gap: int, expected_templat
     [
         pytest.param(
             [
-                {"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": "=A,=T,=C", "QSCORE": "30,30,30"},
-                {"QNAME": "read1", "POS": 4, "FLAG": 0, "MIDSV": "=G,=T", "QSCORE": "30,30"},
+                {"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=T", "=C"], "QSCORE": ["30", "30", "30"]},
+                {"QNAME": "read1", "POS": 4, "FLAG": 0, "MIDSV": ["=G", "=T"], "QSCORE": ["30", "30"]},
             ],
             [
-                {"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": "=A,=T,=C,=G,=T", "QSCORE": "30,30,30,30,30"},
+                {
+                    "QNAME": "read1",
+                    "POS": 1,
+                    "FLAG": 0,
+                    "MIDSV": ["=A", "=T", "=C", "=G", "=T"],
+                    "QSCORE": ["30", "30", "30", "30", "30"],
+                },
             ],
             id="case_merge_simple_forward",
         ),
         pytest.param(
             [
-                {"QNAME": "read2", "POS": 1, "FLAG": 16, "MIDSV": "=A,=T", "QSCORE": "30,30"},
-                {"QNAME": "read2", "POS": 3, "FLAG": 16, "MIDSV": "=C,=G", "QSCORE": "30,30"},
+                {"QNAME": "read2", "POS": 1, "FLAG": 16, "MIDSV": ["=A", "=T"], "QSCORE": ["30", "30"]},
+                {"QNAME": "read2", "POS": 3, "FLAG": 16, "MIDSV": ["=C", "=G"], "QSCORE": ["30", "30"]},
             ],
             [
-                {"QNAME": "read2", "POS": 1, "FLAG": 16, "MIDSV": "=A,=T,=C,=G", "QSCORE": "30,30,30,30"},
+                {
+                    "QNAME": "read2",
+                    "POS": 1,
+                    "FLAG": 16,
+                    "MIDSV": ["=A", "=T", "=C", "=G"],
+                    "QSCORE": ["30", "30", "30", "30"],
+                },
             ],
             id="case_merge_reverse_strand",
         ),
         pytest.param(
             [
-                {"QNAME": "read3", "POS": 1, "FLAG": 0, "MIDSV": "=A,=T,=C", "QSCORE": "30,30,30"},
+                {"QNAME": "read3", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=T", "=C"], "QSCORE": ["30", "30", "30"]},
             ],
             [
-                {"QNAME": "read3", "POS": 1, "FLAG": 0, "MIDSV": "=A,=T,=C", "QSCORE": "30,30,30"},
+                {"QNAME": "read3", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=T", "=C"], "QSCORE": ["30", "30", "30"]},
             ],
             id="case_single_read",
         ),
         pytest.param(
             [
-                {"QNAME": "read4", "POS": 1, "FLAG": 0, "MIDSV": "=A,=T,=C", "QSCORE": "30,30,30"},
-                {"QNAME": "read4", "POS": 4, "FLAG": 16, "MIDSV": "=G,=T", "QSCORE": "30,30"},
+                {"QNAME": "read4", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=T", "=C"], "QSCORE": ["30", "30", "30"]},
+                {"QNAME": "read4", "POS": 4, "FLAG": 16, "MIDSV": ["=G", "=T"], "QSCORE": ["30", "30"]},
             ],
             [
-                {"QNAME": "read4", "POS": 1, "FLAG": 0, "MIDSV": "=A,=T,=C,=g,=t", "QSCORE": "30,30,30,30,30"},
+                {
+                    "QNAME": "read4",
+                    "POS": 1,
+                    "FLAG": 0,
+                    "MIDSV": ["=A", "=T", "=C", "=g", "=t"],
+                    "QSCORE": ["30", "30", "30", "30", "30"],
+                },
             ],
             id="case_inversion",
         ),
@@ -186,6 +261,29 @@ def test_merge(samdict, expected):
     assert result == expected
 
 
+def test_merge_microhomology_covers_alignment():
+    samdict = [
+        {"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=C"]},
+        {"QNAME": "read1", "POS": 5, "FLAG": 0, "MIDSV": ["=A", "=C"]},
+    ]
+    result = polisher.merge(samdict)
+    assert result == [{"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=C", "=N", "=N", "=N", "=N"]}]
+
+
+def test_merge_does_not_modify_alignments():
+    samdict = [
+        {"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": ["=A", "=C", "=G"], "QSCORE": ["30", "30", "30"]},
+        {"QNAME": "read1", "POS": 5, "FLAG": 16, "MIDSV": ["=G", "=T"], "QSCORE": ["30", "20"]},
+    ]
+    midsv = ["=A", "=C", "=G", "=N", "=g", "=t"]
+    expected = [
+        {"QNAME": "read1", "POS": 1, "FLAG": 0, "MIDSV": midsv, "QSCORE": ["30", "30", "30", "-1", "30", "20"]}
+    ]
+    original = deepcopy(samdict)
+    assert polisher.merge(samdict) == expected
+    assert samdict == original
+
+
 ###############################################################################
 # pad
 ###############################################################################
@@ -195,37 +293,53 @@ def test_merge(samdict, expected):
     "samdict, sqheaders, expected",
     [
         pytest.param(
-            [{"QNAME": "read1", "POS": 1, "RNAME": "chr1", "MIDSV": "=A,=T,=C", "QSCORE": "30,30,30"}],
+            [{"QNAME": "read1", "POS": 1, "RNAME": "chr1", "MIDSV": ["=A", "=T", "=C"], "QSCORE": ["30", "30", "30"]}],
             {"chr1": 6},
             [
                 {
                     "QNAME": "read1",
                     "POS": 1,
                     "RNAME": "chr1",
-                    "MIDSV": "=A,=T,=C,=N,=N,=N",
-                    "QSCORE": "30,30,30,-1,-1,-1",
+                    "MIDSV": ["=A", "=T", "=C", "=N", "=N", "=N"],
+                    "QSCORE": ["30", "30", "30", "-1", "-1", "-1"],
                 }
             ],
             id="case_no_left_padding",
         ),
         pytest.param(
-            [{"QNAME": "read2", "POS": 4, "RNAME": "chr2", "MIDSV": "=G,=T", "QSCORE": "30,30"}],
+            [{"QNAME": "read2", "POS": 4, "RNAME": "chr2", "MIDSV": ["=G", "=T"], "QSCORE": ["30", "30"]}],
             {"chr2": 6},
             [
                 {
                     "QNAME": "read2",
                     "POS": 4,
                     "RNAME": "chr2",
-                    "MIDSV": "=N,=N,=N,=G,=T,=N",
-                    "QSCORE": "-1,-1,-1,30,30,-1",
+                    "MIDSV": ["=N", "=N", "=N", "=G", "=T", "=N"],
+                    "QSCORE": ["-1", "-1", "-1", "30", "30", "-1"],
                 }
             ],
             id="case_left_and_right_padding",
         ),
         pytest.param(
-            [{"QNAME": "read3", "POS": 1, "RNAME": "chr3", "MIDSV": "=A,=T,=C,=G", "QSCORE": "30,30,30,30"}],
+            [
+                {
+                    "QNAME": "read3",
+                    "POS": 1,
+                    "RNAME": "chr3",
+                    "MIDSV": ["=A", "=T", "=C", "=G"],
+                    "QSCORE": ["30", "30", "30", "30"],
+                }
+            ],
             {"chr3": 4},
-            [{"QNAME": "read3", "POS": 1, "RNAME": "chr3", "MIDSV": "=A,=T,=C,=G", "QSCORE": "30,30,30,30"}],
+            [
+                {
+                    "QNAME": "read3",
+                    "POS": 1,
+                    "RNAME": "chr3",
+                    "MIDSV": ["=A", "=T", "=C", "=G"],
+                    "QSCORE": ["30", "30", "30", "30"],
+                }
+            ],
             id="case_no_padding_needed",
         ),
     ],
@@ -235,6 +349,99 @@ def test_pad(samdict, sqheaders, expected):
     assert result == expected
 
 
+def test_pad_rle():
+    samdict = [
+        {"QNAME": "read1", "POS": 4, "RNAME": "chr1", "MIDSV": ["=G", "=N*3", "=T"], "QSCORE": ["30", "-1*3", "30"]}
+    ]
+    result = polisher.pad(samdict, {"chr1": 100}, rle=True)
+    expected = [
+        {
+            "QNAME": "read1",
+            "POS": 4,
+            "RNAME": "chr1",
+            "MIDSV": ["=N*3", "=G", "=N*3", "=T", "=N*92"],
+            "QSCORE": ["-1*3", "30", "-1*3", "30", "-1*92"],
+        }
+    ]
+    assert result == expected
+
+
+def test_pad_virtually():
+    samdict = [
+        {"QNAME": "read1", "POS": 4, "RNAME": "chr1", "MIDSV": ["=G", "=N*3", "=T"], "QSCORE": ["30", "-1*3", "30"]}
+    ]
+    result = polisher.pad_virtually(samdict, rle=True)
+    assert result[0]["START"] == 4
+    assert result[0]["END"] == 8
+    assert result[0]["MIDSV"] == ["=G", "=N*3", "=T"]
+
+
+def test_pad_region():
+    samdict = [{"QNAME": "read1", "POS": 13, "RNAME": "chr1", "MIDSV": ["=G", "=T"], "QSCORE": ["30", "30"]}]
+    result = polisher.pad(samdict, {"chr1": 100}, region=("chr1", 11, 15))
+    assert result[0]["MIDSV"] == ["=N", "=N", "=G", "=T", "=N"]
+    assert result[0]["QSCORE"] == ["-1", "-1", "30", "30", "-1"]
+
+
+def test_crop():
+    samdict = [
+        {
+            "QNAME": "read1",
+            "POS": 9,
+            "RNAME": "chr1",
+            "MIDSV": ["=A", "=C", "=G", "=T"],
+            "QSCORE": ["1", "2", "3", "4"],
+        },
+        {"QNAME": "read2", "POS": 1, "RNAME": "chr1", "MIDSV": ["=A", "=C"], "QSCORE": ["1", "2"]},
+        {"QNAME": "read3", "POS": 12, "RNAME": "chr1", "MIDSV": ["=A"], "QSCORE": ["1"]},
+    ]
+    result = polisher.crop(samdict, ("chr1", 10, 14))
+    assert [(r["POS"], r["MIDSV"], r["QSCORE"]) for r in result] == [
+        (10, ["=C", "=G", "=T"], ["2", "3", "4"]),
+        (10, [], []),
+        (12, ["=A"], ["1"]),
+    ]
+
+
+def test_crop_rle():
+    samdict = [
+        {"QNAME": "read1", "POS": 1, "RNAME": "chr1", "MIDSV": ["=G", "=N*5", "=T"], "QSCORE": ["30", "-1*5", "30"]}
+    ]
+    result = polisher.crop(samdict, ("chr1", 3, 7), rle=True)
+    assert (result[0]["POS"], result[0]["MIDSV"], result[0]["QSCORE"]) == (3, ["=N*4", "=T"], ["-1*4", "30"])
+
+
+@pytest.mark.parametrize("rle", [False, True])
+def test_expand(rle):
+    samdict = [
+        {"QNAME": "read1", "POS": 4, "RNAME": "chr1", "MIDSV": ["=N", "=G", "=T"], "QSCORE": ["-1", "30", "30"]}
+    ]
+    sqheaders = {"chr1": 10}
+    padded = polisher.serialize(polisher.pad(deepcopy(samdict), sqheaders, rle), rle)
+    virtual = polisher.serialize(polisher.pad_virtually(deepcopy(samdict)), rle)
+    assert polisher.expand(virtual[0], sqheaders, rle) == padded[0]
+    # The flank and the first token are merged into a single run
+    if rle:
+        assert padded[0]["MIDSV"] == "=N*4,=G,=T,=N*4"
+
+
+@pytest.mark.parametrize("rle", [False, True])
+def test_expand_region(rle):
+    record = {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=G,=T", "QSCORE": "30,30", "START": 13, "END": 14}
+    expanded = polisher.expand(record, {"chr1": 100}, rle, region="chr1:11-15")
+    assert runlength.decode(expanded["MIDSV"]) == "=N,=N,=G,=T,=N"
+    assert runlength.decode(expanded["QSCORE"]) == "-1,-1,30,30,-1"
+    # A read cropped out of the region has no token
+    record = {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "", "QSCORE": "", "START": 11, "END": 10}
+    expanded = polisher.expand(record, {"chr1": 100}, rle, region="chr1:11-15")
+    assert runlength.decode(expanded["MIDSV"]) == "=N,=N,=N,=N,=N"
+
+
+def test_expand_without_start():
+    record = {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=C"}
+    assert polisher.expand(record, {"chr1": 2}) is record
+
+
 ###############################################################################
 # remove_different_length
 ###############################################################################
@@ -244,21 +451,21 @@ def test_pad(samdict, sqheaders, expected):
     "samdict, sqheaders, expected",
     [
         pytest.param(
-            [{"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=T,=C"}],
+            [{"QNAME": "read1", "RNAME": "chr1", "MIDSV": ["=A", "=T", "=C"]}],
             {"chr1": 3},
-            [{"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=T,=C"}],
+            [{"QNAME": "read1", "RNAME": "chr1", "MIDSV": ["=A", "=T", "=C"]}],
             id="case_matching_length",
         ),
         pytest.param(
-            [{"QNAME": "read2", "RNAME": "chr2", "MIDSV": "=A,=T,=C,=G"}],
+            [{"QNAME": "read2", "RNAME": "chr2", "MIDSV": ["=A", "=T", "=C", "=G"]}],
             {"chr2": 3},
             [],
             id="case_non_matching_length",
         ),
         pytest.param(
-            [{"QNAME": "read3", "RNAME": "chr3", "MIDSV": "=A,=T"}],
+            [{"QNAME": "read3", "RNAME": "chr3", "MIDSV": ["=A", "=T"]}],
             {"chr3": 2},
-            [{"QNAME": "read3", "RNAME": "chr3", "MIDSV": "=A,=T"}],
+            [{"QNAME": "read3", "RNAME": "chr3", "MIDSV": ["=A", "=T"]}],
             id="case_single_entry_matching",
         ),
     ],
@@ -268,6 +475,24 @@ def test_remove_different_length(samdict, sqheaders, expected):
     assert result == expected
 
 
+def test_remove_different_length_by_end():
+    samdict = [
+        {"QNAME": "fit", "RNAME": "chr1", "MIDSV": ["=A"] * 3, "START": 8, "END": 10},
+        {"QNAME": "exceed", "RNAME": "chr1", "MIDSV": ["=A"] * 3, "START": 9, "END": 11},
+    ]
+    result = polisher.remove_different_length(samdict, {"chr1": 10})
+    assert [r["QNAME"] for r in result] == ["fit"]
+
+
+def test_remove_different_length_region():
+    samdict = [
+        {"QNAME": "fit", "RNAME": "chr1", "MIDSV": ["=A"] * 5},
+        {"QNAME": "reference", "RNAME": "chr1", "MIDSV": ["=A"] * 100},
+    ]
+    result = polisher.remove_different_length(samdict, {"chr1": 100}, region=("chr1", 11, 15))
+    assert [r["QNAME"] for r in result] == ["fit"]
+
+
 ###############################################################################
 # select
 ###############################################################################
@@ -337,6 +562,29 @@ def test_select(samdict, keep, expected):
     assert result == expected
 
 
+def test_select_columns():
+    alignments = [
+        formatter.Alignment(QNAME="read1", FLAG=0, RNAME="chr1", MIDSV="=A", QSCORE="30"),
+        {"QNAME": "read2", "FLAG": 16, "RNAME": "chr1", "MIDSV": "=C", "QSCORE": "20"},
+    ]
+    columns = {"QNAME": ["read0"], "RNAME": ["chr1"], "MIDSV": ["=G"], "QSCORE": ["10"]}
+    result = polisher.select_columns(alignments, columns)
+    assert result is columns
+    assert result == {
+        "QNAME": ["read0", "read1", "read2"],
+        "RNAME": ["chr1", "chr1", "chr1"],
+        "MIDSV": ["=G", "=A", "=C"],
+        "QSCORE": ["10", "30", "20"],
+    }
+
+
+def test_select_alignment():
+    alignment = formatter.Alignment(QNAME="read1", FLAG=0, RNAME="chr1", POS=1, SEQ="ACGT", MIDSV=["=A"])
+    (result,) = polisher.select([alignment], keep=["SEQ"])
+    assert type(result) is dict
+    assert result == {"QNAME": "read1", "RNAME": "chr1", "SEQ": "ACGT", "MIDSV": ["=A"]}
+
+
 # def test_join_control():
 #     sam = Path("tests", "data", "join", "test_control.txt").read_text()
 #     sam = eval(sam)
@@ -411,3 +659,47 @@ def test_select(samdict, keep, expected):
 #     answer = Path("tests", "data", "pad", "answer_pad.txt").read_text()
 #     answer = eval(answer)
 #     assert test == answer
+
+
+###########################################################
+# collapse
+###########################################################
+
+
+def test_collapse():
+    alignments = [
+        {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=C"},
+        {"QNAME": "read2", "RNAME": "chr1", "MIDSV": "=A,*CT"},
+        {"QNAME": "read3", "RNAME": "chr1", "MIDSV": "=A,=C"},
+        {"QNAME": "read4", "RNAME": "chr2", "MIDSV": "=A,=C"},
+        {"QNAME": "read5", "RNAME": "chr1", "MIDSV": "=A,=C"},
+    ]
+    test = polisher.collapse(iter(alignments))
+    expected = [
+        {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=C", "COUNT": 3},
+        {"QNAME": "read2", "RNAME": "chr1", "MIDSV": "=A,*CT", "COUNT": 1},
+        {"QNAME": "read4", "RNAME": "chr2", "MIDSV": "=A,=C", "COUNT": 1},
+    ]
+    assert test == expected
+
+
+def test_collapse_qscore_and_qnames():
+    alignments = [
+        {"QNAME": "read1", "RNAME": "chr1", "MIDSV": "=A,=C", "QSCORE": "10,20"},
+        {"QNAME": "read2", "RNAME": "chr1", "MIDSV": "=A,=C", "QSCORE": "10,30"},
+        {"QNAME": "read3", "RNAME": "chr1", "MIDSV": "=A,=C", "QSCORE": "10,20"},
+        {"QNAME": "read4", "RNAME": "chr1", "MIDSV": "=A,=C", "QSCORE": "10,20"},
+    ]
+    test = polisher.collapse(alignments, num_qnames=2)
+    expected = [
+        {
+            "QNAME": "read1",
+            "RNAME": "chr1",
+            "MIDSV": "=A,=C",
+            "QSCORE": "10,20",
+            "COUNT": 3,
+            "QNAMES": ["read1", "read3"],
+        },
+        {"QNAME": "read2", "RNAME": "chr1", "MIDSV": "=A,=C", "QSCORE": "10,30", "COUNT": 1, "QNAMES": ["read2"]},
+    ]
+    assert test == expected
@@ -0,0 +1,59 @@
+import pytest
+
+from src.midsv import runlength
+
+
+@pytest.mark.parametrize(
+    "token, count, expected",
+    [
+        ("=N", 1, "=N"),
+        ("=N", 3, "=N*3"),
+        ("-1", 10, "-1*10"),
+    ],
+)
+def test_run(token, count, expected):
+    assert runlength.run(token, count) == expected
+
+
+def test_split_runs():
+    test = runlength.split_runs("=N*3,=A,*AG,*AG*2,+T|=N,-1*10")
+    expected = [("=N", 3), ("=A", 1), ("*AG", 1), ("*AG", 2), ("+T|=N", 1), ("-1", 10)]
+    assert test == expected
+
+
+@pytest.mark.parametrize(
+    "midsv, expected",
+    [
+        ("=A", 1),
+        ("=A,*AG,+T|+T|=C", 3),
+        ("=N*3,=A,=N*100", 104),
+        ("-1*5,30|30|30,40", 7),
+    ],
+)
+def test_length(midsv, expected):
+    assert runlength.length(midsv) == expected
+
+
+@pytest.mark.parametrize(
+    "midsv, expected",
+    [
+        ("=N,=N,=N,=A,=N,=N,=N", "=N*3,=A,=N*3"),
+        ("=A,*AG,*AG,=a,=a", "=A,*AG*2,=a*2"),
+        ("-1,-1,30,30|30,30|30", "-1*2,30,30|30*2"),
+        ("=A,=C", "=A,=C"),
+    ],
+)
+def test_encode_and_decode(midsv, expected):
+    encoded = runlength.encode(midsv)
+    assert encoded == expected
+    assert runlength.decode(encoded) == midsv
+    assert runlength.length(encoded) == len(midsv.split(","))
+
+
+def test_encode_merges_runs():
+    assert runlength.encode("=N*2,=N,=A,=N*2,=N*3") == "=N*3,=A,=N*5"
+
+
+def test_length_and_encode_of_token_list():
+    assert runlength.length(["=N*3", "=A", "=N"]) == 5
+    assert runlength.encode(["=N*3", "=A", "=A"]) == "=N*3,=A*2"
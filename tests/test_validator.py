@@ -101,3 +101,71 @@ def test_validate_alignments_no_cslong():
     with pytest.raises(ValueError) as excinfo:
         validator.sam_alignments(sam)
     assert str(excinfo.value) == "Input does not have long-formatted cs tag"
+
+
+@pytest.mark.parametrize("workers", [0, -1, 1.5, "2", True])
+def test_workers_argument_invalid(workers):
+    with pytest.raises(ValueError, match=r"'workers' must be a positive integer"):
+        validator.workers_argument(workers)
+
+
+@pytest.mark.parametrize("batch_size", [0, -1, 1.5, "2", True])
+def test_batch_size_argument_invalid(batch_size):
+    with pytest.raises(ValueError, match=r"'batch_size' must be a positive integer"):
+        validator.batch_size_argument(batch_size)
+
+
+@pytest.mark.parametrize(
+    "qnames, expected",
+    [
+        (None, None),
+        ("read1", ["read1"]),
+        (["read2", "read1", "read2"], ["read1", "read2"]),
+        (["read,1", "read_1"], ["read_1"]),
+    ],
+)
+def test_qnames_argument_valid(qnames, expected):
+    assert validator.qnames_argument(qnames) == expected
+
+
+@pytest.mark.parametrize("qnames", [1, ["read1", 2]])
+def test_qnames_argument_invalid(qnames):
+    with pytest.raises(ValueError, match=r"'qnames' must be a string or a list of strings"):
+        validator.qnames_argument(qnames)
+
+
+@pytest.mark.parametrize(
+    "region, expected",
+    [
+        (None, None),
+        ("chr1:101-200", ("chr1", 101, 200)),
+        ("chr1:1,001-2,000", ("chr1", 1001, 2000)),
+        ("HLA:A:5-5", ("HLA:A", 5, 5)),
+    ],
+)
+def test_region_argument_valid(region, expected):
+    assert validator.region_argument(region) == expected
+
+
+@pytest.mark.parametrize("region", ["chr1", "chr1:100", ":1-2", "chr1:1-2-3", "chr1:a-b", ("chr1", 1, 2)])
+def test_region_argument_invalid_format(region):
+    with pytest.raises(ValueError, match=r"'region' must be in the format of 'RNAME:START-END'"):
+        validator.region_argument(region)
+
+
+@pytest.mark.parametrize("region", ["chr1:0-10", "chr1:20-10"])
+def test_region_argument_invalid_range(region):
+    with pytest.raises(ValueError, match=r"'region' must satisfy 1 <= START <= END"):
+        validator.region_argument(region)
+
+
+@pytest.mark.parametrize("region", [("chr2", 1, 10), ("chr1", 1, 101)])
+def test_region_in_sqheaders_invalid(region):
+    with pytest.raises(ValueError, match=r"'region'"):
+        validator.region_in_sqheaders(region, {"chr1": 100})
+
+
+@pytest.mark.parametrize("input_value", ["list", None, "ARRAY"])
+def test_output_argument_invalid(input_value):
+    with pytest.raises(ValueError, match=r"'output' must be 'dict' or 'array'"):
+        validator.output_argument(input_value)